@@ -5,10 +5,28 @@ Transforms multi-source computer activity into one charismatic,
 grounded, 128-char status sentence. No hallucination. No fluff.
 """
 
-import random
+import asyncio
+import bisect
+import concurrent.futures
+import dataclasses
+import datetime
+import functools
+import hashlib
+import inspect
+import itertools
+import json
 import re
+import sqlite3
+import threading
 import time
-from typing import Optional
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.parse import urlparse
+from typing import TYPE_CHECKING, Callable, Hashable, Optional, Sequence, Union
+
+if TYPE_CHECKING:
+    from trackers import FullContext
 
 
 # ──────────────────────────────────────────────
@@ -112,46 +130,568 @@ LANGUAGE_MAP = {
 #  Cache & Stats
 # ──────────────────────────────────────────────
 
+STATUS_CACHE_TTL = 600  # Seconds; config "status_cache_ttl"
+
+
 class StatusCache:
-    """Cache with history to enforce variety."""
+    """
+    Bounded LRU of generated statuses keyed by context, each entry with its
+    own TTL, plus a separate history used only to enforce variety. An entry
+    may hold a pool of candidates (batch mode) that is shown one at a time.
+    """
 
-    def __init__(self, max_history: int = 10):
-        self._last_key: str = ""
-        self._last_status: str = ""
-        self._last_time: float = 0
-        self._cache_ttl: float = 60
+    def __init__(self, max_entries: int = 128, max_bytes: int = 64 * 1024,
+                 ttl: float = STATUS_CACHE_TTL, max_history: int = 10,
+                 clock: Callable[[], float] = time.time):
+        self._clock = clock
+        # key → [candidates, shown index, stored_at, shown_at]
+        self._entries: OrderedDict[Hashable, list] = OrderedDict()
+        self._bytes = 0
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._cache_ttl = ttl
         self._history: list[str] = []
         self._max_history = max_history
+        self._lock = threading.RLock()  # The bot loop and the pre-generator share it
 
-    def get(self, key: str) -> Optional[str]:
-        if (key == self._last_key
-                and self._last_status
-                and (time.time() - self._last_time) < self._cache_ttl):
-            return self._last_status
-        return None
+    @staticmethod
+    def _size(candidates: tuple[str, ...]) -> int:
+        return sum(len(status.encode("utf-8")) for status in candidates)
 
-    def set(self, key: str, status: str):
-        self._last_key = key
-        self._last_status = status
-        self._last_time = time.time()
+    def _drop(self, key: Hashable):
+        entry = self._entries.pop(key)
+        self._bytes -= self._size(entry[0])
+
+    def _remember(self, status: str):
         self._history.append(status)
         if len(self._history) > self._max_history:
             self._history.pop(0)
 
+    def get(self, key: Hashable, allow_stale: bool = False) -> Optional[str]:
+        """
+        The entry's current status, or None. Expired entries stay until the
+        LRU pushes them out, so allow_stale can still serve them when calls
+        are being rationed.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            candidates, index, stored_at, _ = entry
+            if not allow_stale and self._clock() - stored_at >= self._cache_ttl:
+                return None
+            self._entries.move_to_end(key)
+            return candidates[index]
+
+    def set(self, key: Hashable, statuses: Union[str, Sequence[str]],
+            remember: bool = True) -> int:
+        """
+        Store a status (or a candidate pool); returns how many entries were
+        evicted. remember=False keeps unshown (pre-generated) statuses out of
+        the variety history.
+        """
+        with self._lock:
+            candidates = (statuses,) if isinstance(statuses, str) else tuple(statuses)
+            if key in self._entries:
+                self._drop(key)
+            now = self._clock()
+            self._entries[key] = [candidates, 0, now, now]
+            self._bytes += self._size(candidates)
+
+            evicted = 0
+            while len(self._entries) > 1 and (
+                    len(self._entries) > self._max_entries or self._bytes > self._max_bytes):
+                self._drop(next(iter(self._entries)))
+                evicted += 1
+
+            if remember:
+                self._remember(candidates[0])
+            return evicted
+
+    def due(self, key: Hashable, every: float) -> bool:
+        """Has the entry's shown status been up for `every` seconds?"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and self._clock() - entry[3] >= every
+
+    def advance(self, key: Hashable) -> Optional[str]:
+        """Show the pool's next candidate; None once the pool is used up."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] + 1 >= len(entry[0]):
+                return None
+            entry[1] += 1
+            entry[3] = self._clock()
+            self._remember(entry[0][entry[1]])
+            return entry[0][entry[1]]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    @property
+    def ttl(self) -> float:
+        return self._cache_ttl
+
+    @ttl.setter
+    def ttl(self, seconds: float):
+        self._cache_ttl = max(0.0, float(seconds))
+
     @property
     def recent(self) -> list[str]:
         return self._history[-3:]
 
 
+CONTEXT_HISTORY_WINDOW = 7 * 24 * 3600
+
+
+class PersistentStatusCache:
+    """
+    On-disk status cache (SQLite) so restarts and auto-updates start warm.
+    Keyed by context fingerprint + persona + language + provider. Opened
+    lazily; every write is its own transaction, and a database that cannot
+    be read is moved aside rather than crashing the bot.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS statuses (
+            fingerprint TEXT NOT NULL,
+            persona     TEXT NOT NULL,
+            language    TEXT NOT NULL,
+            provider    TEXT NOT NULL,
+            status      TEXT NOT NULL,
+            created     REAL NOT NULL,
+            used        REAL NOT NULL,
+            PRIMARY KEY (fingerprint, persona, language, provider)
+        );
+        CREATE TABLE IF NOT EXISTS contexts (
+            fingerprint TEXT PRIMARY KEY,
+            context     TEXT NOT NULL,
+            seen        INTEGER NOT NULL,
+            last_seen   REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS budget (
+            id     INTEGER PRIMARY KEY CHECK (id = 0),
+            day    TEXT NOT NULL,
+            calls  INTEGER NOT NULL,
+            tokens INTEGER NOT NULL
+        )
+    """
+
+    def __init__(self, path: Path, ttl: float = 12 * 3600, max_entries: int = 2000,
+                 clock: Callable[[], float] = time.time):
+        self._path = Path(path)
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._clock = clock
+        self._conn: Optional[sqlite3.Connection] = None
+        self._disabled = False
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            self._conn = self._connect()
+        except sqlite3.DatabaseError:
+            # Torn or foreign file: keep it for inspection, start fresh
+            try:
+                self._path.replace(self._path.with_suffix(".corrupt"))
+                self._conn = self._connect()
+            except (OSError, sqlite3.Error) as e:
+                self._fail(e)
+        except (OSError, sqlite3.Error) as e:
+            self._fail(e)
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self._path, timeout=2, check_same_thread=False,
+                               isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self._SCHEMA)
+            conn.execute("DELETE FROM statuses WHERE created < ?", (self._clock() - self._ttl,))
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _fail(self, error: Exception):
+        self._disabled = True
+        self._conn = None
+        print(f"  ⚠️  Kalıcı önbellek devre dışı: {error}")
+
+    def get(self, key: tuple[str, str, str, str]) -> Optional[str]:
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT status, created FROM statuses WHERE fingerprint=? AND persona=? "
+                    "AND language=? AND provider=?", key).fetchone()
+                if row is None:
+                    return None
+                status, created = row
+                now = self._clock()
+                if now - created >= self._ttl:
+                    conn.execute("DELETE FROM statuses WHERE fingerprint=? AND persona=? "
+                                 "AND language=? AND provider=?", key)
+                    return None
+                conn.execute("UPDATE statuses SET used=? WHERE fingerprint=? AND persona=? "
+                             "AND language=? AND provider=?", (now, *key))
+                return status
+            except sqlite3.Error as e:
+                self._fail(e)
+                return None
+
+    def set(self, key: tuple[str, str, str, str], status: str):
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return
+            now = self._clock()
+            try:
+                conn.execute("INSERT OR REPLACE INTO statuses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (*key, status, now, now))
+                self._writes += 1
+                if self._writes % 50 == 0:
+                    self._evict(conn, now)
+            except sqlite3.Error as e:
+                self._fail(e)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """Drop expired rows, then the least recently used beyond max_entries."""
+        conn.execute("BEGIN")
+        try:
+            conn.execute("DELETE FROM statuses WHERE created < ?", (now - self._ttl,))
+            conn.execute(
+                "DELETE FROM statuses WHERE rowid IN (SELECT rowid FROM statuses "
+                "ORDER BY used DESC LIMIT -1 OFFSET ?)", (self._max_entries,))
+            conn.execute("DELETE FROM contexts WHERE last_seen < ?",
+                         (now - CONTEXT_HISTORY_WINDOW,))
+            conn.execute("COMMIT")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def record_context(self, fingerprint: str, context_json: str):
+        """Count one more request for a context (the pre-generator's history)."""
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT INTO contexts VALUES (?, ?, 1, ?) ON CONFLICT(fingerprint) "
+                    "DO UPDATE SET seen = seen + 1, last_seen = excluded.last_seen",
+                    (fingerprint, context_json, self._clock()))
+            except sqlite3.Error as e:
+                self._fail(e)
+
+    def top_contexts(self, limit: int) -> list[tuple[str, int]]:
+        """(context JSON, times seen) of the most requested contexts this past week."""
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return []
+            try:
+                return conn.execute(
+                    "SELECT context, seen FROM contexts WHERE last_seen >= ? "
+                    "ORDER BY seen DESC LIMIT ?",
+                    (self._clock() - CONTEXT_HISTORY_WINDOW, limit)).fetchall()
+            except sqlite3.Error as e:
+                self._fail(e)
+                return []
+
+    def load_budget(self) -> Optional[tuple[str, int, int]]:
+        """(ISO day, calls, tokens) last saved by DailyBudget, if any."""
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return None
+            try:
+                return conn.execute("SELECT day, calls, tokens FROM budget WHERE id=0").fetchone()
+            except sqlite3.Error as e:
+                self._fail(e)
+                return None
+
+    def save_budget(self, day: str, calls: int, tokens: int):
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return
+            try:
+                conn.execute("INSERT OR REPLACE INTO budget VALUES (0, ?, ?, ?)",
+                             (day, calls, tokens))
+            except sqlite3.Error as e:
+                self._fail(e)
+
+    def __len__(self) -> int:
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return 0
+            try:
+                return conn.execute("SELECT COUNT(*) FROM statuses").fetchone()[0]
+            except sqlite3.Error:
+                return 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Upper bounds (ms) of the latency histogram buckets; the last one catches the rest
+LATENCY_BUCKETS_MS = (25, 50, 100, 200, 350, 500, 750, 1000, 1500, 2000,
+                      3000, 5000, 10000, 15000, float("inf"))
+STATS_WINDOW = 300      # "Last 5 minutes" views
+STATS_WINDOW_SLOT = 10  # Window resolution, seconds
+
+
+class LatencyHistogram:
+    """Fixed buckets, so percentiles cost O(buckets) and memory never grows."""
+
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+
+    def merge(self, other: "LatencyHistogram"):
+        for i, n in enumerate(other.counts):
+            self.counts[i] += n
+        self.count += other.count
+        self.total += other.total
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Estimated ms, interpolated inside the bucket the percentile falls in."""
+        if not self.count:
+            return None
+        rank = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = LATENCY_BUCKETS_MS[i - 1] if i else 0.0
+                high = LATENCY_BUCKETS_MS[i]
+                if high == float("inf"):
+                    return round(low, 1)
+                return round(low + (high - low) * (rank - seen) / n, 1)
+            seen += n
+        return None
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class _WindowSlot:
+    __slots__ = ("start", "counters", "latency")
+
+    def __init__(self, start: float):
+        self.start = start
+        self.counters: dict[str, int] = {}
+        self.latency = LatencyHistogram()
+
+
+class RollingWindow:
+    """Counters and a latency histogram over the last `span` seconds, in slots."""
+
+    def __init__(self, span: float = STATS_WINDOW, slot: float = STATS_WINDOW_SLOT,
+                 clock: Callable[[], float] = time.monotonic):
+        self._span = span
+        self._slot = slot
+        self._clock = clock
+        self._slots: deque[_WindowSlot] = deque()
+
+    def _current(self) -> _WindowSlot:
+        now = self._clock()
+        while self._slots and now - self._slots[0].start >= self._span:
+            self._slots.popleft()
+        if not self._slots or now - self._slots[-1].start >= self._slot:
+            self._slots.append(_WindowSlot(now - (now % self._slot)))
+        return self._slots[-1]
+
+    def add(self, **counters: int):
+        slot = self._current()
+        for name, n in counters.items():
+            slot.counters[name] = slot.counters.get(name, 0) + n
+
+    def observe(self, seconds: float):
+        self._current().latency.observe(seconds)
+
+    def summary(self) -> dict:
+        self._current()  # Drops expired slots
+        counters: dict[str, int] = {}
+        latency = LatencyHistogram()
+        for slot in self._slots:
+            for name, n in slot.counters.items():
+                counters[name] = counters.get(name, 0) + n
+            latency.merge(slot.latency)
+        return dict(counters, seconds=self._span, latency_ms=latency.summary())
+
+
 class Stats:
-    """AI engine statistics."""
+    """
+    AI engine statistics. Written from the bot loop, the provider loop and
+    the pre-generator, read from the dashboard's Flask thread: every update
+    goes through the lock, and readers take a snapshot().
+    """
     def __init__(self):
+        self._lock = threading.RLock()
         self.total_calls = 0
         self.successful_calls = 0
         self.failed_calls = 0
         self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+        self.disk_hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.completion_tokens = 0
+        self._latency = {True: [0.0, 0], False: [0.0, 0]}  # prefix cached? → [sum, n]
+        self.hedges_fired = 0
+        self.degraded = 0
+        self.rotations = 0
+        self.pregenerated = 0
+        self.pregen_hits = 0
+        self.local_answers = 0
+        self.coalesced = 0  # Requests that shared another one's provider call
+        self.provisional = 0  # Deadline missed: a quick status went out first
+        self._stream = {"ttft": [0.0, 0], "status": [0.0, 0]}  # → [sum, n]
+        self.stream_cutoffs = 0
+        self.providers: dict[str, dict] = {}
+        self.latency: dict[tuple[str, str], LatencyHistogram] = {}  # (provider, model)
+        self.errors: dict[str, int] = {}  # Exception class → count
+        self.window = RollingWindow()
         self.start_time = time.time()
 
+    # Counters that also feed the rolling window
+    _WINDOWED = frozenset({"cache_hits", "cache_misses", "total_calls",
+                           "successful_calls", "failed_calls", "degraded"})
+
+    def count(self, **deltas: int):
+        """Bump plain counters, e.g. stats.count(cache_hits=1)."""
+        with self._lock:
+            for name, n in deltas.items():
+                setattr(self, name, getattr(self, name) + n)
+            windowed = {name: n for name, n in deltas.items() if name in self._WINDOWED}
+            if windowed:
+                self.window.add(**windowed)
+
+    def record_error(self, error: BaseException):
+        with self._lock:
+            name = type(error).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+            self.window.add(errors=1)
+
+    def record_provider(self, name: str, latency: float, ok: bool,
+                        won: bool = False, cancelled: bool = False,
+                        model: str = "", error: Optional[BaseException] = None):
+        """One provider attempt inside a (possibly hedged) generation."""
+        with self._lock:
+            entry = self.providers.setdefault(name, {
+                "calls": 0, "wins": 0, "errors": 0, "cancelled": 0,
+                "latency_ms_total": 0.0, "last_latency_ms": None,
+            })
+            entry["calls"] += 1
+            entry["wins"] += won
+            entry["cancelled"] += cancelled
+            entry["errors"] += not ok and not cancelled
+            if ok:
+                entry["latency_ms_total"] += latency * 1000
+                entry["last_latency_ms"] = round(latency * 1000, 1)
+                self.latency.setdefault((name, model), LatencyHistogram()).observe(latency)
+                self.window.observe(latency)
+            if error is not None:
+                self.record_error(error)
+
+    def record_usage(self, prompt_tokens: int, cached_tokens: int,
+                     completion_tokens: int, latency: float):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            self.completion_tokens += completion_tokens
+            bucket = self._latency[cached_tokens > 0]
+            bucket[0] += latency
+            bucket[1] += 1
+            self.window.add(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def record_stream(self, first_token: Optional[float], to_status: float, cut: bool):
+        """Streamed call: time to first token and to a usable status, seconds."""
+        with self._lock:
+            if first_token is not None:
+                self._stream["ttft"][0] += first_token
+                self._stream["ttft"][1] += 1
+            self._stream["status"][0] += to_status
+            self._stream["status"][1] += 1
+            self.stream_cutoffs += cut
+
+    def avg_stream_ms(self, kind: str) -> Optional[float]:
+        total, count = self._stream[kind]
+        return round(total / count * 1000, 1) if count else None
+
+    def snapshot(self) -> dict:
+        """Consistent copy of everything, for another thread to read."""
+        with self._lock:
+            return {
+                "calls": {"total": self.total_calls, "successful": self.successful_calls,
+                          "failed": self.failed_calls, "success_rate": self.success_rate},
+                "tokens": {"prompt": self.prompt_tokens, "cached": self.cached_tokens,
+                           "completion": self.completion_tokens,
+                           "total": self.prompt_tokens + self.completion_tokens},
+                "providers": {
+                    name: {
+                        "wins": p["wins"],
+                        "errors": p["errors"],
+                        "cancelled": p["cancelled"],
+                        "last_latency_ms": p["last_latency_ms"],
+                        "avg_latency_ms": (round(p["latency_ms_total"] / p["wins"], 1)
+                                           if p["wins"] else None),
+                    }
+                    for name, p in self.providers.items()
+                },
+                "latency_ms": {f"{provider}:{model or 'varsayılan'}": hist.summary()
+                               for (provider, model), hist in self.latency.items()},
+                "errors": dict(sorted(self.errors.items(), key=lambda kv: -kv[1])),
+                "last_5_min": self.window.summary(),
+            }
+
+    @property
+    def cached_token_rate(self) -> str:
+        if self.prompt_tokens == 0:
+            return "N/A"
+        return f"{self.cached_tokens / self.prompt_tokens * 100:.0f}%"
+
+    def avg_latency_ms(self, prefix_cached: bool) -> Optional[float]:
+        total, count = self._latency[prefix_cached]
+        return round(total / count * 1000, 1) if count else None
+
     @property
     def uptime(self) -> str:
         elapsed = int(time.time() - self.start_time)
@@ -168,6 +708,13 @@ class Stats:
         rate = (self.successful_calls / self.total_calls) * 100
         return f"{rate:.0f}%"
 
+    @property
+    def cache_hit_rate(self) -> str:
+        lookups = self.cache_hits + self.cache_misses
+        if lookups == 0:
+            return "N/A"
+        return f"{self.cache_hits / lookups * 100:.0f}%"
+
 
 _cache = StatusCache()
 stats = Stats()
@@ -177,45 +724,975 @@ stats = Stats()
 #  Providers
 # ──────────────────────────────────────────────
 
-def _generate_with_gemini(prompt: str, config: dict) -> str:
-    import google.generativeai as genai
-    genai.configure(api_key=config["ai_api_key"])
-    model = genai.GenerativeModel(
-        model_name=config.get("ai_model", "gemini-2.0-flash"),
-        system_instruction=_build_system_prompt(config),
+class _AsyncRunner:
+    """
+    One background event loop shared by every provider call. Async clients
+    bind their connection pools to a loop, so the loop has to outlive a
+    single status for the client registry to be worth anything.
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, daemon=True,
+                                 name="ai-providers").start()
+            return self._loop
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the provider loop and block for its result."""
+        return self.submit(coro).result(timeout)
+
+
+_runner = _AsyncRunner()
+
+
+class ClientRegistry:
+    """
+    Provider SDK clients reused across calls, so their connection pools
+    (and TLS sessions) survive between statuses. Keyed by provider, API key,
+    model and base URL. On a config reload only clients whose key is gone
+    are retired, and each one is closed once its in-flight calls finish.
+    """
+
+    def __init__(self):
+        self._clients: dict[tuple, object] = {}
+        self._inflight: dict[int, int] = {}  # id(client) -> calls using it
+        self._retired: list[object] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(provider: str, config: dict) -> tuple:
+        return (provider, config.get("ai_api_key", ""), config.get("ai_model", ""),
+                config.get("ai_base_url") or None)
+
+    @contextmanager
+    def lease(self, provider: str, config: dict):
+        """The client for one call; it is not closed while the call holds it."""
+        key = self._key(provider, config)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = _CLIENT_FACTORIES[provider](config)
+                self._clients[key] = client
+            self._inflight[id(client)] = self._inflight.get(id(client), 0) + 1
+        try:
+            yield client
+        finally:
+            with self._lock:
+                remaining = self._inflight.pop(id(client)) - 1
+                if remaining:
+                    self._inflight[id(client)] = remaining
+                idle = self._take_idle()
+            self._close(idle)
+
+    def retain(self, keys: set[tuple]):
+        """Retire every client whose key is not in `keys`."""
+        with self._lock:
+            for key in [k for k in self._clients if k not in keys]:
+                self._retired.append(self._clients.pop(key))
+            idle = self._take_idle()
+        self._close(idle)
+
+    def clear(self):
+        self.retain(set())
+
+    def _take_idle(self) -> list:
+        idle = [c for c in self._retired if id(c) not in self._inflight]
+        self._retired = [c for c in self._retired if id(c) in self._inflight]
+        return idle
+
+    @staticmethod
+    def _close(clients: list):
+        for client in clients:
+            close = getattr(client, "close", None)
+            if callable(close):
+                try:
+                    result = close()
+                    if inspect.isawaitable(result):  # Async clients close on their loop
+                        _runner.submit(result)
+                except Exception:
+                    pass
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+
+DEFAULT_MODELS = {
+    "gemini": "gemini-2.0-flash",
+    "openai": "gpt-4o-mini",
+    "groq": "llama-3.3-70b-versatile",
+}
+
+
+def _model_name(config: dict) -> str:
+    provider = config.get("ai_provider", "gemini").lower()
+    return config.get("ai_model") or DEFAULT_MODELS.get(provider, "")
+
+
+class _GeminiClient:
+    """
+    One Gemini key and endpoint. genai.configure() is process-wide, so the
+    generativelanguage clients are built directly: two Gemini entries (a
+    chain, a hedge, a preview with another key) each keep their own.
+    """
+
+    def __init__(self, config: dict):
+        from google.ai import generativelanguage as glm
+        self.glm = glm
+        options = {"api_key": config["ai_api_key"]}
+        self.rest = bool(config.get("ai_base_url"))
+        if self.rest:
+            # Custom endpoints (proxies, the local mock) speak REST, which has no async client
+            options["api_endpoint"] = config["ai_base_url"]
+            self.service = glm.GenerativeServiceClient(transport="rest", client_options=options)
+            self.caches = glm.CacheServiceClient(transport="rest", client_options=options)
+        else:
+            self.service = glm.GenerativeServiceAsyncClient(client_options=options)
+            self.caches = glm.CacheServiceClient(client_options=options)
+
+    def content(self, text: str, role: str = ""):
+        return self.glm.Content(role=role, parts=[self.glm.Part(text=text)])
+
+    async def generate(self, request, stream: bool):
+        """Response, or an (async or sync) iterator of chunks when streaming."""
+        call = self.service.stream_generate_content if stream else self.service.generate_content
+        if self.rest:
+            return await asyncio.to_thread(call, request)
+        return await call(request)
+
+    async def count_tokens(self, model: str):
+        request = self.glm.CountTokensRequest(model=f"models/{model}",
+                                              contents=[self.content(".", "user")])
+        if self.rest:
+            return await asyncio.to_thread(self.service.count_tokens, request)
+        return await self.service.count_tokens(request)
+
+    def close(self):
+        self.caches.transport.close()
+        return self.service.transport.close()  # A coroutine for the async client
+
+
+def _make_openai_client(config: dict):
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=config["ai_api_key"], base_url=config.get("ai_base_url") or None)
+
+
+def _make_groq_client(config: dict):
+    from groq import AsyncGroq
+    return AsyncGroq(api_key=config["ai_api_key"], base_url=config.get("ai_base_url") or None)
+
+
+_CLIENT_FACTORIES = {
+    "gemini": _GeminiClient,
+    "openai": _make_openai_client,
+    "groq": _make_groq_client,
+}
+
+_clients = ClientRegistry()
+
+# Gemini CachedContent name per (api_key, base_url, model, system prompt): (name, refresh_at)
+GEMINI_CONTEXT_TTL = 3600
+# Smallest prompt (tokens, ~4 chars each) any Gemini model accepts for explicit caching
+GEMINI_MIN_CACHE_TOKENS = 1024
+_gemini_contexts: dict[tuple, tuple[Optional[str], float]] = {}
+_gemini_contexts_lock = threading.Lock()
+
+
+def _gemini_request(client: _GeminiClient, prompt: str, config: dict):
+    """
+    GenerateContentRequest for `prompt`, with the stable system prompt
+    served from an explicit CachedContent when it is long enough to be
+    cached. Built-in personas are far below the minimum, so this only kicks
+    in for long custom persona texts; a refusal is remembered too.
+    """
+    system_prompt = _build_system_prompt(config)
+    model_name = config.get("ai_model") or DEFAULT_MODELS["gemini"]
+    request = client.glm.GenerateContentRequest(model=f"models/{model_name}",
+                                                contents=[client.content(prompt, "user")])
+    if len(system_prompt) // 4 < GEMINI_MIN_CACHE_TOKENS:
+        request.system_instruction = client.content(system_prompt)
+        return request
+
+    key = (config.get("ai_api_key", ""), config.get("ai_base_url") or None,
+           model_name, _prompt_cache_key(system_prompt))
+    with _gemini_contexts_lock:
+        cached = _gemini_contexts.get(key)
+        if cached is None or (cached[0] is not None and time.time() >= cached[1]):
+            try:
+                content = client.caches.create_cached_content(
+                    cached_content=client.glm.CachedContent(
+                        model=f"models/{model_name}",
+                        system_instruction=client.content(system_prompt),
+                        ttl=datetime.timedelta(seconds=GEMINI_CONTEXT_TTL),
+                    ))
+                # Refresh a little before the server drops it
+                cached = (content.name, time.time() + GEMINI_CONTEXT_TTL * 0.9)
+            except Exception:
+                cached = (None, 0.0)
+            _gemini_contexts[key] = cached
+    if cached[0] is not None:
+        request.cached_content = cached[0]
+    else:
+        request.system_instruction = client.content(system_prompt)
+    return request
+
+
+def _gemini_text(response) -> str:
+    """Text of the first candidate; empty for chunks without text parts."""
+    if not response.candidates:
+        return ""
+    return "".join(part.text for part in response.candidates[0].content.parts)
+
+
+async def _generate_with_gemini(prompt: str, config: dict) -> str:
+    with _clients.lease("gemini", config) as client:
+        return await _gemini_call(client, prompt, config)
+
+
+async def _gemini_call(client: _GeminiClient, prompt: str, config: dict) -> str:
+    # CachedContent lookup may hit the network; keep it off the loop
+    request = await asyncio.to_thread(_gemini_request, client, prompt, config)
+    start = time.perf_counter()
+    if not config.get("stream", True):
+        response = await client.generate(request, stream=False)
+        _record_gemini_usage(response, time.perf_counter() - start)
+        return _gemini_text(response)
+
+    response = await client.generate(request, stream=True)
+    last = None
+
+    async def chunks():
+        if hasattr(response, "__aiter__"):
+            async for chunk in response:
+                yield chunk
+            return
+        iterator = iter(response)
+        while (chunk := await asyncio.to_thread(next, iterator, None)) is not None:
+            yield chunk
+
+    async def deltas():
+        nonlocal last
+        async for chunk in chunks():
+            last = chunk
+            yield _gemini_text(chunk)
+
+    text, cut = await _read_stream(deltas(), _batch_size(config), start)
+    if cut or last is None:
+        _estimate_usage(_build_system_prompt(config) + prompt, text, time.perf_counter() - start)
+    else:
+        _record_gemini_usage(last, time.perf_counter() - start)
+    return text
+
+
+def _record_gemini_usage(response, latency: float):
+    usage = getattr(response, "usage_metadata", None)
+    _account_usage(
+        prompt_tokens=getattr(usage, "prompt_token_count", 0) or 0,
+        cached_tokens=getattr(usage, "cached_content_token_count", 0) or 0,
+        completion_tokens=getattr(usage, "candidates_token_count", 0) or 0,
+        latency=latency,
     )
-    response = model.generate_content(prompt)
-    return _clean(response.text)
 
 
-def _generate_with_openai(prompt: str, config: dict) -> str:
-    from openai import OpenAI
-    client = OpenAI(api_key=config["ai_api_key"])
-    response = client.chat.completions.create(
-        model=config.get("ai_model", "gpt-4o-mini"),
+def _record_chat_usage(response, latency: float):
+    """Token usage of an OpenAI-compatible chat completion."""
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    _account_usage(
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        cached_tokens=getattr(details, "cached_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        latency=latency,
+    )
+
+
+async def _chat_completion(client, request: dict, config: dict) -> str:
+    """One OpenAI-compatible chat call, streamed unless the config says otherwise."""
+    start = time.perf_counter()
+    if not config.get("stream", True):
+        response = await client.chat.completions.create(**request)
+        _record_chat_usage(response, time.perf_counter() - start)
+        return response.choices[0].message.content or ""
+
+    stream = await client.chat.completions.create(**request, stream=True)
+    usage = None
+
+    async def deltas():
+        nonlocal usage
+        async for chunk in stream:
+            # OpenAI: `usage` on the last chunk; Groq: under `x_groq`
+            usage = (chunk if getattr(chunk, "usage", None)
+                     else getattr(chunk, "x_groq", None) or usage)
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ""
+
+    try:
+        text, cut = await _read_stream(deltas(), _batch_size(config), start)
+    finally:
+        await stream.close()  # Cut short: the server stops generating
+    if cut or getattr(usage, "usage", None) is None:
+        prompt_text = "".join(m["content"] for m in request["messages"])
+        _estimate_usage(prompt_text, text, time.perf_counter() - start)
+    else:
+        _record_chat_usage(usage, time.perf_counter() - start)
+    return text
+
+
+async def _generate_with_openai(prompt: str, config: dict) -> str:
+    system_prompt = _build_system_prompt(config)
+    request = dict(
+        model=config.get("ai_model", DEFAULT_MODELS["openai"]),
         messages=[
-            {"role": "system", "content": _build_system_prompt(config)},
+            {"role": "system", "content": system_prompt},
             {"role": "user", "content": prompt},
         ],
-        max_tokens=80,
+        max_tokens=80 * _batch_size(config),
         temperature=0.9,
     )
-    return _clean(response.choices[0].message.content)
+    # Sent as raw body fields: older SDKs lack these keyword arguments, and
+    # compatible endpoints may reject prompt_cache_key outright
+    extra = {}
+    if _is_openai_api(config):
+        extra["prompt_cache_key"] = _prompt_cache_key(system_prompt)
+    if config.get("stream", True):
+        extra["stream_options"] = {"include_usage": True}
+    if extra:
+        request["extra_body"] = extra
+    with _clients.lease("openai", config) as client:
+        return await _chat_completion(client, request, config)
+
+
+def _is_openai_api(config: dict) -> bool:
+    """True for OpenAI itself rather than a compatible endpoint."""
+    base_url = config.get("ai_base_url")
+    return not base_url or urlparse(base_url).hostname == "api.openai.com"
 
 
-def _generate_with_groq(prompt: str, config: dict) -> str:
-    from groq import Groq
-    client = Groq(api_key=config["ai_api_key"])
-    response = client.chat.completions.create(
-        model=config.get("ai_model", "llama-3.3-70b-versatile"),
+async def _generate_with_groq(prompt: str, config: dict) -> str:
+    request = dict(
+        model=config.get("ai_model", DEFAULT_MODELS["groq"]),
         messages=[
             {"role": "system", "content": _build_system_prompt(config)},
             {"role": "user", "content": prompt},
         ],
-        max_tokens=80,
+        max_tokens=80 * _batch_size(config),
         temperature=0.9,
     )
-    return _clean(response.choices[0].message.content)
+    with _clients.lease("groq", config) as client:
+        return await _chat_completion(client, request, config)
+
+
+PROVIDERS = {
+    "gemini": _generate_with_gemini,
+    "openai": _generate_with_openai,
+    "groq": _generate_with_groq,
+}
+
+
+# ──────────────────────────────────────────────
+#  Streaming
+# ──────────────────────────────────────────────
+
+STREAM_SLACK = 8  # Quotes and bullets _clean may still strip off a long reply
+
+_SENTENCE_END = re.compile(r"[.!?…]\s+(?=\w)")
+# A period after these is an abbreviation or a version, not a sentence end: Mr. St. v2. 3.
+_ABBREVIATION = re.compile(r"(?:\b\w{1,3}|\w*\d\w*)\.\Z")
+STREAM_MIN_SENTENCE = 24  # Shorter first "sentences" are read on rather than cut
+
+
+def _stream_cutoff(text: str, batch_size: int) -> Optional[str]:
+    """
+    Is the streamed text already a whole answer? Returns the part worth
+    keeping, or None to read on. One status: the first line with text
+    (past blank lines and code fences), the first sentence once a second
+    one starts (not at an abbreviation, and not while still short), or
+    enough characters for _clean to truncate anyway. Batch mode: the JSON
+    array once it closes.
+    """
+    if batch_size > 1:
+        start = text.find("[")
+        end = text.find("]", start + 1)
+        while start >= 0 and end > start:
+            try:
+                json.loads(text[start:end + 1])
+                return text[start:end + 1]
+            except ValueError:
+                end = text.find("]", end + 1)  # A "]" inside a candidate
+        return None
+    body = text.lstrip()
+    while "\n" in body:
+        line, rest = body.split("\n", 1)
+        if _clean(line) and not line.lstrip().startswith("```"):
+            return line
+        body = rest.lstrip()  # Blank, decoration or a code fence: not the status yet
+    for sentence in _SENTENCE_END.finditer(body):
+        kept = body[:sentence.start() + 1]
+        if len(kept) >= STREAM_MIN_SENTENCE and not _ABBREVIATION.search(kept):
+            return kept
+    if len(body) >= MAX_STATUS_LENGTH + STREAM_SLACK:
+        return body
+    return None
+
+
+async def _read_stream(deltas, batch_size: int, start: float) -> tuple[str, bool]:
+    """Accumulate streamed text until it's enough; (text, cut short?)."""
+    text, first_token = "", None
+    try:
+        async for delta in deltas:
+            if not delta:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            text += delta
+            kept = _stream_cutoff(text, batch_size)
+            if kept is not None:
+                stats.record_stream(first_token, time.perf_counter() - start, cut=True)
+                return kept, True
+    finally:
+        await deltas.aclose()
+    stats.record_stream(first_token, time.perf_counter() - start, cut=False)
+    return text, False
+
+
+def _estimate_usage(prompt_text: str, completion: str, latency: float):
+    """
+    A stream closed early never sees the final usage chunk; bill the budget
+    by the usual ~4 characters per token instead of not at all.
+    """
+    _account_usage(prompt_tokens=len(prompt_text) // 4, cached_tokens=0,
+                   completion_tokens=len(completion) // 4 + 1, latency=latency)
+
+
+# ──────────────────────────────────────────────
+#  Circuit Breakers
+# ──────────────────────────────────────────────
+
+class CircuitOpenError(RuntimeError):
+    """Every provider in the chain is cooling down; no call was made."""
+
+
+class CircuitBreaker:
+    """
+    Per-provider health. Closed: calls flow and outcomes fill a sliding
+    window. Too many failures (or calls slower than `slow_call`), or a 429,
+    open it: the provider is skipped at zero cost for a cooldown that
+    doubles on every failed probe. After the cooldown one half-open probe
+    decides whether it closes again. Hedged calls report from several
+    threads, so every state change holds the lock.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, window: int = 10, min_calls: int = 4, failure_rate: float = 0.5,
+                 slow_call: float = 10.0, cooldown: float = 30.0, max_cooldown: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._min_calls = min_calls
+        self._failure_rate = failure_rate
+        self._slow_call = slow_call
+        self._base_cooldown = cooldown
+        self._max_cooldown = max_cooldown
+        self._cooldown = cooldown
+        self._clock = clock
+        self.state = self.CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self.latency: Optional[float] = None  # EWMA of successful calls, seconds
+        self.last_attempt = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """May a call go out now? Claims the probe slot when half-open."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if self._clock() - self._opened_at < self._cooldown:
+                    return False
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self, latency: float):
+        with self._lock:
+            self.latency = latency if self.latency is None else 0.7 * self.latency + 0.3 * latency
+            if self.state == self.HALF_OPEN:
+                self._close()
+                return
+            self._outcomes.append(latency <= self._slow_call)
+            self._check()
+
+    def record_failure(self, rate_limited: bool = False):
+        with self._lock:
+            if self.state == self.HALF_OPEN or rate_limited:
+                self._trip(backoff=self.state == self.HALF_OPEN)
+                return
+            self._outcomes.append(False)
+            self._check()
+
+    def record_cancelled(self, elapsed: float):
+        """
+        Lost a hedge race: not a failure, but it took at least `elapsed`,
+        which keeps routing from preferring it on a stale latency.
+        """
+        with self._lock:
+            if self.latency is not None:
+                self.latency = 0.7 * self.latency + 0.3 * max(elapsed, self.latency)
+            else:
+                self.latency = elapsed
+            self._probing = False
+
+    def release(self):
+        """A probe was cancelled before it finished; let another one try."""
+        with self._lock:
+            self._probing = False
+
+    def _check(self):
+        if len(self._outcomes) >= self._min_calls:
+            failures = self._outcomes.count(False)
+            if failures / len(self._outcomes) >= self._failure_rate:
+                self._trip()
+
+    def _trip(self, backoff: bool = False):
+        if backoff:
+            self._cooldown = min(self._cooldown * 2, self._max_cooldown)
+        self.state = self.OPEN
+        self._opened_at = self._clock()
+        self._probing = False
+        self._outcomes.clear()
+
+    def _close(self):
+        self.state = self.CLOSED
+        self._cooldown = self._base_cooldown
+        self._probing = False
+        self._outcomes.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+                "cooldown_s": self._cooldown,
+            }
+
+
+_breakers: dict[tuple, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def _breaker(config: dict) -> CircuitBreaker:
+    key = ClientRegistry._key(config["ai_provider"], config)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(key)
+            if breaker is None:
+                breaker = _breakers[key] = CircuitBreaker()
+    return breaker
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    """429 / quota errors across the three SDKs."""
+    code = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return code == 429 or type(error).__name__ in ("RateLimitError", "ResourceExhausted")
+
+
+# ──────────────────────────────────────────────
+#  Rate Limits & Daily Budget
+# ──────────────────────────────────────────────
+
+class BudgetExceededError(RuntimeError):
+    """The local rate limit or the daily budget forbids another paid call."""
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` calls per second, bursts up to `capacity`.
+    A rate of 0 means unlimited. Shared by the bot loop and the
+    pre-generator, so every read and write holds the lock.
+    """
+
+    def __init__(self, rate: float, capacity: float,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._clock = clock
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def configure(self, rate: float, capacity: float):
+        with self._lock:
+            self.rate, self.capacity = rate, capacity
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            if self.rate <= 0:
+                return float("inf")
+            self._refill()
+            return self._tokens
+
+    def available(self) -> bool:
+        return self.tokens >= 1
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self.rate <= 0:
+                return True
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class DailyBudget:
+    """
+    Paid calls and tokens spent today (local time). A limit of 0 means
+    unlimited. Token counts come from provider responses where available.
+    With a store attached the counters survive restarts.
+    """
+
+    def __init__(self, max_calls: int = 0, max_tokens: int = 0,
+                 today: Callable[[], datetime.date] = datetime.date.today):
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self._today = today
+        self._day = today()
+        self.calls = 0
+        self.tokens = 0
+        self._store: Optional[PersistentStatusCache] = None
+        self._lock = threading.Lock()
+
+    def attach(self, store: Optional[PersistentStatusCache]):
+        """Persist the counters in `store` (None detaches), adopting today's saved ones."""
+        with self._lock:
+            self._store = store
+            if store is None:
+                return
+            self._roll()
+            saved = store.load_budget()
+            if saved and saved[0] == self._day.isoformat():
+                self.calls = max(self.calls, saved[1])
+                self.tokens = max(self.tokens, saved[2])
+
+    def _save(self):
+        if self._store is not None:
+            self._store.save_budget(self._day.isoformat(), self.calls, self.tokens)
+
+    def _roll(self):
+        day = self._today()
+        if day != self._day:
+            self._day, self.calls, self.tokens = day, 0, 0
+
+    def _remaining_fraction(self) -> float:
+        fractions = [1.0]
+        if self.max_calls:
+            fractions.append(1 - self.calls / self.max_calls)
+        if self.max_tokens:
+            fractions.append(1 - self.tokens / self.max_tokens)
+        return max(0.0, min(fractions))
+
+    def exhausted(self) -> bool:
+        with self._lock:
+            self._roll()
+            return self._remaining_fraction() <= 0
+
+    def tight(self, reserve: float) -> bool:
+        """Less than `reserve` (0..1) of either allowance left."""
+        with self._lock:
+            self._roll()
+            return self._remaining_fraction() < reserve
+
+    def spend_call(self) -> bool:
+        with self._lock:
+            self._roll()
+            if self._remaining_fraction() <= 0:
+                return False
+            self.calls += 1
+            self._save()
+            return True
+
+    def add_tokens(self, tokens: int):
+        with self._lock:
+            self._roll()
+            self.tokens += tokens
+            self._save()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._roll()
+            return {
+                "day": self._day.isoformat(),
+                "calls_used": self.calls,
+                "calls_limit": self.max_calls or None,
+                "calls_remaining": max(0, self.max_calls - self.calls) if self.max_calls else None,
+                "tokens_used": self.tokens,
+                "tokens_limit": self.max_tokens or None,
+                "tokens_remaining": (max(0, self.max_tokens - self.tokens)
+                                     if self.max_tokens else None),
+            }
+
+
+# Both off by default (0 = unlimited); opt in through config.json
+RATE_LIMIT_PER_MINUTE = 0
+RATE_LIMIT_BURST = 3  # Only used with a rate limit
+DAILY_CALL_BUDGET = 0
+BUDGET_RESERVE = 0.2  # Below this share left, prefer stale cache over new calls
+
+_buckets: dict[tuple, TokenBucket] = {}
+_budget = DailyBudget()
+
+
+def _bucket(config: dict) -> TokenBucket:
+    """Per-provider (and per API key) bucket, following config changes."""
+    key = ClientRegistry._key(config["ai_provider"], config)
+    rate = max(0, config.get("rate_limit_per_minute", RATE_LIMIT_PER_MINUTE) or 0) / 60
+    burst = max(1, config.get("rate_limit_burst", RATE_LIMIT_BURST))
+    bucket = _buckets.get(key)
+    if bucket is None:
+        bucket = _buckets.setdefault(key, TokenBucket(rate, burst))
+    bucket.configure(rate, burst)
+    return bucket
+
+
+def _configure_budget(config: dict):
+    _budget.max_calls = max(0, int(config.get("daily_call_budget", DAILY_CALL_BUDGET) or 0))
+    _budget.max_tokens = max(0, int(config.get("daily_token_budget", 0) or 0))
+
+
+def _account_usage(prompt_tokens: int, cached_tokens: int,
+                   completion_tokens: int, latency: float):
+    stats.record_usage(prompt_tokens, cached_tokens, completion_tokens, latency)
+    _budget.add_tokens(prompt_tokens + completion_tokens)
+
+
+# ──────────────────────────────────────────────
+#  Provider Chain & Hedging
+# ──────────────────────────────────────────────
+
+HEDGE_DELAY = 2.0
+PROVIDER_TIMEOUT = 15.0
+
+
+def _chain_entry(config: dict, entry: dict) -> Optional[dict]:
+    """Flatten a {"provider", "api_key", "model", "base_url"} block into a config."""
+    primary = config.get("ai_provider", "gemini").lower()
+    name = str(entry.get("provider", primary)).lower()
+    if name not in PROVIDERS:
+        return None
+    flat = dict(config, ai_provider=name)
+    if name != primary:
+        # Another vendor: the primary's model and endpoint don't apply
+        flat.pop("ai_model", None)
+        flat.pop("ai_base_url", None)
+    for src, dst in (("api_key", "ai_api_key"), ("model", "ai_model"),
+                     ("base_url", "ai_base_url")):
+        if entry.get(src):
+            flat[dst] = entry[src]
+    return flat
+
+
+def _provider_configs(config: dict) -> list[dict]:
+    """
+    The ordered provider chain: the primary, the optional `hedge_provider`
+    block, then each `provider_chain` entry, flattened into config dicts the
+    provider functions read directly. Duplicates are dropped.
+    """
+    primary = config.get("ai_provider", "gemini").lower()
+    configs = [dict(config, ai_provider=primary if primary in PROVIDERS else "gemini")]
+    extra = [config.get("hedge_provider") or {}] + list(config.get("provider_chain") or [])
+    seen = {ClientRegistry._key(configs[0]["ai_provider"], configs[0])}
+    for entry in extra:
+        flat = _chain_entry(config, entry) if entry else None
+        if flat is None:
+            continue
+        key = ClientRegistry._key(flat["ai_provider"], flat)
+        if key not in seen:
+            seen.add(key)
+            configs.append(flat)
+    return configs
+
+
+EXPLORE_EVERY = 20
+_route_count = itertools.count(1)
+
+
+def _route(configs: list[dict]) -> list[dict]:
+    """
+    Providers whose breaker lets a call through, lowest observed latency
+    first; unmeasured ones keep chain order after the measured. Every
+    EXPLORE_EVERY calls the least recently tried provider goes first, so a
+    backup that got faster (or was never measured) can win its place.
+    """
+    allowed = [(i, cfg) for i, cfg in enumerate(configs)
+               if _bucket(cfg).available() and _breaker(cfg).allow()]
+
+    def rank(item):
+        i, cfg = item
+        latency = _breaker(cfg).latency
+        return (latency is None, latency or 0.0, i)
+
+    ordered = [cfg for _, cfg in sorted(allowed, key=rank)]
+    if len(ordered) > 1 and next(_route_count) % EXPLORE_EVERY == 0:
+        stalest = min(ordered, key=lambda cfg: _breaker(cfg).last_attempt)
+        ordered.remove(stalest)
+        ordered.insert(0, stalest)
+    return ordered
+
+
+async def _timed(prompt: str, config: dict, timeout: float) -> tuple[str, list[str], float]:
+    name = config["ai_provider"]
+    start = time.perf_counter()
+    raw = await asyncio.wait_for(PROVIDERS[name](prompt, config), timeout)
+    candidates = _parse_candidates(raw, _batch_size(config))
+    if not candidates:
+        raise ValueError(f"{name}: boş yanıt")
+    return name, candidates, time.perf_counter() - start
+
+
+async def _generate_hedged(prompt: str, configs: list[dict], hedge_delay: float,
+                           timeout: float = PROVIDER_TIMEOUT) -> tuple[str, list[str]]:
+    """
+    Try the routed chain: start the best provider; if it hasn't answered
+    within hedge_delay (or fails), start the next one too. The first valid
+    answer wins and the rest are cancelled. Providers with an open breaker
+    are skipped outright. Returns (provider, candidate statuses).
+    """
+    queue = _route(configs)
+    if not queue:
+        if not any(_bucket(cfg).available() for cfg in configs):
+            raise BudgetExceededError("Hız sınırı: sağlayıcı çağrı hakkı doldu")
+        raise CircuitOpenError("Tüm sağlayıcılar devre dışı (soğuma süresinde)")
+    pending: dict[asyncio.Task, dict] = {}
+    started = {}
+    last_error: Optional[BaseException] = None
+
+    denied = ""
+
+    def launch() -> bool:
+        """Start the next affordable provider; False if none may be called."""
+        nonlocal denied
+        while queue:
+            cfg = queue.pop(0)
+            if not _bucket(cfg).try_acquire():
+                _breaker(cfg).release()
+                denied = "Hız sınırı: sağlayıcı çağrı hakkı doldu"
+                continue
+            if not _budget.spend_call():
+                for skipped in (cfg, *queue):
+                    _breaker(skipped).release()
+                queue.clear()
+                denied = "Günlük bütçe doldu"
+                return False
+            start(cfg)
+            return True
+        return False
+
+    def start(cfg: dict):
+        _breaker(cfg).last_attempt = time.monotonic()
+        task = asyncio.create_task(_timed(prompt, cfg, timeout))
+        pending[task] = cfg
+        started[task] = time.perf_counter()
+
+    if not launch():
+        raise BudgetExceededError(denied)
+    try:
+        while pending:
+            wait_for = hedge_delay if queue else None
+            done, _ = await asyncio.wait(pending, timeout=wait_for,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:  # Current pick is slow: hedge, if it's affordable
+                if launch():
+                    stats.count(hedges_fired=1)
+                continue
+            for task in done:
+                cfg = pending.pop(task)
+                name = cfg["ai_provider"]
+                try:
+                    name, candidates, latency = task.result()
+                except Exception as e:
+                    stats.record_provider(name, time.perf_counter() - started[task], ok=False,
+                                          model=_model_name(cfg), error=e)
+                    _breaker(cfg).record_failure(rate_limited=_is_rate_limited(e))
+                    last_error = e
+                    continue
+                stats.record_provider(name, latency, ok=True, won=True, model=_model_name(cfg))
+                _breaker(cfg).record_success(latency)
+                return name, candidates
+            if queue and not pending:  # Everything running failed: fail over now
+                launch()
+    finally:
+        for task, cfg in pending.items():
+            task.cancel()
+            elapsed = time.perf_counter() - started[task]
+            _breaker(cfg).record_cancelled(elapsed)
+            stats.record_provider(cfg["ai_provider"], elapsed, ok=False, cancelled=True,
+                                  model=_model_name(cfg))
+        # Routed but never launched: hand back any half-open probe slot
+        for cfg in queue:
+            _breaker(cfg).release()
+    raise last_error or RuntimeError("Sağlayıcı yok")
+
+
+async def _warm_up_one(config: dict):
+    provider = config["ai_provider"]
+    with _clients.lease(provider, config) as client:
+        if provider == "gemini":
+            await client.count_tokens(_model_name(config))
+        else:
+            await client.models.list()
+
+
+def warm_up(config: dict) -> Optional[float]:
+    """
+    Build the configured providers' clients and open their connections with
+    a free request (model list; Gemini: token count), so the first status
+    skips the cold handshake.
+    Returns the seconds spent, or None if a provider was unreachable.
+    """
+    configs = [c for c in _provider_configs(config) if c.get("ai_api_key")]
+    if not configs:
+        return None
+    start = time.perf_counter()
+    try:
+        for cfg in configs:
+            _runner.run(_warm_up_one(cfg))
+    except Exception as e:
+        print(f"  ⚠️  Bağlantı ısıtma başarısız: {e}")
+        return None
+    return time.perf_counter() - start
+
+
+def reset_clients(config: Optional[dict] = None):
+    """
+    After a config reload: retire the provider clients (and Gemini cached
+    contents) that `config` no longer uses. Without a config, retire all.
+    """
+    configs = _provider_configs(config) if config is not None else []
+    _clients.retain({ClientRegistry._key(c["ai_provider"], c) for c in configs})
+    gemini = {(c.get("ai_api_key", ""), c.get("ai_base_url") or None, _model_name(c))
+              for c in configs if c["ai_provider"] == "gemini"}
+    with _gemini_contexts_lock:
+        for key in [k for k in _gemini_contexts if k[:3] not in gemini]:
+            del _gemini_contexts[key]
 
 
 # ──────────────────────────────────────────────
@@ -237,30 +1714,54 @@ def _resolve_persona(config: dict) -> str:
     return persona_key
 
 
-def _build_system_prompt(config: dict) -> str:
-    lang_code = config.get("language", "tr")
-    language_name = LANGUAGE_MAP.get(lang_code, lang_code)
-    persona_key = config.get("persona", "custom")
-    persona_desc = _resolve_persona(config)
-
+@functools.lru_cache(maxsize=32)
+def _system_prompt(persona_key: str, persona_desc: str, lang_code: str) -> str:
+    """
+    Byte-identical for a given persona and language, so providers can reuse
+    the cached prefix. Per-call variety lives at the end of the user prompt.
+    """
     examples_list = PERSONA_EXAMPLES.get(persona_key, PERSONA_EXAMPLES["custom"])
-    examples = "\n".join(
-        f"- {ex}" for ex in random.sample(examples_list, min(3, len(examples_list)))
-    )
-
     return STORYTELLER_PROMPT.format(
         max_len=MAX_STATUS_LENGTH,
         persona=persona_desc,
-        language_name=language_name,
-        examples=examples,
+        language_name=LANGUAGE_MAP.get(lang_code, lang_code),
+        examples="\n".join(f"- {ex}" for ex in examples_list),
     )
 
 
-def _build_user_prompt(activity_context: str) -> str:
-    """Build the user prompt with activity data and variety enforcement."""
+def _build_system_prompt(config: dict) -> str:
+    return _system_prompt(
+        config.get("persona", "custom"),
+        _resolve_persona(config),
+        config.get("language", "tr"),
+    )
+
+
+def _prompt_cache_key(system_prompt: str) -> str:
+    """Short stable id of a system prompt, for provider cache routing."""
+    return hashlib.blake2b(system_prompt.encode("utf-8"), digest_size=8).hexdigest()
+
+
+BATCH_ROTATE_SECONDS = 120
+MAX_BATCH_SIZE = 8
+
+
+def _batch_size(config: dict) -> int:
+    """Candidates per call: 1 is the classic single-sentence mode."""
+    return max(1, min(MAX_BATCH_SIZE, int(config.get("batch_size", 1) or 1)))
+
+
+def _build_user_prompt(activity_context: str, batch_size: int = 1,
+                       recent: Sequence[str] = ()) -> str:
+    """Build the user prompt with activity data and variety enforcement against `recent`."""
     prompt = activity_context
 
-    recent = _cache.recent
+    if batch_size > 1:
+        # Candidates of one batch differ from each other; no avoid-list needed
+        prompt += (f"\n\n{batch_size} FARKLI aday cümle yaz. SADECE JSON dizisi döndür, "
+                   f'başka hiçbir şey yazma: ["...", "..."]')
+        return prompt
+
     if recent:
         avoid = " | ".join(f'"{s}"' for s in recent)
         prompt += f"\n\nÖNCEKİ MESAJLAR (bunlardan farklı yaz): {avoid}"
@@ -268,6 +1769,88 @@ def _build_user_prompt(activity_context: str) -> str:
     return prompt
 
 
+def _parse_candidates(raw: str, batch_size: int) -> list[str]:
+    """
+    Cleaned statuses from a provider reply: the JSON array asked for in
+    batch mode (tolerating code fences and chatter around it), else one
+    candidate per line.
+    """
+    if not raw:
+        return []
+    if batch_size == 1:
+        status = _clean(raw)
+        return [status] if status else []
+
+    items: list = []
+    start, end = raw.find("["), raw.rfind("]")
+    if 0 <= start < end:
+        try:
+            items = json.loads(raw[start:end + 1])
+        except ValueError:
+            items = []
+    if not isinstance(items, list) or not items:
+        items = raw.splitlines()
+
+    candidates = []
+    for item in items:
+        status = _clean(item) if isinstance(item, str) else ""
+        if status and status not in candidates and status not in ("[", "]", "```", "json"):
+            candidates.append(status)
+    return candidates[:batch_size]
+
+
+TEMPLATES = {
+    "tr": {
+        "game": "🎮 {game} oynuyor",
+        "code_music": "🎧 {track} eşliğinde {file} üzerinde çalışıyor",
+        "code": "💻 {project} projesinde {file} düzenliyor",
+        "music": "🎧 {artist} — {track} dinliyor",
+        "browser": "🌐 Tarayıcıda {platform} açık",
+        "messaging": "💬 Mesajlaşıyor",
+        "app": "⚡ {app} kullanıyor",
+    },
+    "en": {
+        "game": "🎮 Playing {game}",
+        "code_music": "🎧 Working on {file} to {track}",
+        "code": "💻 Editing {file} in {project}",
+        "music": "🎧 Listening to {track} by {artist}",
+        "browser": "🌐 Browsing {platform}",
+        "messaging": "💬 Chatting",
+        "app": "⚡ Using {app}",
+    },
+}
+
+
+def _template_status(context: "FullContext", config: dict) -> str:
+    """Zero-cost status straight from the context, for when calls are rationed."""
+    templates = TEMPLATES.get(config.get("language", "tr"), TEMPLATES["en"])
+    if context.game_name:
+        kind = "game"
+    elif context.is_messaging:
+        kind = "messaging"
+    elif context.vscode_file and context.spotify_track:
+        kind = "code_music"
+    elif context.vscode_file:
+        kind = "code"
+    elif context.spotify_track:
+        kind = "music"
+    elif context.browser_platform:
+        kind = "browser"
+    elif context.active_app:
+        kind = "app"
+    else:
+        return config.get("fallback_status", "💤 AFK")
+    return _clean(templates[kind].format(
+        game=context.game_name,
+        file=context.vscode_file,
+        project=context.vscode_project or "VS Code",
+        track=context.spotify_track,
+        artist=context.spotify_artist or "?",
+        platform=context.browser_platform,
+        app=context.active_app,
+    ))
+
+
 def _clean(text: str) -> str:
     """Aggressively clean AI output."""
     if not text:
@@ -299,46 +1882,807 @@ def _clean(text: str) -> str:
 
 
 # ──────────────────────────────────────────────
-#  Public API
+#  Offline Generator
 # ──────────────────────────────────────────────
 
-def generate_status(activity_context: str, config: dict) -> str:
+_LOG_ENTRY = re.compile(r"^\[\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}\] ", re.M)
+_LOG_STATUS = re.compile(r' (?:→|->) "(.*)"\s*$', re.S)
+# `{language|persona} ` after the timestamp: which voice wrote the status
+_LOG_TAG = re.compile(r"\{([^{}|\s]+\|[^{}\s]+)\} ")
+
+
+def _history_tag(config: dict) -> str:
     """
-    Generate a storytelling Discord status from multi-source activity context.
+    Language and persona a status was written in. Custom and edited preset
+    personas get a short hash of their text, so a rewrite starts afresh.
     """
-    if not activity_context or activity_context.strip() in ("", "Bilgisayar başında"):
-        return config.get("fallback_status", "💤 AFK")
+    persona = config.get("persona", "custom")
+    desc = _resolve_persona(config)
+    if desc != persona:
+        persona += "~" + hashlib.blake2b(desc.encode("utf-8"), digest_size=4).hexdigest()
+    return f"{config.get('language', 'tr')}|{persona.replace(' ', '_')}"
 
-    # Cache check
-    cached = _cache.get(activity_context)
-    if cached:
-        stats.cache_hits += 1
-        return cached
 
-    provider = config.get("ai_provider", "gemini").lower()
-    stats.total_calls += 1
-    prompt = _build_user_prompt(activity_context)
+class StatusHistoryLog:
+    """
+    Appends published statuses to status_history.log, the file the
+    offline generator learns from. Shared by the CLI and the dashboard.
+    Alternating between activities re-serves cached statuses, so a
+    (context, status) pair among the last `max_seen` is written once.
+    """
+
+    def __init__(self, path: Path, max_seen: int = 512):
+        self._path = Path(path)
+        self._seen: dict[tuple[tuple, str], None] = {}
+        self._max_seen = max_seen
+        self._lock = threading.Lock()
+
+    def log(self, context: "FullContext", status: str, config: Optional[dict] = None):
+        """
+        `config` is the one the provider was asked with; statuses not
+        written by a provider (media titles) pass None and go in untagged,
+        which keeps them out of the offline generator.
+        """
+        key = (context.key, status)
+        with self._lock:
+            if key in self._seen:
+                return
+            self._seen[key] = None
+            if len(self._seen) > self._max_seen:
+                self._seen.pop(next(iter(self._seen)))
+        tag = f"{{{_history_tag(config)}}} " if config is not None else ""
+        try:
+            ts = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(f'[{ts}] {tag}{context.build_prompt()} → "{status}"\n')
+        except OSError:
+            pass
+
+
+# Prompt lines written by FullContext.build_prompt(), back into slots
+_PROMPT_SLOTS = [
+    (re.compile(r"^OYUN: (?P<game>.+) oynuyor$"), ()),
+    (re.compile(r"^AKTİF: Mesajlaşma uygulamasında"), ("messaging",)),
+    (re.compile(r"^AKTİF: (?P<app>.+?)(?: — .*)?$"), ()),
+    (re.compile(r"^KOD: VS Code'da (?P<file>.+?) dosyasını düzenliyor"
+                r"(?: \((?P<project>.+) projesi\))?$"), ()),
+    (re.compile(r"^MÜZİK: (?P<track>.+?)(?: \((?P<artist>[^()]+)\))? dinliyor$"), ()),
+    (re.compile(r"^TARAYICI: (?P<platform>.+?)'da(?: — (?P<page>.+)| geziniyor)$"), ()),
+]
+
+
+def _prompt_slots(context_str: str) -> dict[str, str]:
+    slots: dict[str, str] = {}
+    for line in context_str.splitlines():
+        for pattern, flags in _PROMPT_SLOTS:
+            match = pattern.match(line.strip())
+            if match:
+                slots.update({k: v for k, v in match.groupdict().items() if v})
+                slots.update({flag: "1" for flag in flags})
+                break
+    return slots
+
+
+def _context_slots(context: "FullContext") -> dict[str, str]:
+    slots = {
+        "game": context.game_name,
+        "app": context.active_app if context.active_app != "Unknown" else "",
+        "file": context.vscode_file,
+        "project": context.vscode_project,
+        "track": context.spotify_track,
+        "artist": context.spotify_artist,
+        "platform": context.browser_platform,
+        "page": context.browser_page_title,
+    }
+    if context.game_name:  # The prompt shows nothing else while gaming
+        slots = {"game": context.game_name}
+    if context.is_messaging:
+        slots["messaging"] = "1"
+    return {k: v for k, v in slots.items() if v}
+
+
+def _template_shape(template: str) -> re.Pattern:
+    return re.compile(".+".join(re.escape(part) for part in re.split(r"\{\w+\}", template)))
+
+
+# What _template_status() writes, for telling those apart from provider output
+_TEMPLATE_SHAPES = [_template_shape(t) for lang in TEMPLATES.values() for t in lang.values()]
+
+
+class LocalGenerator:
+    """
+    Network-free statuses learned from our own history: every logged
+    (context, status) pair becomes a template by swapping the context's
+    values (app, file, track…) for slots, filed under the language and
+    persona it was written in and the set of slots the context had.
+    Generating picks a template for the current voice and slot set (or the
+    closest subset) and fills it in — microseconds, no I/O. Only provider
+    output is learned: the log also holds AFK/fallback lines, fixed
+    templates and media titles, which would otherwise be served back as "AI".
+    """
+
+    MIN_SLOT_LEN = 3        # Shorter values would match inside unrelated words
+    MAX_PER_SIGNATURE = 50
+    AFK_MARKER = "💤"
+
+    def __init__(self, fallback_status: Optional[str] = None):
+        self._skip = {_clean(s) for s in ("💤 AFK", "💤 AFK — Birazdan dönerim.", fallback_status) if s}
+        # (history tag, slot signature) → [(template, slots used)]
+        self._templates: dict[tuple[str, frozenset], list[tuple[str, frozenset]]] = {}
+        self._turn: dict[tuple[str, frozenset], int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_log(cls, path: Path, fallback_status: Optional[str] = None) -> "LocalGenerator":
+        """
+        Entries `[ts] {language|persona} context → "status"` (`->` in older
+        dashboard logs). Untagged ones — older logs, media titles — are
+        skipped: there is no telling which voice wrote them.
+        """
+        generator = cls(fallback_status)
+        try:
+            text = Path(path).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return generator
+        starts = [m.end() for m in _LOG_ENTRY.finditer(text)]
+        ends = [m.start() for m in _LOG_ENTRY.finditer(text)][1:] + [len(text)]
+        for start, end in zip(starts, ends):
+            tag = _LOG_TAG.match(text, start, end)
+            if tag is None:
+                continue
+            match = _LOG_STATUS.search(text, tag.end(), end)
+            if match:
+                generator.add(_prompt_slots(text[tag.end():match.start()]), match.group(1),
+                              tag.group(1))
+        return generator
+
+    def learn(self, context: "FullContext", status: str, config: dict):
+        self.add(_context_slots(context), status, _history_tag(config))
 
+    def learnable(self, status: str) -> bool:
+        """Not the fallback, not an AFK line, not a fixed template."""
+        return (bool(status) and status not in self._skip
+                and not status.startswith(self.AFK_MARKER)
+                and not any(shape.fullmatch(status) for shape in _TEMPLATE_SHAPES))
+
+    def add(self, slots: dict[str, str], status: str, tag: str):
+        status = _clean(status)
+        if not self.learnable(status):
+            return
+        values = {k: v for k, v in slots.items() if k != "messaging" and len(v) >= self.MIN_SLOT_LEN}
+        template = status.replace("{", "{{").replace("}", "}}")
+        used = set()
+        if values:
+            by_value = {re.escape(v.replace("{", "{{").replace("}", "}}")): k
+                        for k, v in sorted(values.items(), key=lambda kv: -len(kv[1]))}
+            pattern = re.compile("|".join(by_value))
+
+            def to_slot(match: re.Match) -> str:
+                name = by_value[re.escape(match.group(0))]
+                used.add(name)
+                return "{" + name + "}"
+
+            template = pattern.sub(to_slot, template)
+        signature = (tag, frozenset(slots))
+        with self._lock:
+            bucket = self._templates.setdefault(signature, [])
+            entry = (template, frozenset(used))
+            if entry in bucket:
+                return
+            bucket.append(entry)
+            if len(bucket) > self.MAX_PER_SIGNATURE:
+                bucket.pop(0)
+
+    def generate(self, context: "FullContext", config: dict) -> Optional[str]:
+        slots = _context_slots(context)
+        tag = _history_tag(config)
+        signature = (tag, frozenset(slots))
+        with self._lock:
+            options = self._templates.get(signature)
+            if not options:
+                # Closest learned kind in this voice whose slots this context can all fill
+                fits = [sig for sig in self._templates
+                        if sig[0] == tag and sig[1] and sig[1] <= signature[1]]
+                if not fits:
+                    return None
+                signature = max(fits, key=lambda sig: len(sig[1]))
+                options = self._templates[signature]
+            usable = [t for t, used in options if used <= slots.keys()]
+            if not usable:
+                return None
+            turn = self._turn.get(signature, 0)
+            self._turn[signature] = turn + 1
+            template = usable[turn % len(usable)]
+        try:
+            return _clean(template.format_map(slots)) or None
+        except (KeyError, ValueError, IndexError):
+            return None
+
+    def __len__(self) -> int:
+        return sum(len(bucket) for bucket in self._templates.values())
+
+
+# ──────────────────────────────────────────────
+#  Speculative Pre-generation
+# ──────────────────────────────────────────────
+
+PREGEN_INTERVAL = 30.0
+PREGEN_IDLE_AFTER = 20.0     # Quiet seconds before spending anything
+PREGEN_TOP = 8
+PREGEN_BUDGET_SHARE = 0.5    # Stops once half of today's budget is gone
+
+
+def _context_json(context: "FullContext") -> str:
+    return json.dumps({f.name: getattr(context, f.name) for f in dataclasses.fields(context)
+                       if not f.name.startswith("_") and f.name != "stale_sources"},
+                      ensure_ascii=False)
+
+
+def _context_from_json(payload: str) -> Optional["FullContext"]:
+    from trackers import FullContext
     try:
-        if provider == "openai":
-            status = _generate_with_openai(prompt, config)
-        elif provider == "groq":
-            status = _generate_with_groq(prompt, config)
+        return FullContext(**json.loads(payload))
+    except (TypeError, ValueError):  # Written by an older FullContext
+        return None
+
+
+class ContextHistory:
+    """
+    How often each context has been asked for, most frequent first; the
+    pre-generator's work list. Mirrored to the on-disk store when enabled,
+    so it survives restarts.
+    """
+
+    def __init__(self, engine: "StatusEngine", max_entries: int = 256):
+        self._engine = engine
+        self._entries: dict[Hashable, list] = {}  # context.key → [seen, context, last_seen]
+        self._max_entries = max_entries
+        self._seeded = False
+        self._lock = threading.Lock()
+
+    def record(self, context: "FullContext"):
+        with self._lock:
+            entry = self._entries.get(context.key)
+            if entry is None:
+                if len(self._entries) >= self._max_entries:
+                    # Forget the rarest, oldest context
+                    rarest = min(self._entries, key=lambda k: self._entries[k][::2])
+                    del self._entries[rarest]
+                entry = self._entries[context.key] = [0, context, 0.0]
+            entry[0] += 1
+            entry[2] = time.time()
+        store = self._engine.store
+        if store is not None:
+            store.record_context(context.fingerprint, _context_json(context))
+
+    def top(self, n: int) -> list["FullContext"]:
+        with self._lock:
+            store = self._engine.store
+            if not self._seeded and store is not None:
+                self._seeded = True
+                for payload, seen in store.top_contexts(self._max_entries):
+                    context = _context_from_json(payload)
+                    if context is not None and context.key not in self._entries:
+                        self._entries[context.key] = [seen, context, 0.0]
+            ranked = sorted(self._entries.values(), key=lambda e: (e[0], e[2]), reverse=True)
+            return [entry[1] for entry in ranked[:n]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class Pregenerator:
+    """
+    Background thread that, while the bot is quiet, fills the status cache
+    for the most frequent contexts that have no fresh entry — one call per
+    tick, only with rate-limit tokens to spare and within the first
+    PREGEN_BUDGET_SHARE of the daily budget. Opt-in via "pregenerate".
+    """
+
+    def __init__(self, engine: "StatusEngine", interval: float = PREGEN_INTERVAL,
+                 idle_after: float = PREGEN_IDLE_AFTER, top: int = PREGEN_TOP):
+        self._engine = engine
+        self._interval = interval
+        self._idle_after = idle_after
+        self._top = top
+        self._config: dict = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.pending_keys: set[Hashable] = set()  # Pre-generated, not yet served
+
+    def start(self, config: dict):
+        self._config = config
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ai-pregen")
+        self._thread.start()
+
+    def update(self, config: dict):
+        self._config = config
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"  ⚠️  Ön üretim hatası: {e}")
+
+    def tick(self) -> bool:
+        """Pre-generate at most one status; True if a call was made."""
+        config = self._config
+        if not config.get("pregenerate", False):
+            return False
+        engine = self._engine
+        engine.configure(config)
+        if time.monotonic() - engine.activity.last < self._idle_after or engine.activity.inflight:
+            return False
+        _configure_budget(config)
+        if _budget.tight(PREGEN_BUDGET_SHARE):
+            return False
+        configs = _provider_configs(config)
+        if _bucket(configs[0]).tokens < 2:  # Leave the live loop a token
+            return False
+
+        for context in engine.history.top(self._top):
+            if context.is_idle:
+                continue
+            key = _cache_key(context, config)
+            if engine.cache.get(key) is not None:
+                continue
+            store_key = (context.fingerprint, *key[1:])
+            store = engine.store
+            stored = store.get(store_key) if store is not None else None
+            if stored is not None:  # Free: warm memory from disk instead
+                stats.count(cache_evictions=engine.cache.set(key, stored, remember=False))
+                continue
+            try:
+                # Through single-flight: a live request for this context waits on us
+                engine.single_flight(key, lambda: self._fetch(context, config, key, store_key))
+            except Exception:
+                return False
+            return True
+        return False
+
+    def _fetch(self, context: "FullContext", config: dict, key: tuple,
+               store_key: tuple) -> list[str]:
+        timeout = config.get("provider_timeout", PROVIDER_TIMEOUT)
+        engine = self._engine
+        prompt = _build_user_prompt(context.build_prompt(), _batch_size(config), engine.cache.recent)
+        # No hedging: nobody is waiting on this one
+        _, candidates = _runner.run(_generate_hedged(
+            prompt, _provider_configs(config), timeout + 1, timeout))
+        stats.count(pregenerated=1,
+                    cache_evictions=engine.cache.set(key, candidates, remember=False))
+        store = engine.store
+        if store is not None:
+            store.set(store_key, candidates[0])
+        self.pending_keys.add(key)
+        return candidates
+
+
+class _Activity:
+    """When the live loop last needed a status, and whether one is in flight."""
+
+    def __init__(self):
+        self.last = 0.0
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+    def begin(self):
+        with self._lock:
+            self.inflight += 1
+
+    def end(self):
+        with self._lock:
+            self.inflight -= 1
+
+
+# ──────────────────────────────────────────────
+#  Status Engine
+# ──────────────────────────────────────────────
+
+class StatusEngine:
+    """
+    The status pipeline for one cache: memory, then the optional disk
+    store, then providers. Safe to share between threads (bot loop,
+    dashboard preview, pre-generator): concurrent requests for the same
+    cache key wait on the one provider call already in flight instead of
+    paying for their own. The activity clock, context history,
+    pre-generator and offline generator belong to the engine; clients,
+    breakers, rate limits, the daily budget and stats stay process-wide,
+    like the API keys they guard.
+    """
+
+    def __init__(self, cache: Optional[StatusCache] = None,
+                 store: Optional[PersistentStatusCache] = None):
+        self.cache = cache if cache is not None else StatusCache()
+        self.store = store
+        self.local: Optional[LocalGenerator] = None
+        self._local_source: Optional[tuple[Path, Optional[str]]] = None
+        self.activity = _Activity()
+        self.history = ContextHistory(self)
+        self.pregen = Pregenerator(self)
+        self._inflight: dict[Hashable, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def generate(self, context: "FullContext", config: dict, live: bool = True) -> str:
+        """
+        Status for `context`. `live=False` (previews) leaves the activity
+        clock and the pre-generator's history alone. Never raises: without
+        a provider answer it degrades to cached, learned or fallback text.
+        """
+        try:
+            return self.provider_status(context, config, live)
+        except Exception as e:
+            return self.fallback(context, config, e)
+
+    def provider_status(self, context: "FullContext", config: dict, live: bool = True) -> str:
+        """
+        Like generate(), but only cached or fresh provider output: raises
+        BudgetExceededError when rationing forbids a call and the provider's
+        error when every provider failed, instead of degrading.
+        """
+        if context.is_idle:
+            return config.get("fallback_status", "💤 AFK")
+        self.configure(config)
+        if live:
+            self.activity.last = time.monotonic()
+            self.history.record(context)
+
+        # Cache check — memory first, then the on-disk store
+        key = _cache_key(context, config)
+        store_key = (context.fingerprint, *key[1:])
+        batch_size = _batch_size(config)
+        cached = self.cache.get(key)
+        if live and cached is not None and batch_size > 1 and self.cache.due(
+                key, config.get("batch_rotate_seconds", BATCH_ROTATE_SECONDS)):
+            # Same context for a while: next pooled candidate, or a fresh batch
+            cached = self.cache.advance(key)
+            if cached is not None:
+                stats.count(rotations=1)
+            refresh = cached is None
+        else:
+            refresh = False
+        store = self.store
+        if cached is None and not refresh and store is not None:
+            cached = store.get(store_key)
+            if cached is not None:
+                stats.count(disk_hits=1, cache_evictions=self.cache.set(key, cached))
+        if cached is not None:
+            stats.count(cache_hits=1)
+            try:
+                self.pregen.pending_keys.remove(key)
+                stats.count(pregen_hits=1)
+            except KeyError:
+                pass
+            return cached
+        stats.count(cache_misses=1)
+
+        # Rationing: out of budget → caller degrades; running low → stale beats paid
+        _configure_budget(config)
+        if _budget.exhausted():
+            raise BudgetExceededError("Günlük bütçe doldu")
+        if _budget.tight(BUDGET_RESERVE):
+            stale = self.cache.get(key, allow_stale=True)
+            if stale is not None:
+                stats.count(degraded=1)
+                return stale
+
+        candidates = self.single_flight(
+            key, lambda: self._fetch(context, config, key, store_key, remember=live))
+        return candidates[0]
+
+    def fallback(self, context: "FullContext", config: dict, error: BaseException) -> str:
+        """What generate() shows when provider_status() raised `error`."""
+        if isinstance(error, BudgetExceededError):
+            return self._degraded(context, _cache_key(context, config), config)
+        return self._local_status(context, config) or config.get("fallback_status", "💤 AFK — Birazdan dönerim.")
+
+    def configure(self, config: dict):
+        """Apply the cache settings from `config`."""
+        self.cache.ttl = config.get("status_cache_ttl", STATUS_CACHE_TTL)
+
+    def single_flight(self, key: Hashable, call: Callable[[], list[str]]) -> list[str]:
+        """
+        Run `call` for `key` unless a call for it is already running; then
+        wait for that one's candidates (or its exception) instead.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = concurrent.futures.Future()
+        if not leader:
+            stats.count(coalesced=1)
+            return future.result()
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
         else:
-            status = _generate_with_gemini(prompt, config)
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
 
-        if not status:
-            raise ValueError("Boş yanıt")
+    def _fetch(self, context: "FullContext", config: dict, key: tuple,
+               store_key: tuple, remember: bool = True) -> list[str]:
+        """
+        The provider call behind a cache miss; caches and stores what it
+        gets. `remember=False` (previews) keeps it out of the variety history
+        and the offline generator: a preview's persona or language is not
+        the bot's.
+        """
+        stats.count(total_calls=1)
+        prompt = _build_user_prompt(context.build_prompt(), _batch_size(config), self.cache.recent)
+        self.activity.begin()
+        try:
+            _, candidates = _runner.run(_generate_hedged(
+                prompt, _provider_configs(config), config.get("hedge_delay", HEDGE_DELAY),
+                config.get("provider_timeout", PROVIDER_TIMEOUT)))
+        except BudgetExceededError:
+            stats.count(total_calls=-1)  # Nothing was sent
+            raise
+        except Exception as e:
+            stats.count(failed_calls=1)
+            if isinstance(e, CircuitOpenError):  # Provider failures are counted per attempt
+                stats.record_error(e)
+            print(f"  ⚠️  Storyteller hatası: {e}")
+            raise
+        finally:
+            self.activity.end()
 
-        stats.successful_calls += 1
-        _cache.set(activity_context, status)
+        stats.count(successful_calls=1,
+                    cache_evictions=self.cache.set(key, candidates, remember=remember))
+        store = self.store
+        if store is not None:
+            store.set(store_key, candidates[0])
+        local = self.local
+        if remember and local is not None:
+            for candidate in candidates:
+                local.learn(context, candidate, config)
+        return candidates
+
+    def rotation_due(self, context: "FullContext", config: dict) -> bool:
+        """
+        In batch mode, has the current status of an unchanged context been
+        shown long enough to rotate to the next pooled candidate?
+        """
+        return _batch_size(config) > 1 and self.cache.due(
+            _cache_key(context, config), config.get("batch_rotate_seconds", BATCH_ROTATE_SECONDS))
+
+    def _degraded(self, context: "FullContext", key: tuple, config: dict) -> str:
+        """Best status without a provider call: stale cache, learned template, fixed template."""
+        stats.count(degraded=1)
+        stale = self.cache.get(key, allow_stale=True)
+        if stale is not None:
+            return stale
+        return self._local_status(context, config) or _template_status(context, config)
+
+    def quick(self, context: "FullContext", config: dict) -> str:
+        """
+        Zero-latency answer for the current context — cached (even stale),
+        else the offline generator, else a fixed template. Never calls a provider.
+        """
+        if context.is_idle:
+            return config.get("fallback_status", "💤 AFK")
+        cached = self.cache.get(_cache_key(context, config), allow_stale=True)
+        if cached is not None:
+            return cached
+        return self._local_status(context, config) or _template_status(context, config)
+
+    def _local_status(self, context: "FullContext", config: dict) -> Optional[str]:
+        local = self.local
+        if local is None:
+            return None
+        status = local.generate(context, config)
+        if status is not None:
+            stats.count(local_answers=1)
         return status
 
-    except Exception as e:
-        stats.failed_calls += 1
-        print(f"  ⚠️  Storyteller hatası: {e}")
-        return config.get("fallback_status", "💤 AFK — Birazdan dönerim.")
+    def use_local(self, log_path: Optional[Path], fallback_status: Optional[str] = None):
+        """
+        Build the offline generator from a status history log in the
+        background (None disables it), leaving out `fallback_status` lines.
+        Until it's ready, callers simply fall through.
+        """
+        if log_path is None:
+            self.local = self._local_source = None
+            return
+        source = (Path(log_path), fallback_status)
+        if self._local_source == source:
+            return  # Already built; it keeps learning from live statuses
+        self._local_source = source
+
+        def build():
+            self.local = LocalGenerator.from_log(log_path, fallback_status)
+
+        threading.Thread(target=build, daemon=True, name="ai-local").start()
+
+    def use_store(self, path: Optional[Path]):
+        """Back the cache with a SQLite file at `path` (None disables it)."""
+        with self._lock:
+            store = self.store
+            if store is not None and (path is None or store._path != Path(path)):
+                store.close()
+                self.store = store = None
+            if path is not None and store is None:
+                self.store = PersistentStatusCache(path)
+
+
+_engine = StatusEngine(_cache)
+
+
+# ──────────────────────────────────────────────
+#  Public API
+# ──────────────────────────────────────────────
+
+def generate_status(context: "FullContext", config: dict) -> str:
+    """
+    Generate a storytelling Discord status from multi-source activity context.
+    Cached per context, persona, language and provider (in memory, then on
+    disk if enabled); the prompt is only rendered when a provider call is
+    actually made.
+    """
+    return _engine.generate(context, config)
+
+
+# Longest a context switch waits before a provisional status; 0 (default) waits for the AI
+STATUS_DEADLINE_MS = 0
+
+_status_pool = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="ai-status")
+
+
+def generate_status_within(context: "FullContext", config: dict,
+                           on_late: Optional[Callable[[], None]] = None
+                           ) -> tuple[str, Optional[concurrent.futures.Future]]:
+    """
+    Two-phase generation. Waits up to "status_deadline_ms" for the real
+    status and returns (status, None); past the deadline returns
+    (quick_status(...), future) so the caller can publish the provisional
+    status now and the future's result once it lands — if its context is
+    still current. The future only ever holds provider output: it resolves
+    to None when no provider answered, and the provisional status stays.
+    `on_late` runs when that result is ready (e.g. to wake the loop). A
+    deadline of 0 waits as long as it takes.
+    """
+    deadline = config.get("status_deadline_ms", STATUS_DEADLINE_MS)
+    if not deadline:
+        return generate_status(context, config), None
+    attempt = _status_pool.submit(_engine.provider_status, context, config)
+    done, _ = concurrent.futures.wait([attempt], timeout=deadline / 1000)
+    if done:
+        error = attempt.exception()
+        if error is None:
+            return attempt.result(), None
+        return _engine.fallback(context, config, error), None
+
+    late: concurrent.futures.Future = concurrent.futures.Future()
+
+    def settle(attempt: concurrent.futures.Future):
+        late.set_result(attempt.result() if attempt.exception() is None else None)
+        if on_late is not None:
+            on_late()
+
+    attempt.add_done_callback(settle)
+    stats.count(provisional=1)
+    return quick_status(context, config), late
+
+
+def preview_status(context: "FullContext", config: dict) -> str:
+    """
+    A status for `config` (e.g. another persona or language) without
+    touching the bot loop's rotation, activity clock, context history or
+    the variety history of recent statuses. Shares the cache and in-flight
+    calls, so previewing what the bot is about to ask for costs one call,
+    not two.
+    """
+    return _engine.generate(context, config, live=False)
+
+
+def _cache_key(context: "FullContext", config: dict) -> tuple:
+    return (context.key, _resolve_persona(config), config.get("language", "tr"),
+            config.get("ai_provider", "gemini").lower())
+
+
+def rotation_due(context: "FullContext", config: dict) -> bool:
+    """
+    In batch mode, has the current status of an unchanged context been shown
+    long enough to rotate to the next pooled candidate?
+    """
+    return _engine.rotation_due(context, config)
+
+
+def quick_status(context: "FullContext", config: dict) -> str:
+    """Zero-latency answer: cache (even stale), offline generator, fixed template."""
+    return _engine.quick(context, config)
+
+
+def use_persistent_cache(path: Optional[Path]):
+    """
+    Back the status cache with a SQLite file at `path` (None disables it);
+    the daily budget is kept in the same file.
+    """
+    _engine.use_store(path)
+    _budget.attach(_engine.store)
+
+
+def use_local_generator(log_path: Optional[Path], fallback_status: Optional[str] = None):
+    """Learn offline statuses from a history log (None disables it)."""
+    _engine.use_local(log_path, fallback_status)
+
+
+def start_pregenerator(config: dict):
+    """Start (or reconfigure) background pre-generation; a no-op unless enabled."""
+    if config.get("pregenerate", False):
+        _engine.pregen.start(config)
+    else:
+        _engine.pregen.update(config)
+
+
+def stop_pregenerator():
+    _engine.pregen.stop()
 
 
 def get_stats() -> Stats:
     return stats
+
+
+def get_usage_info() -> dict:
+    """Tokens, latency percentiles, errors and the last 5 minutes, for dashboards."""
+    snapshot = stats.snapshot()
+    tokens = snapshot["tokens"]
+    return {
+        "prompt_tokens": tokens["prompt"],
+        "cached_tokens": tokens["cached"],
+        "completion_tokens": tokens["completion"],
+        "cached_token_rate": stats.cached_token_rate,
+        "latency_ms_cached_prefix": stats.avg_latency_ms(True),
+        "latency_ms_uncached_prefix": stats.avg_latency_ms(False),
+        "hedges_fired": stats.hedges_fired,
+        "ttft_ms": stats.avg_stream_ms("ttft"),
+        "time_to_status_ms": stats.avg_stream_ms("status"),
+        "stream_cutoffs": stats.stream_cutoffs,
+        "providers": snapshot["providers"],
+        "latency_ms": snapshot["latency_ms"],
+        "errors": snapshot["errors"],
+        "last_5_min": snapshot["last_5_min"],
+        "circuits": {
+            f"{key[0]}:{key[2] or 'varsayılan'}": breaker.snapshot()
+            for key, breaker in list(_breakers.items())
+        },
+    }
+
+
+def get_budget_info(config: Optional[dict] = None) -> dict:
+    """Today's spend against the configured budget, for dashboards."""
+    if config is not None:
+        _configure_budget(config)
+    return dict(_budget.snapshot(), degraded=stats.degraded)
+
+
+def get_cache_info() -> dict:
+    """Status cache occupancy and counters, for dashboards."""
+    return {
+        "entries": len(_engine.cache),
+        "bytes": _engine.cache.size_bytes,
+        "hits": stats.cache_hits,
+        "misses": stats.cache_misses,
+        "evictions": stats.cache_evictions,
+        "rotations": stats.rotations,
+        "pregenerated": stats.pregenerated,
+        "pregen_hits": stats.pregen_hits,
+        "coalesced": stats.coalesced,
+        "provisional": stats.provisional,
+        "hit_rate": stats.cache_hit_rate,
+        "disk_hits": stats.disk_hits,
+        "persistent": _engine.store is not None,
+        "local_templates": len(_engine.local) if _engine.local is not None else 0,
+        "local_answers": stats.local_answers,
+    }
@@ -0,0 +1,1123 @@
+"""
+benchmark.py — StatusAI Performance Benchmarks
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+Small, dependency-free micro-benchmarks for the hot paths of the bot loop.
+Runs on any OS; Win32-only calls simply return empty results off Windows.
+
+Usage:
+    python benchmark.py                     # run everything
+    python benchmark.py processes           # run a single benchmark
+    python benchmark.py engine              # generate_status against the local mock provider
+    python benchmark.py replay trace.jsonl  # replay a recorded trace
+    python benchmark.py record trace.jsonl 600   # record 10 min on a live machine
+"""
+
+import asyncio
+import json
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import psutil
+
+import ai_engine
+import trackers
+from mock_provider import MockBehavior, MockProviderServer
+
+
+# ──────────────────────────────────────────────
+#  Helpers
+# ──────────────────────────────────────────────
+
+def _timeit(fn, cycles: int) -> float:
+    """Average wall time of fn() in milliseconds."""
+    start = time.perf_counter()
+    for _ in range(cycles):
+        fn()
+    return (time.perf_counter() - start) * 1000 / cycles
+
+
+# Config overrides that take the rate limiter and daily budget out of a measurement
+_UNLIMITED = {"rate_limit_per_minute": 10 ** 9, "rate_limit_burst": 10 ** 9, "daily_call_budget": 0}
+
+
+def _row(label: str, *values: str):
+    print(f"  {label:<28}" + "".join(f"{v:>16}" for v in values))
+
+
+@contextmanager
+def _count_process_iter():
+    """Count psutil.process_iter calls while the block runs."""
+    counter = {"calls": 0}
+    original = psutil.process_iter
+
+    def counting(*args, **kwargs):
+        counter["calls"] += 1
+        return original(*args, **kwargs)
+
+    psutil.process_iter = counting
+    try:
+        yield counter
+    finally:
+        psutil.process_iter = original
+
+
+# ──────────────────────────────────────────────
+#  Process Enumeration
+# ──────────────────────────────────────────────
+
+def _legacy_is_running(name: str) -> bool:
+    # One full process_iter pass per query, as before ProcessSnapshot.
+    name_lower = name.lower()
+    for proc in psutil.process_iter(["name"]):
+        if proc.info["name"] and proc.info["name"].lower() == name_lower:
+            return True
+    return False
+
+
+def _legacy_find_pid(name: str) -> int:
+    name_lower = name.lower()
+    for proc in psutil.process_iter(["name", "pid"]):
+        if proc.info["name"] and proc.info["name"].lower() == name_lower:
+            return proc.info["pid"]
+    return 0
+
+
+def _legacy_cycle(tracked_apps: dict[str, str]):
+    """Process enumerations of one get_full_context call before snapshots."""
+    if _legacy_is_running("Code.exe"):
+        _legacy_find_pid("Code.exe")
+    _legacy_find_pid("Spotify.exe")
+    for browser in trackers.BROWSER_PROCESSES:
+        if _legacy_is_running(browser):
+            _legacy_find_pid(browser)
+            break
+    tracked_lower = {k.lower(): v for k, v in tracked_apps.items()}
+    for proc in psutil.process_iter(["name"]):
+        name = proc.info["name"]
+        if name and name.lower() in tracked_lower:
+            pass
+
+
+def bench_processes(cycles: int = 20):
+    """Process enumerations and wall time per context cycle."""
+    tracked_apps = {"Code.exe": "VS Code", "Discord.exe": "Discord", "Spotify.exe": "Spotify"}
+    print(f"\n  Process snapshot — {len(psutil.pids())} processes, {cycles} cycles")
+
+    with _count_process_iter() as counter:
+        legacy_ms = _timeit(lambda: _legacy_cycle(tracked_apps), cycles)
+    legacy_iters = counter["calls"] / cycles
+
+    with _count_process_iter() as counter:
+        profile = trackers.TrackerProfile.build(tracked_apps)
+        snapshot_ms = _timeit(lambda: trackers.get_full_context(profile), cycles)
+    snapshot_iters = counter["calls"] / cycles
+
+    _row("", "enumerations", "ms/cycle")
+    _row("before (per-query iter)", f"{legacy_iters:.1f}", f"{legacy_ms:.2f}")
+    _row("after (ProcessSnapshot)", f"{snapshot_iters:.1f}", f"{snapshot_ms:.2f}")
+
+
+def bench_scheduler(ticks: int = 60, tick_seconds: float = 2.0):
+    """Full refresh every tick vs the tiered ContextCollector over simulated time."""
+    profile = trackers.TrackerProfile.build({"Code.exe": "VS Code", "Discord.exe": "Discord"})
+    clock = {"now": 0.0}
+    collector = trackers.ContextCollector(clock=lambda: clock["now"])
+    print(f"\n  Tiered scheduler — {ticks} ticks, {tick_seconds:.0f}s apart (simulated)")
+
+    with _count_process_iter() as counter:
+        full_ms = _timeit(lambda: trackers.get_full_context(profile), ticks)
+    full_iters = counter["calls"] / ticks
+
+    def tick():
+        collector.collect(profile)
+        clock["now"] += tick_seconds
+
+    with _count_process_iter() as counter:
+        tiered_ms = _timeit(tick, ticks)
+    tiered_iters = counter["calls"] / ticks
+
+    _row("", "enumerations", "ms/tick")
+    _row("get_full_context", f"{full_iters:.2f}", f"{full_ms:.2f}")
+    _row("ContextCollector", f"{tiered_iters:.2f}", f"{tiered_ms:.2f}")
+
+
+def bench_watcher(switches: int = 30, interval: float = 20.0):
+    """Switch → loop awake: fixed-interval polling vs ForegroundWatcher events; idle CPU."""
+    rng = random.Random(3)
+    fake = trackers.FakeForegroundBackend()
+    watcher = trackers.ForegroundWatcher(fake, min_gap=0)
+    watcher.start()
+    latencies = []
+    for _ in range(switches):
+        stamp = {}
+
+        def switch():
+            stamp["at"] = time.perf_counter()
+            fake.switch()
+
+        timer = threading.Timer(rng.uniform(0.001, 0.02), switch)
+        timer.start()
+        watcher.wait(5.0)
+        latencies.append((time.perf_counter() - stamp["at"]) * 1000)
+        timer.join()
+    cpu = time.process_time()
+    watcher.wait(1.0)
+    idle_cpu_ms = (time.process_time() - cpu) * 1000
+    watcher.stop()
+
+    print(f"\n  Foreground watcher — {switches} switches, polling every {interval:.0f}s before")
+    _row("", "p50 ms", "max ms", "idle CPU ms/s")
+    _row("polling (before, expected)", f"{interval * 500:.0f}", f"{interval * 1000:.0f}", "—")
+    _row("events (after)", f"{_percentile(latencies, 50):.2f}", f"{max(latencies):.2f}",
+         f"{idle_cpu_ms:.2f}")
+
+
+# ──────────────────────────────────────────────
+#  Window Enumeration
+# ──────────────────────────────────────────────
+
+def _synthetic_windows(count: int = 400, seed: int = 7) -> list[tuple[int, bool, str]]:
+    """A desktop-like window list: mostly hidden helper windows, a few real ones."""
+    rng = random.Random(seed)
+    windows = []
+    for i in range(count):
+        pid = rng.randint(1000, 1200)
+        visible = rng.random() < 0.15
+        title = rng.choice(["", "MSCTFIME UI", "Default IME", f"Window {i}"])
+        windows.append((pid, visible, title))
+    windows.insert(count // 2, (4242, True, "main.py — StatusAI — Visual Studio Code"))
+    windows.insert(count // 3, (5151, True, "Numb - Linkin Park"))
+    windows.insert(count // 4, (6161, True, "StatusAI - GitHub - Google Chrome"))
+    return windows
+
+
+def _legacy_title_by_pid(windows: list[tuple[int, bool, str]], pid: int) -> str:
+    # One full enumeration per lookup, as before WindowIndex.
+    for window_pid, visible, title in windows:
+        if window_pid == pid and visible and title and len(title) > 3:
+            return title
+    return ""
+
+
+def bench_windows(cycles: int = 2000):
+    """Window enumerations per cycle: per-pid scan vs one pid→titles index."""
+    windows = _synthetic_windows()
+    lookups = [4242, 5151, 6161, 1001, 1002, 1003]  # VS Code, Spotify, browser pids
+    enumerations = {"calls": 0}
+
+    def source():
+        enumerations["calls"] += 1
+        return windows
+
+    print(f"\n  Window index — {len(windows)} synthetic windows, {cycles} cycles")
+
+    def legacy():
+        for pid in lookups:
+            _legacy_title_by_pid(source(), pid)
+
+    legacy_ms = _timeit(legacy, cycles)
+    legacy_enums = enumerations["calls"] / cycles
+
+    enumerations["calls"] = 0
+
+    def indexed():
+        index = trackers.WindowIndex.capture(source)
+        for pid in lookups:
+            index.title_of(pid)
+
+    index_ms = _timeit(indexed, cycles)
+    index_enums = enumerations["calls"] / cycles
+
+    _row("", "enumerations", "ms/cycle")
+    _row("before (EnumWindows/pid)", f"{legacy_enums:.1f}", f"{legacy_ms:.4f}")
+    _row("after (WindowIndex)", f"{index_enums:.1f}", f"{index_ms:.4f}")
+
+
+# ──────────────────────────────────────────────
+#  Title Matching
+# ──────────────────────────────────────────────
+
+TITLE_CORPUS = [
+    "Lofi Hip Hop Radio - beats to relax/study to - YouTube - Google Chrome",
+    "v1onues/StatusAI: AI-Powered Discord Rich Presence - GitHub - Google Chrome",
+    "python - How to merge two dicts - Stack Overflow - Mozilla Firefox",
+    "r/programming - Reddit — Mozilla Firefox",
+    "Home / X - Brave",
+    "ChatGPT - Microsoft Edge",
+    "Figma — Design System - Opera",
+    "Inbox (3) - mail@example.com - Gmail - Google Chrome",
+    "New Tab - Google Chrome",
+    "Untitled - Notion - Supermium",
+    "docs.python.org - asyncio — Asynchronous I/O - Chromium",
+    "Weather in Istanbul - Google Search - Google Chrome",
+    "Twitch - xQc LIVE - Microsoft Edge",
+    "Sepet | Trendyol - Google Chrome",
+    "npm: left-pad - Brave",
+    "Dashboard - Vercel - Google Chrome",
+]
+
+
+def _legacy_extract_browser_platform(title: str) -> tuple[str, str]:
+    # Per-pattern re.search loop, as before TitleMatcher.
+    clean_title = title
+    for suffix in trackers.BROWSER_SUFFIXES:
+        if suffix in clean_title:
+            clean_title = clean_title.split(suffix)[0].strip()
+            break
+    title_lower = clean_title.lower()
+    for pattern in trackers.NSFW_PATTERNS:
+        if re.search(pattern, title_lower):
+            return "Gizli", ""
+    for pattern, platform_name in trackers.PLATFORM_PATTERNS:
+        if re.search(pattern, title_lower):
+            page_title = clean_title
+            platform_lower = platform_name.lower()
+            for sep in (" - ", " — ", " | "):
+                parts = page_title.rsplit(sep, 1)
+                if len(parts) == 2 and parts[1].strip().lower() in (
+                    platform_lower, platform_lower.replace(" ", ""),
+                    "youtube", "github", "reddit", "stackoverflow",
+                    "twitch", "linkedin", "figma", "notion", "trello",
+                ):
+                    page_title = parts[0].strip()
+                    break
+            return platform_name, page_title[:80]
+    if clean_title and len(clean_title) > 3:
+        return "", clean_title[:60]
+    return "", ""
+
+
+def bench_titles(rounds: int = 2000):
+    """Per-pattern re.search loop vs the compiled single-pass TitleMatcher."""
+    corpus = TITLE_CORPUS
+    for title in corpus:
+        expected = _legacy_extract_browser_platform(title)
+        actual = trackers._extract_browser_platform(title)
+        if expected != actual:
+            print(f"  ✖ Uyuşmazlık: {title!r}: {expected} != {actual}")
+            sys.exit(1)
+
+    print(f"\n  Title matcher — {len(corpus)} titles, {rounds} rounds (results identical)")
+
+    def legacy():
+        for title in corpus:
+            _legacy_extract_browser_platform(title)
+
+    def compiled():
+        for title in corpus:
+            trackers._extract_browser_platform(title)
+
+    legacy_us = _timeit(legacy, rounds) * 1000 / len(corpus)
+    compiled_us = _timeit(compiled, rounds) * 1000 / len(corpus)
+
+    _row("", "µs/title")
+    _row("before (re.search loop)", f"{legacy_us:.2f}")
+    _row("after (TitleMatcher)", f"{compiled_us:.2f}")
+
+
+# ──────────────────────────────────────────────
+#  Blacklist
+# ──────────────────────────────────────────────
+
+def bench_blacklist(rounds: int = 2000):
+    """Per-word `in` loop vs the profile's precompiled blacklist automaton."""
+    rng = random.Random(11)
+    alphabet = "abcdefghijklmnoprstuvyzçğıöşü"
+    words = ["".join(rng.choice(alphabet) for _ in range(rng.randint(4, 10))) for _ in range(500)]
+    profile = trackers.TrackerProfile.build({}, words)
+    titles = [title.lower() for title in TITLE_CORPUS]
+    for title in titles:
+        if any(word in title for word in words) != profile.is_blacklisted(title):
+            print(f"  ✖ Uyuşmazlık: {title!r}")
+            sys.exit(1)
+
+    print(f"\n  Blacklist — {len(words)} words, {len(titles)} titles, {rounds} rounds (results identical)")
+
+    def legacy():
+        for title in titles:
+            for word in words:
+                if word.lower() in title:
+                    break
+
+    def compiled():
+        for title in titles:
+            profile.is_blacklisted(title)
+
+    legacy_us = _timeit(legacy, rounds) * 1000 / len(titles)
+    compiled_us = _timeit(compiled, rounds) * 1000 / len(titles)
+
+    _row("", "µs/title")
+    _row("before (word loop)", f"{legacy_us:.2f}")
+    _row("after (TrackerProfile)", f"{compiled_us:.2f}")
+
+
+# ──────────────────────────────────────────────
+#  Context Fingerprint
+# ──────────────────────────────────────────────
+
+def bench_fingerprint(rounds: int = 20000):
+    """Change check (every cycle) and cache key (changed cycles): before vs after."""
+    fields = dict(active_app="VS Code", active_title="main.py — StatusAI — Visual Studio Code",
+                  process_name="Code.exe", vscode_file="main.py", vscode_project="StatusAI",
+                  spotify_track="Numb", spotify_artist="Linkin Park",
+                  running_apps=["Discord", "Spotify", "VS Code"])
+    last = trackers.FullContext(**fields)
+    cache = {last._render_prompt(): "status", last.key: "status"}
+    print(f"\n  Context fingerprint — {rounds} cycles")
+
+    def legacy_unchanged():
+        ctx = trackers.FullContext(**fields)
+        return (ctx.active_app != last.active_app or ctx.active_title != last.active_title
+                or ctx.vscode_file != last.vscode_file or ctx.spotify_track != last.spotify_track
+                or ctx.browser_platform != last.browser_platform
+                or ctx.game_name != last.game_name or ctx.is_messaging != last.is_messaging)
+
+    def legacy_lookup():
+        ctx = trackers.FullContext(**fields)
+        return cache.get(ctx._render_prompt())  # Key was the rendered prompt
+
+    def new_unchanged():
+        return trackers.FullContext(**fields).has_changed(last)
+
+    def new_lookup():
+        return cache.get(trackers.FullContext(**fields).key)
+
+    _row("", "before µs", "after µs")
+    _row("unchanged cycle", f"{_timeit(legacy_unchanged, rounds) * 1000:.2f}",
+         f"{_timeit(new_unchanged, rounds) * 1000:.2f}")
+    _row("cache lookup", f"{_timeit(legacy_lookup, rounds) * 1000:.2f}",
+         f"{_timeit(new_lookup, rounds) * 1000:.2f}")
+    print(f"  FullContext: __slots__, no per-instance __dict__ "
+          f"({sys.getsizeof(last)} bytes/instance)")
+
+
+def bench_status_cache(switches: int = 900, gap: float = 4.0):
+    """Provider calls for a user hopping between a few apps: single slot vs LRU+TTL."""
+    rng = random.Random(11)
+    working_set = [("VS Code", i) for i in range(3)] + [("Discord",), ("Spotify",), ("Chrome",)]
+    keys = []
+    for _ in range(switches):
+        key = rng.choice(working_set)
+        while keys and key == keys[-1]:
+            key = rng.choice(working_set)
+        keys.append(key)
+
+    def replay(cache: ai_engine.StatusCache) -> int:
+        now = [0.0]
+        cache._clock = lambda: now[0]
+        calls = 0
+        for key in keys:
+            now[0] += gap
+            if cache.get(key) is None:
+                calls += 1
+                cache.set(key, "status")
+        return calls
+
+    print(f"\n  Status cache — {switches} context switches, {gap:.0f}s apart")
+    _row("", "AI calls", "hit rate")
+    for label, cache in (("single slot, 60s (before)", ai_engine.StatusCache(max_entries=1, ttl=60)),
+                         ("LRU 128, 600s (after)", ai_engine.StatusCache())):
+        calls = replay(cache)
+        _row(label, str(calls), f"{(1 - calls / switches) * 100:.0f}%")
+
+
+def bench_warm_start(contexts: int = 30):
+    """Provider calls right after a restart: memory-only vs the on-disk cache."""
+    cfg = {"ai_provider": "gemini", "language": "tr", "persona": "chill", **_UNLIMITED}
+    ctxs = [trackers.FullContext(active_app=f"App {i}", active_title=f"Pencere {i}")
+            for i in range(contexts)]
+    calls = {"n": 0}
+
+    async def fake_provider(prompt: str, config: dict) -> str:
+        calls["n"] += 1
+        return f"durum {calls['n']}"
+
+    original = ai_engine.PROVIDERS["gemini"]
+    ai_engine.PROVIDERS["gemini"] = fake_provider
+    print(f"\n  Warm start — {contexts} known contexts after a restart")
+    _row("", "AI calls", "µs/status")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for label, path in (("memory only (before)", None),
+                                ("persistent cache (after)", Path(tmp) / "status_cache.db")):
+                ai_engine._cache.clear()
+                ai_engine.use_persistent_cache(path)
+                for ctx in ctxs:  # Previous session
+                    ai_engine.generate_status(ctx, cfg)
+                ai_engine._cache.clear()  # Restart: fresh process, cold memory
+                ai_engine.use_persistent_cache(None)
+                ai_engine.use_persistent_cache(path)
+                calls["n"] = 0
+                start = time.perf_counter()
+                for ctx in ctxs:
+                    ai_engine.generate_status(ctx, cfg)
+                elapsed = (time.perf_counter() - start) * 1e6 / contexts
+                _row(label, str(calls["n"]), f"{elapsed:.0f}")
+            ai_engine.use_persistent_cache(None)
+    finally:
+        ai_engine.PROVIDERS["gemini"] = original
+
+
+# ──────────────────────────────────────────────
+#  Provider Clients (local mock endpoint)
+# ──────────────────────────────────────────────
+
+def bench_clients(calls: int = 30):
+    """Provider call latency: new client per call vs the reused client registry."""
+    try:
+        import openai  # noqa: F401
+    except ImportError:
+        print("\n  Provider clients — atlandı (openai paketi kurulu değil)")
+        return
+
+    with MockProviderServer(MockBehavior(latency_ms=0)) as mock:
+        cfg = mock.config_for("openai")
+
+        def cold():
+            ai_engine.reset_clients()
+            ai_engine._runner.run(ai_engine._generate_with_openai("ping", cfg))
+
+        def warm():
+            ai_engine._runner.run(ai_engine._generate_with_openai("ping", cfg))
+
+        print(f"\n  Provider clients — {calls} calls against a local mock")
+        _row("", "ms/call")
+        _row("cold: new client (before)", f"{_timeit(cold, calls):.2f}")
+        ai_engine.reset_clients()
+        warmed = ai_engine.warm_up(cfg)
+        start = time.perf_counter()
+        warm()
+        first = (time.perf_counter() - start) * 1000
+        _row("first call after warm_up", f"{first:.2f}")
+        _row("warm: registry (after)", f"{_timeit(warm, calls):.2f}")
+        print(f"  warm_up took {warmed * 1000:.1f} ms in the background")
+        ai_engine.reset_clients()
+
+
+def bench_stream(calls: int = 10, token_ms: float = 15):
+    """Replies with chatter after the status: full completion vs streamed with early cutoff."""
+    try:
+        import openai  # noqa: F401
+    except ImportError:
+        print("\n  Streaming — atlandı (openai paketi kurulu değil)")
+        return
+
+    replies = {
+        "line + chatter": "main.py ile boğuşurken Numb kulakları dolduruyor 🎧\n\n"
+                          "Açıklama: Kullanıcı aynı anda hem kod yazıyor hem de müzik "
+                          "dinliyor, bu yüzden iki aktiviteyi tek cümlede birleştirdim.",
+        "two sentences": "Elden Ring'de aynı boss'a yirminci kez meydan okuyor 💀. Bu sefer "
+                         "belki olur, belki de yine olmaz; kim bilir, umut fakirin ekmeği.",
+    }
+    print(f"\n  Streaming — {calls} calls per row, mock emits one word per {token_ms:.0f} ms")
+    _row("", "ms to status", "ms to 1st tok", "tokens/call")
+    with MockProviderServer(MockBehavior(latency_ms=0, token_ms=token_ms)) as mock:
+        for label, reply in replies.items():
+            mock.behavior.reply = reply
+            for stream in (False, True):
+                cfg = mock.config_for("openai", stream=stream)
+                ai_engine._runner.run(ai_engine._generate_with_openai("ping", cfg))  # Connect
+                ai_engine.stats = ai_engine.Stats()
+                mock.reset_counters()
+                start = time.perf_counter()
+                for _ in range(calls):
+                    raw = ai_engine._runner.run(ai_engine._generate_with_openai("ping", cfg))
+                    ai_engine._parse_candidates(raw, 1)
+                to_status = (time.perf_counter() - start) * 1000 / calls
+                time.sleep(token_ms * 2 / 1000)  # Let the server notice hang-ups
+                ttft = ai_engine.stats.avg_stream_ms("ttft")
+                _row(f"{label}: {'stream' if stream else 'full'}", f"{to_status:.1f}",
+                     f"{ttft:.1f}" if ttft is not None else "—",
+                     f"{mock.tokens_sent / calls:.1f}")
+    ai_engine.stats = ai_engine.Stats()
+    ai_engine.reset_clients()
+
+
+def _legacy_system_prompt(config: dict) -> str:
+    """System prompt before memoization: three random examples per call."""
+    persona_key = config.get("persona", "custom")
+    examples_list = ai_engine.PERSONA_EXAMPLES.get(persona_key, ai_engine.PERSONA_EXAMPLES["custom"])
+    examples = "\n".join(f"- {ex}" for ex in random.sample(examples_list, min(3, len(examples_list))))
+    return ai_engine.STORYTELLER_PROMPT.format(
+        max_len=ai_engine.MAX_STATUS_LENGTH,
+        persona=ai_engine._resolve_persona(config),
+        language_name=ai_engine.LANGUAGE_MAP.get(config.get("language", "tr"), "tr"),
+        examples=examples,
+    )
+
+
+def _shared_prefix(a: str, b: str) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+def bench_system_prompt(calls: int = 200):
+    """Distinct system prompts and cacheable prefix: random examples vs memoized."""
+    cfg = {"persona": "hacker", "language": "tr"}
+    print(f"\n  System prompt — {calls} consecutive calls")
+    _row("", "distinct", "stable prefix", "µs/build")
+    for label, build in (("random.sample (before)", _legacy_system_prompt),
+                         ("memoized (after)", ai_engine._build_system_prompt)):
+        prompts = [build(cfg) for _ in range(calls)]
+        prefix = min(_shared_prefix(prompts[i], prompts[i + 1]) for i in range(calls - 1))
+        _row(label, str(len(set(prompts))), f"{prefix / len(prompts[0]) * 100:.0f}%",
+             f"{_timeit(lambda: build(cfg), 2000) * 1000:.2f}")
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def bench_hedging(calls: int = 300, hedge_delay: float = 0.08):
+    """Status latency with a stall-prone primary: single provider vs hedged."""
+    rng = random.Random(5)
+    # Primary: usually 20-50 ms, 5% of calls stall for 1 s. Secondary: 40-70 ms.
+    plan = [(1.0 if rng.random() < 0.05 else rng.uniform(0.02, 0.05), rng.uniform(0.04, 0.07))
+            for _ in range(calls)]
+    step = {"i": 0}
+
+    async def primary(prompt: str, config: dict) -> str:
+        await asyncio.sleep(plan[step["i"]][0])
+        return "birincil"
+
+    async def secondary(prompt: str, config: dict) -> str:
+        await asyncio.sleep(plan[step["i"]][1])
+        return "yedek"
+
+    originals = dict(ai_engine.PROVIDERS)
+    saved_breakers = dict(ai_engine._breakers)
+    ai_engine._breakers.clear()
+    ai_engine.PROVIDERS.update(gemini=primary, groq=secondary)
+    single = {"ai_provider": "gemini", **_UNLIMITED}
+    hedged = {"ai_provider": "gemini", "hedge_provider": {"provider": "groq"},
+              "hedge_delay": hedge_delay, **_UNLIMITED}
+    print(f"\n  Hedged requests — {calls} calls, primary stalls 5% of the time")
+    _row("", "mean ms", "p50 ms", "p99 ms", "backup wins")
+    try:
+        for label, cfg in (("single provider (before)", single),
+                           (f"hedged after {hedge_delay * 1000:.0f} ms", hedged)):
+            latencies, backup = [], 0
+            ai_engine._breakers.clear()
+            for i in range(calls):
+                step["i"] = i
+                start = time.perf_counter()
+                name, _ = ai_engine._runner.run(ai_engine._generate_hedged(
+                    "p", ai_engine._provider_configs(cfg), cfg.get("hedge_delay", 99)))
+                latencies.append((time.perf_counter() - start) * 1000)
+                backup += name != "gemini"
+            _row(label, f"{sum(latencies) / calls:.0f}", f"{_percentile(latencies, 50):.0f}",
+                 f"{_percentile(latencies, 99):.0f}", str(backup))
+    finally:
+        ai_engine.PROVIDERS.update(originals)
+        ai_engine._breakers.clear()
+        ai_engine._breakers.update(saved_breakers)
+
+
+def bench_failover(cycles: int = 40, timeout: float = 0.25):
+    """Cost per cycle while the primary is down: retry every cycle vs circuit breaker."""
+    async def dead(prompt: str, config: dict) -> str:
+        await asyncio.sleep(timeout * 4)  # Hangs until the per-call timeout
+        return "geç"
+
+    async def healthy(prompt: str, config: dict) -> str:
+        await asyncio.sleep(0.02)
+        return "yedek"
+
+    async def legacy(prompt: str) -> str:
+        try:  # Before: one provider, full timeout, then the fallback status
+            return await asyncio.wait_for(dead(prompt, {}), timeout)
+        except asyncio.TimeoutError:
+            return "💤 AFK"
+
+    originals = dict(ai_engine.PROVIDERS)
+    saved_breakers = dict(ai_engine._breakers)
+    ai_engine._breakers.clear()
+    ai_engine.PROVIDERS.update(gemini=dead, groq=healthy)
+    configs = ai_engine._provider_configs(
+        {"ai_provider": "gemini", "provider_chain": [{"provider": "groq"}], **_UNLIMITED})
+    print(f"\n  Failover — {cycles} cycles, primary down (timeout {timeout * 1000:.0f} ms)")
+    _row("", "total ms", "ms/cycle", "real statuses")
+    try:
+        start = time.perf_counter()
+        for _ in range(cycles):
+            ai_engine._runner.run(legacy("p"))
+        total = (time.perf_counter() - start) * 1000
+        _row("timeout + fallback (before)", f"{total:.0f}", f"{total / cycles:.1f}", "0")
+
+        real = 0
+        start = time.perf_counter()
+        for _ in range(cycles):
+            name, _ = ai_engine._runner.run(ai_engine._generate_hedged("p", configs, 99, timeout))
+            real += name == "groq"
+        total = (time.perf_counter() - start) * 1000
+        _row("chain + breaker (after)", f"{total:.0f}", f"{total / cycles:.1f}", str(real))
+        states = {cfg["ai_provider"]: ai_engine._breaker(cfg).state for cfg in configs}
+        print(f"  breakers: {states}")
+    finally:
+        ai_engine.PROVIDERS.update(originals)
+        ai_engine._breakers.clear()
+        ai_engine._breakers.update(saved_breakers)
+
+
+def bench_storm(minutes: int = 10, gap: float = 2.0):
+    """A title changing every cycle: paid calls without vs with the rate limiter."""
+    calls = {"n": 0}
+
+    async def fake_provider(prompt: str, config: dict) -> str:
+        calls["n"] += 1
+        return f"durum {calls['n']}"
+
+    cycles = int(minutes * 60 / gap)
+    ctxs = [trackers.FullContext(active_app="Chrome", browser_platform="YouTube",
+                                 browser_page_title=f"Video {i}") for i in range(cycles)]
+    original = ai_engine.PROVIDERS["gemini"]
+    saved_buckets = dict(ai_engine._buckets)
+    ai_engine.PROVIDERS["gemini"] = fake_provider
+    print(f"\n  Call storm — new title every {gap:.0f}s for {minutes} min ({cycles} cycles)")
+    _row("", "paid calls", "degraded")
+    try:
+        for label, per_minute in (("no limiter (before)", 0),
+                                  ("bucket 6/min (after)", 6)):
+            cfg = {"ai_provider": "gemini", "rate_limit_per_minute": per_minute,
+                   "daily_call_budget": 0}
+            now = [0.0]
+            ai_engine._buckets.clear()
+            ai_engine._buckets[ai_engine.ClientRegistry._key("gemini", cfg)] = \
+                ai_engine.TokenBucket(0, 1, clock=lambda: now[0])
+            ai_engine._cache.clear()
+            calls["n"], degraded = 0, ai_engine.stats.degraded
+            for ctx in ctxs:
+                now[0] += gap
+                ai_engine.generate_status(ctx, cfg)
+            _row(label, str(calls["n"]), str(ai_engine.stats.degraded - degraded))
+    finally:
+        ai_engine.PROVIDERS["gemini"] = original
+        ai_engine._buckets.clear()
+        ai_engine._buckets.update(saved_buckets)
+        ai_engine._cache.clear()
+
+
+def bench_batch(minutes: int = 60, rotate: float = 120, gap: float = 20):
+    """Calls per hour on one stable context refreshed every `rotate` s: pool size N."""
+    calls = {"n": 0}
+
+    async def fake_provider(prompt: str, config: dict) -> str:
+        calls["n"] += 1
+        n = ai_engine._batch_size(config)
+        return json.dumps([f"durum {calls['n']}.{i}" for i in range(n)], ensure_ascii=False)
+
+    ctx = trackers.FullContext(active_app="VS Code", vscode_file="main.py", vscode_project="StatusAI")
+    original, original_clock = ai_engine.PROVIDERS["gemini"], ai_engine._cache._clock
+    ai_engine.PROVIDERS["gemini"] = fake_provider
+    cycles = int(minutes * 60 / gap)
+    print(f"\n  Batch generation — stable context for {minutes} min, new status every {rotate:.0f}s")
+    _row("", "calls/hour", "statuses")
+    _row("1 per call (before)", str(int(minutes * 60 / rotate)), str(int(minutes * 60 / rotate)))
+    try:
+        for size in (3, 5):
+            cfg = {"ai_provider": "gemini", "batch_size": size, "batch_rotate_seconds": rotate,
+                   **_UNLIMITED}
+            now = [0.0]
+            ai_engine._cache.clear()
+            ai_engine._cache._clock = lambda: now[0]
+            calls["n"], shown, current = 0, set(), ""
+            for _ in range(cycles):
+                now[0] += gap
+                if not current or ai_engine.rotation_due(ctx, cfg):  # The bot loop's check
+                    current = ai_engine.generate_status(ctx, cfg)
+                    shown.add(current)
+            _row(f"pool of {size} (after)", f"{calls['n'] * 60 / minutes:.0f}", str(len(shown)))
+    finally:
+        ai_engine.PROVIDERS["gemini"] = original
+        ai_engine._cache._clock = original_clock
+        ai_engine._cache.clear()
+
+
+def bench_pregen(switches: int = 40, provider_ms: float = 50):
+    """Switches to common activities after a restart: on-demand vs pre-generated."""
+    rng = random.Random(19)
+    apps = [("VS Code", "main.py"), ("VS Code", "trackers.py"), ("Discord", ""), ("Spotify", ""),
+            ("Chrome", ""), ("VALORANT", ""), ("Telegram", ""), ("Figma", ""),
+            ("Notion", ""), ("Steam", ""), ("OBS", ""), ("Excel", "")]
+    ctxs = [trackers.FullContext(active_app=app, vscode_file=f) for app, f in apps]
+    weights = [1 / (rank + 1) for rank in range(len(ctxs))]  # Zipf-like habits
+    calls = {"n": 0}
+
+    async def fake_provider(prompt: str, config: dict) -> str:
+        calls["n"] += 1
+        await asyncio.sleep(provider_ms / 1000)
+        return f"durum {calls['n']}"
+
+    cfg = {"ai_provider": "gemini", "pregenerate": True, **_UNLIMITED}
+    original = ai_engine.PROVIDERS["gemini"]
+    ai_engine.PROVIDERS["gemini"] = fake_provider
+    engine = ai_engine.StatusEngine()
+    for ctx in rng.choices(ctxs, weights, k=500):  # Yesterday's habits
+        engine.history.record(ctx)
+    today = rng.choices(ctxs, weights, k=switches)
+
+    print(f"\n  Pre-generation — {switches} switches after a restart, provider {provider_ms:.0f} ms")
+    _row("", "AI waits", "mean ms", "calls")
+    try:
+        for label, pregen in (("on demand (before)", False), ("top 8 pre-generated (after)", True)):
+            engine.cache.clear()
+            calls["n"] = 0
+            if pregen:
+                engine.pregen = ai_engine.Pregenerator(engine, top=8)
+                engine.pregen.update(cfg)
+                engine.activity.last = time.monotonic() - 3600  # Idle
+                while engine.pregen.tick():
+                    pass
+            spent, waits = calls["n"], 0
+            start = time.perf_counter()
+            for ctx in today:
+                before = calls["n"]
+                engine.generate(ctx, cfg)
+                waits += calls["n"] > before
+            elapsed = (time.perf_counter() - start) * 1000 / switches
+            _row(label, str(waits), f"{elapsed:.1f}", str(calls["n"]))
+    finally:
+        ai_engine.PROVIDERS["gemini"] = original
+
+
+def bench_coalesce(threads: int = 8, rounds: int = 20, provider_ms: float = 50):
+    """Threads asking for the same new context at once: a call each vs single-flight."""
+    calls = {"n": 0}
+
+    async def fake_provider(prompt: str, config: dict) -> str:
+        calls["n"] += 1
+        await asyncio.sleep(provider_ms / 1000)
+        return f"durum {calls['n']}"
+
+    cfg = {"ai_provider": "gemini", **_UNLIMITED}
+    original = ai_engine.PROVIDERS["gemini"]
+    ai_engine.PROVIDERS["gemini"] = fake_provider
+    engine = ai_engine.StatusEngine()
+
+    def legacy(ctx):  # Before: every miss made its own call
+        key = ai_engine._cache_key(ctx, cfg)
+        engine._fetch(ctx, cfg, key, (ctx.fingerprint, *key[1:]))
+
+    def coalesced(ctx):
+        engine.generate(ctx, cfg, live=False)
+
+    print(f"\n  Single-flight — {threads} threads x {rounds} new contexts, provider {provider_ms:.0f} ms")
+    _row("", "calls", "ms/round")
+    try:
+        for label, fn in (("a call each (before)", legacy), ("single-flight (after)", coalesced)):
+            engine.cache.clear()
+            calls["n"] = 0
+            start = time.perf_counter()
+            for i in range(rounds):
+                ctx = trackers.FullContext(active_app="VS Code", vscode_file=f"f{i}.py")
+                workers = [threading.Thread(target=fn, args=(ctx,)) for _ in range(threads)]
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+            elapsed = (time.perf_counter() - start) * 1000 / rounds
+            _row(label, str(calls["n"]), f"{elapsed:.1f}")
+    finally:
+        ai_engine.PROVIDERS["gemini"] = original
+
+
+def bench_deadline(switches: int = 30, deadline_ms: float = 200):
+    """Context switch to first published status: wait for the AI vs two-phase with a deadline."""
+    rng = random.Random(23)
+    delays = [rng.lognormvariate(0, 0.8) * 0.25 for _ in range(switches)]  # Median 250 ms
+
+    async def slow_provider(prompt: str, config: dict) -> str:
+        await asyncio.sleep(delays[int(prompt.split("sw_")[1].split(".")[0]) % switches])
+        return "AI durumu"
+
+    original = ai_engine.PROVIDERS["gemini"]
+    ai_engine.PROVIDERS["gemini"] = slow_provider
+    print(f"\n  Two-phase publishing — {switches} switches, provider median 250 ms, "
+          f"deadline {deadline_ms:.0f} ms")
+    _row("", "p50 ms", "max ms", "provisional")
+    try:
+        for label, deadline in (("wait for AI (before)", 0), ("two-phase (after)", deadline_ms)):
+            cfg = {"ai_provider": "gemini", "status_deadline_ms": deadline, **_UNLIMITED}
+            ai_engine._cache.clear()
+            samples, provisional, futures = [], 0, []
+            for i in range(switches):
+                ctx = trackers.FullContext(active_app="VS Code", vscode_file=f"sw_{i}.py")
+                start = time.perf_counter()
+                _, future = ai_engine.generate_status_within(ctx, cfg)
+                samples.append((time.perf_counter() - start) * 1000)
+                if future is not None:
+                    provisional += 1
+                    futures.append(future)
+            for future in futures:  # Late answers still land in the cache
+                future.result()
+            _row(label, f"{_percentile(samples, 50):.0f}", f"{max(samples):.0f}",
+                 f"{provisional}/{switches}")
+    finally:
+        ai_engine.PROVIDERS["gemini"] = original
+        ai_engine._cache.clear()
+
+
+def bench_local(entries: int = 2000, rounds: int = 20000):
+    """Offline generator trained on a synthetic history log: load time, µs/status, coverage."""
+    rng = random.Random(5)
+    files = ["main.py", "trackers.py", "ai_engine.py", "index.html", "app.ts"]
+    songs = [("Numb", "Linkin Park"), ("Bu Akşam", "Duman"), ("Yellow", "Coldplay")]
+    games = ["VALORANT", "Elden Ring", "Hades"]
+    shapes = [
+        lambda f, s, g: (trackers.FullContext(active_app="VS Code", vscode_file=f,
+                                              vscode_project="StatusAI", spotify_track=s[0],
+                                              spotify_artist=s[1]),
+                         f"{f} ile boğuşurken {s[0]} çalıyor 🎧"),
+        lambda f, s, g: (trackers.FullContext(active_app="VS Code", vscode_file=f,
+                                              vscode_project="StatusAI"),
+                         f"StatusAI'de {f} satır satır yeniden yazılıyor ⌨️"),
+        lambda f, s, g: (trackers.FullContext(game_name=g), f"{g}'da rekor peşinde 🎮"),
+        lambda f, s, g: (trackers.FullContext(active_app="Spotify", spotify_track=s[0],
+                                              spotify_artist=s[1]),
+                         f"{s[1]} — {s[0]} tekrar tekrar 🔁"),
+    ]
+    config = {"language": "tr", "persona": "chill"}
+    with tempfile.TemporaryDirectory() as tmp:
+        log = Path(tmp) / "status_history.log"
+        with open(log, "w", encoding="utf-8") as f:
+            for i in range(entries):
+                ctx, status = rng.choice(shapes)(rng.choice(files), rng.choice(songs), rng.choice(games))
+                arrow = "→" if i % 2 else "->"  # Current and older dashboard log styles
+                f.write(f'[2026-01-01 10:00:00] {{{ai_engine._history_tag(config)}}} '
+                        f'{ctx.build_prompt()} {arrow} "{status}"\n')
+        start = time.perf_counter()
+        generator = ai_engine.LocalGenerator.from_log(log)
+        load_ms = (time.perf_counter() - start) * 1000
+
+    # Fresh values the log never saw, in shapes it did (and one it didn't)
+    unseen = [
+        trackers.FullContext(active_app="VS Code", vscode_file="bench.rs", vscode_project="Other",
+                             spotify_track="Creep", spotify_artist="Radiohead"),
+        trackers.FullContext(game_name="Celeste"),
+        trackers.FullContext(active_app="VS Code", vscode_file="lib.go", vscode_project="Tool",
+                             browser_platform="GitHub", browser_page_title="PRs"),
+        trackers.FullContext(active_app="Notion", active_title="Plan"),
+    ]
+    print(f"\n  Local generator — {entries} log lines, {len(generator)} templates, "
+          f"loaded in {load_ms:.1f} ms")
+    _row("", "µs/status")
+    for ctx in unseen:
+        status = generator.generate(ctx, config)
+        label = ctx.build_prompt().splitlines()[0][:28]
+        us = _timeit(lambda: generator.generate(ctx, config), rounds) * 1000
+        print(f"  {label:<28}{us:>16.1f}  {status or '— (fixed template)'}")
+    us = _timeit(lambda: ai_engine._template_status(unseen[0], config), rounds) * 1000
+    print(f"  {'fixed template':<28}{us:>16.1f}  {ai_engine._template_status(unseen[0], config)}")
+
+
+# ──────────────────────────────────────────────
+#  End to End (local mock provider)
+# ──────────────────────────────────────────────
+
+def _engine_contexts(calls: int, working_set: int) -> list:
+    """`calls` contexts drawn from `working_set` distinct ones (0 = all distinct)."""
+    rng = random.Random(17)
+    songs = [("Numb", "Linkin Park"), ("Bu Akşam", "Duman"), ("Yellow", "Coldplay")]
+    contexts = []
+    for i in range(calls):
+        n = rng.randrange(working_set) if working_set else i
+        track, artist = songs[n % len(songs)]
+        contexts.append(trackers.FullContext(
+            active_app="VS Code", vscode_file=f"modul_{n}.py", vscode_project="StatusAI",
+            spotify_track=track, spotify_artist=artist))
+    return contexts
+
+
+def bench_engine(calls: int = 100, latency_ms: float = 80):
+    """generate_status through the local mock: throughput and p50/p95/p99 per scenario."""
+    try:
+        import openai  # noqa: F401
+        import groq  # noqa: F401
+    except ImportError:
+        print("\n  generate_status uçtan uca — atlandı (openai/groq paketleri kurulu değil)")
+        return
+
+    lognormal = dict(latency="lognormal", latency_ms=latency_ms, jitter=0.5, seed=1)
+    scenarios = [
+        # label, primary behaviour, backup behaviour or None, working set, extra config
+        ("cold cache, no stream", MockBehavior(**lognormal), None, 0, {"stream": False}),
+        ("cold cache, stream", MockBehavior(**lognormal), None, 0, {}),
+        ("working set of 8", MockBehavior(**lognormal), None, 8, {}),
+        ("10% 500s, no backup", MockBehavior(**lognormal, error_rate=0.1), None, 0, {}),
+        ("10% 500s + backup", MockBehavior(**lognormal, error_rate=0.1),
+         MockBehavior(**lognormal), 0, {}),
+        ("primary down + backup", MockBehavior(**lognormal, error_rate=1.0),
+         MockBehavior(**lognormal), 0, {}),
+        ("slow tail, hedged", MockBehavior(latency="lognormal", latency_ms=latency_ms,
+                                           jitter=1.2, seed=1),
+         MockBehavior(**lognormal), 0, {"hedge_delay": latency_ms * 2 / 1000}),
+    ]
+    saved = (ai_engine.stats, dict(ai_engine._breakers), ai_engine._engine.local)
+    ai_engine._engine.local = None  # Failures should read as failures here
+    print(f"\n  generate_status uçtan uca — {calls} calls per row, mock median {latency_ms:.0f} ms")
+    _row("", "status/s", "p50 ms", "p95 ms", "p99 ms", "AI statuses")
+    try:
+        for label, primary, backup, working_set, extra in scenarios:
+            with MockProviderServer(primary) as mock, MockProviderServer(backup or MockBehavior()) as spare:
+                cfg = mock.config_for("openai", **_UNLIMITED, **extra)
+                if backup is not None:
+                    cfg["provider_chain"] = [{"provider": "groq", "api_key": "mock",
+                                              "model": "mock", "base_url": spare.url}]
+                ai_engine._cache.clear()
+                ai_engine._breakers.clear()
+                ai_engine.stats = ai_engine.Stats()
+                ai_engine.warm_up(cfg)
+                samples = []
+                start = time.perf_counter()
+                for ctx in _engine_contexts(calls, working_set):
+                    t0 = time.perf_counter()
+                    ai_engine.generate_status(ctx, cfg)
+                    samples.append((time.perf_counter() - t0) * 1000)
+                elapsed = time.perf_counter() - start
+                real = ai_engine.stats.successful_calls + ai_engine.stats.cache_hits
+            _row(label, f"{calls / elapsed:.1f}", f"{_percentile(samples, 50):.0f}",
+                 f"{_percentile(samples, 95):.0f}", f"{_percentile(samples, 99):.0f}",
+                 f"{real}/{calls}")
+    finally:
+        ai_engine.stats, ai_engine._engine.local = saved[0], saved[2]
+        ai_engine._breakers.clear()
+        ai_engine._breakers.update(saved[1])
+        ai_engine._cache.clear()
+        ai_engine.reset_clients()
+
+
+# ──────────────────────────────────────────────
+#  Trace Replay
+# ──────────────────────────────────────────────
+
+def _synthetic_trace(frames: int = 600, seed: int = 3) -> list[dict]:
+    """A recorded-looking session: coding, music, browsing and the odd game, 2s apart."""
+    rng = random.Random(seed)
+    processes = [[f"svchost{i}.exe", 4000 + i] for i in range(250)]
+    processes += [["Code.exe", 100], ["Spotify.exe", 200], ["chrome.exe", 300],
+                  ["Discord.exe", 400], ["explorer.exe", 500]]
+    foregrounds = [
+        ["main.py — StatusAI — Visual Studio Code", 100],
+        ["trackers.py — StatusAI — Visual Studio Code", 100],
+        ["v1onues/StatusAI - GitHub - Google Chrome", 300],
+        ["Lofi Hip Hop Radio - YouTube - Google Chrome", 300],
+        ["#genel | Sunucu - Discord", 400],
+    ]
+    trace, current = [], foregrounds[0]
+    for i in range(frames):
+        if rng.random() < 0.1:
+            current = rng.choice(foregrounds)
+        song = ["Numb - Linkin Park", "Duman - Bu Akşam", "Spotify Premium"][(i // 90) % 3]
+        procs = list(processes)
+        if 200 <= i < 260:
+            procs.append(["VALORANT.exe", 900])
+            current = ["VALORANT", 900]
+        trace.append({
+            "t": i * 2.0,
+            "foreground": current,
+            "windows": [[100, True, foregrounds[0][0]], [200, True, song],
+                        [300, True, foregrounds[2][0]], [400, True, foregrounds[4][0]]],
+            "processes": procs,
+        })
+    return trace
+
+
+def bench_replay(path: str = ""):
+    """Drive the trackers from a recorded (or synthetic) trace at full speed."""
+    replay = trackers.ReplayBackend.load(path) if path else trackers.ReplayBackend(_synthetic_trace())
+    profile = trackers.TrackerProfile.build({"Code.exe": "VS Code", "Discord.exe": "Discord"})
+    label = path or "synthetic"
+    print(f"\n  Trace replay — {label}, {len(replay)} frames")
+
+    start = time.perf_counter()
+    for _ in replay:
+        trackers.get_full_context(profile, backend=replay)
+    full_ms = (time.perf_counter() - start) * 1000 / max(1, len(replay))
+
+    collector = trackers.ContextCollector(clock=replay.clock, workers=0, backend=replay)
+    start = time.perf_counter()
+    for _ in replay:
+        collector.collect(profile)
+    tiered_ms = (time.perf_counter() - start) * 1000 / max(1, len(replay))
+
+    recorded_s = replay.clock()
+    speedup = recorded_s * 1000 / max(1e-9, tiered_ms * len(replay))
+    _row("", "ms/frame")
+    _row("get_full_context", f"{full_ms:.3f}")
+    _row("ContextCollector", f"{tiered_ms:.3f}")
+    print(f"  {recorded_s:.0f}s of recorded time replayed ~{speedup:,.0f}x faster than real time")
+
+
+def record(path: str, duration: str = "300", interval: str = "2"):
+    """Record live system states into a JSONL trace for `replay`."""
+    recorder = trackers.TraceRecorder(path)
+    print(f"  Kaydediliyor → {path} ({duration}s, {interval}s aralık). Ctrl+C ile durdur.")
+    try:
+        frames = recorder.run(interval=float(interval), duration=float(duration))
+    except KeyboardInterrupt:
+        frames = None
+    print(f"  Kayıt tamamlandı{f': {frames} kare' if frames else ''}.")
+
+
+# ──────────────────────────────────────────────
+#  Entry Point
+# ──────────────────────────────────────────────
+
+BENCHMARKS = {
+    "processes": bench_processes,
+    "scheduler": bench_scheduler,
+    "watcher": bench_watcher,
+    "windows": bench_windows,
+    "titles": bench_titles,
+    "blacklist": bench_blacklist,
+    "fingerprint": bench_fingerprint,
+    "status_cache": bench_status_cache,
+    "warm_start": bench_warm_start,
+    "clients": bench_clients,
+    "stream": bench_stream,
+    "system_prompt": bench_system_prompt,
+    "hedging": bench_hedging,
+    "failover": bench_failover,
+    "storm": bench_storm,
+    "batch": bench_batch,
+    "pregen": bench_pregen,
+    "coalesce": bench_coalesce,
+    "deadline": bench_deadline,
+    "local": bench_local,
+    "engine": bench_engine,
+    "replay": bench_replay,
+}
+
+
+def main(argv: list[str]):
+    if argv and argv[0] == "record":
+        if len(argv) < 2:
+            print("Kullanım: python benchmark.py record trace.jsonl [süre_s] [aralık_s]")
+            sys.exit(1)
+        record(*argv[1:4])
+        return
+    if len(argv) > 1 and argv[0] in BENCHMARKS and argv[1] not in BENCHMARKS:
+        BENCHMARKS[argv[0]](*argv[1:])
+        return
+
+    names = argv or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Bilinmeyen benchmark: {name} (seçenekler: {', '.join(BENCHMARKS)})")
+            sys.exit(1)
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -46,7 +46,6 @@ import threading
 import time
 import webbrowser
 import psutil
-from datetime import datetime
 from pathlib import Path
 from queue import Queue, Empty
 
@@ -58,8 +57,30 @@ import setup_updater
 # ──────────────────────────────────────────────
 
 from discord_rpc import DiscordRPC
-from trackers import get_full_context, FullContext
-from ai_engine import generate_status, get_stats
+from trackers import (
+    get_full_context,
+    get_parser_cache_stats,
+    ContextCollector,
+    FullContext,
+    ForegroundWatcher,
+    TrackerProfile,
+)
+from ai_engine import (
+    generate_status_within,
+    get_budget_info,
+    get_cache_info,
+    get_stats,
+    get_usage_info,
+    preview_status,
+    reset_clients,
+    rotation_due,
+    start_pregenerator,
+    stop_pregenerator,
+    use_local_generator,
+    use_persistent_cache,
+    warm_up,
+    StatusHistoryLog,
+)
 
 
 # ──────────────────────────────────────────────
@@ -79,6 +100,7 @@ BASE_DIR.mkdir(parents=True, exist_ok=True)
 VERSION = "3.0.0"
 CONFIG_FILE = BASE_DIR / "config.json"
 LOG_FILE = BASE_DIR / "status_history.log"
+CACHE_FILE = BASE_DIR / "status_cache.db"
 PORT = 3131
 
 PERSONA_ICONS = {
@@ -159,6 +181,7 @@ class ConfigManager:
         self._path = CONFIG_FILE
         self._config: dict = {}
         self._last_modified: float = 0
+        self._profile = TrackerProfile()
 
     _DEFAULT_CONFIG = {
         "discord_client_id": "",
@@ -175,6 +198,23 @@ class ConfigManager:
         "button_label": "",
         "button_url": "",
         "blacklist": [],
+        "persistent_cache": True,
+        "warm_up": True,
+        "hedge_provider": {},
+        "hedge_delay": 2.0,
+        "provider_chain": [],
+        "provider_timeout": 15.0,
+        "rate_limit_per_minute": 0,
+        "rate_limit_burst": 3,
+        "daily_call_budget": 0,
+        "daily_token_budget": 0,
+        "batch_size": 1,
+        "batch_rotate_seconds": 120,
+        "pregenerate": False,
+        "status_cache_ttl": 600,
+        "local_generator": True,
+        "stream": True,
+        "status_deadline_ms": 0,
     }
 
     def load(self) -> dict:
@@ -201,6 +241,8 @@ class ConfigManager:
         self._config.setdefault("language", "tr")
         self._config.setdefault("show_button", False)
 
+        self._profile = TrackerProfile.from_config(self._config)
+        reset_clients(self._config)  # Keys or models may have changed
         self._last_modified = self._path.stat().st_mtime
         return self._config
 
@@ -231,6 +273,8 @@ class ConfigManager:
             json.dump(full, f, indent=4, ensure_ascii=False)
 
         self._config = full
+        self._profile = TrackerProfile.from_config(full)
+        reset_clients(full)
         self._last_modified = self._path.stat().st_mtime
 
     def check_reload(self) -> bool:
@@ -247,6 +291,11 @@ class ConfigManager:
     def config(self) -> dict:
         return self._config
 
+    @property
+    def profile(self) -> TrackerProfile:
+        """Precompiled tracking config, rebuilt on every load or save."""
+        return self._profile
+
 
 # ──────────────────────────────────────────────
 #  Bot Engine Thread
@@ -261,7 +310,11 @@ class BotEngine:
         self._thread: threading.Thread | None = None
         self._running = False
         self._stop_event = threading.Event()
+        self._watcher = ForegroundWatcher()
+        self._collector = ContextCollector()
+        self._history_log = StatusHistoryLog(LOG_FILE)
         self._current_status = ""
+        self._last_ctx: FullContext | None = None
         self._start_time: float = 0
         self._rpc: DiscordRPC | None = None
 
@@ -273,6 +326,14 @@ class BotEngine:
     def current_status(self) -> str:
         return self._current_status
 
+    @property
+    def last_context(self) -> FullContext | None:
+        return self._last_ctx
+
+    @property
+    def source_timings(self) -> dict:
+        return self._collector.timings()
+
     @property
     def uptime(self) -> str:
         if not self._running or not self._start_time:
@@ -285,6 +346,9 @@ class BotEngine:
         if self._running:
             return
         self._stop_event.clear()
+        # A closed collector's pool can't be reused: fresh one per run
+        self._collector.close()  # In case the last run ended on its own
+        self._collector = ContextCollector()
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
 
@@ -292,8 +356,10 @@ class BotEngine:
         if not self._running:
             return
         self._stop_event.set()
+        self._watcher.wake()
         if self._thread:
             self._thread.join(timeout=5)
+        self._collector.close()
         self._running = False
 
     def _log(self, log_type: str, msg: str):
@@ -303,9 +369,10 @@ class BotEngine:
         self._running = True
         self._start_time = time.time()
         config = self.config_mgr.config
-        tracked_apps = config.get("tracked_apps", {})
-        blacklist = config.get("blacklist", [])
         interval = max(15, min(60, config.get("update_interval", 20)))
+        use_persistent_cache(CACHE_FILE if config.get("persistent_cache", True) else None)
+        use_local_generator(LOG_FILE if config.get("local_generator", True) else None,
+                            config.get("fallback_status"))
 
         # Connect to Discord
         self._log("info", "Discord RPC bağlanıyor...")
@@ -318,12 +385,21 @@ class BotEngine:
             self._running = False
             return
 
+        if config.get("warm_up", True):
+            threading.Thread(target=warm_up, args=(config,), daemon=True).start()
+        start_pregenerator(config)
+
+        # Foreground changes wake the loop; the interval is only a safety net
+        self._watcher.start()
+
         self._log(
             "info",
-            f"Bot başlatıldı! Güncelleme: {interval}s | Persona: {config.get('persona', 'custom').upper()}",
+            f"Bot başlatıldı! Güncelleme: {'olay + ' if self._watcher.event_driven else ''}{interval}s | Persona: {config.get('persona', 'custom').upper()}",
         )
 
         last_ctx = None
+        # Provisional status on air: (AI future, the context it was asked for)
+        pending = None
         cycle = 0
 
         while not self._stop_event.is_set():
@@ -333,53 +409,81 @@ class BotEngine:
                 # Hot-reload config
                 if cycle % 5 == 0 and self.config_mgr.check_reload():
                     config = self.config_mgr.config
-                    tracked_apps = config.get("tracked_apps", {})
-                    blacklist = config.get("blacklist", [])
                     interval = max(15, min(60, config.get("update_interval", 20)))
+                    use_persistent_cache(CACHE_FILE if config.get("persistent_cache", True) else None)
+                    use_local_generator(LOG_FILE if config.get("local_generator", True) else None,
+                                        config.get("fallback_status"))
+                    if config.get("warm_up", True):
+                        threading.Thread(target=warm_up, args=(config,), daemon=True).start()
+                    start_pregenerator(config)
                     self._log("success", "🔄 Config yeniden yüklendi!")
 
                 # 1. Context
-                ctx = get_full_context(tracked_apps, blacklist)
-
-                # 2. Check change
+                # Read every cycle: save() from the dashboard rebuilds it too
+                ctx = self._collector.collect(self.config_mgr.profile)
+                if ctx.stale_sources:
+                    self._log(
+                        "warn",
+                        f"Gecikmeli kaynak (son değer kullanıldı): {', '.join(ctx.stale_sources)}",
+                    )
+
+                # 2. Late AI answer for a provisional status
+                late = None
+                if pending is not None and pending[0].done():
+                    future, asked_ctx = pending
+                    pending = None
+                    if not ctx.has_changed(asked_ctx):  # Still current: replace the placeholder
+                        late = future.result()
+                        if late is None:  # No provider answered: the provisional status stays
+                            self._log("warn", "AI yanıt vermedi, geçici durum korunuyor")
+
+                # 3. Check change
                 if (
-                    last_ctx is not None
+                    late is None
+                    and last_ctx is not None
                     and not ctx.has_changed(last_ctx)
                     and self._current_status
+                    and not rotation_due(ctx, config)
                 ):
-                    self._stop_event.wait(interval)
+                    self._watcher.wait(interval)
                     continue
 
-                # 3. Build prompt
+                # 4. Build prompt
                 context_prompt = ctx.build_prompt()
-                self._log("info", f"Bağlam: {context_prompt}")
-
-                if ctx.running_apps:
-                    self._log("info", f"Çalışan: {', '.join(ctx.running_apps)}")
-
-                # 4. Status generation
-                if ctx.has_media:
+                if late is None:
+                    self._log("info", f"Bağlam: {context_prompt}")
+
+                    if ctx.running_apps:
+                        self._log("info", f"Çalışan: {', '.join(ctx.running_apps)}")
+
+                # 5. Status generation — past the deadline a quick status goes
+                # out first and the AI one follows (the watcher is woken for it)
+                future = None
+                direct = False  # Literal media titles, not AI output
+                if late is not None:
+                    new_status = late
+                elif ctx.has_media:
                     new_status = ctx.build_direct_status()
+                    direct = bool(new_status)
                     if not new_status:
-                        new_status = generate_status(context_prompt, config)
+                        new_status, future = generate_status_within(ctx, config, self._watcher.wake)
                 else:
-                    new_status = generate_status(context_prompt, config)
+                    new_status, future = generate_status_within(ctx, config, self._watcher.wake)
+                pending = (future, ctx) if future is not None else None
 
                 if new_status != self._current_status:
                     self._current_status = new_status
-                    self._log("status", f"-> {self._current_status}")
+                    if future is not None:
+                        self._log("status", f"-> {self._current_status} (geçici, AI bekleniyor)")
+                    else:
+                        self._log("status", f"-> {self._current_status}")
 
-                    # Log to file
-                    try:
-                        ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        with open(LOG_FILE, "a", encoding="utf-8") as f:
-                            f.write(
-                                f'[{ts}] {context_prompt} -> "{self._current_status}"\n'
-                            )
-                    except Exception:
-                        pass
-
-                    # 5. Update Discord
+                    # Log to file; provisional ones aren't AI output
+                    if future is None:
+                        self._history_log.log(ctx, self._current_status,
+                                              None if direct else config)
+
+                    # 6. Update Discord
                     try:
                         buttons = None
                         if config.get("show_button", False):
@@ -426,14 +530,16 @@ class BotEngine:
                     except Exception as e:
                         self._log("warn", f"RPC hatasi: {e}")
 
-                last_ctx = ctx
-                self._stop_event.wait(interval)
+                last_ctx = self._last_ctx = ctx
+                self._watcher.wait(interval)
 
             except Exception as e:
                 self._log("error", f"Hata: {e}")
-                self._stop_event.wait(interval)
+                self._watcher.wait(interval)
 
         # Cleanup
+        self._watcher.stop()
+        stop_pregenerator()
         if self._rpc:
             try:
                 self._rpc.close()
@@ -483,6 +589,72 @@ def api_status():
             "ai_calls": stats.total_calls,
             "provider": config_mgr.config.get("ai_provider", "—"),
             "persona": config_mgr.config.get("persona", "—"),
+            "status_cache": get_cache_info(),
+            "usage": get_usage_info(),
+            "budget": get_budget_info(config_mgr.config),
+            "parser_cache": get_parser_cache_stats(),
+            "context_sources": bot.source_timings,
+        }
+    )
+
+
+# Fields a preview may override without saving the config
+_PREVIEW_FIELDS = ("persona", "custom_persona_text", "language")
+
+
+def _preview_context(fields: dict) -> FullContext:
+    """FullContext from request JSON; unknown keys are ignored, mistyped ones raise ValueError."""
+    values = {}
+    for name, value in fields.items():
+        field = FullContext.__dataclass_fields__.get(name)
+        if field is None or not field.init:
+            continue
+        if field.default_factory is list:
+            ok = isinstance(value, list) and all(isinstance(v, str) for v in value)
+        else:
+            ok = type(value) is type(field.default)
+        if not ok:
+            raise ValueError(f"'{name}' alanının türü hatalı")
+        values[name] = value
+    return FullContext(**values)
+
+
+@app.route("/api/preview", methods=["POST"])
+def api_preview():
+    """
+    Status for the bot's current context (or a supplied one) under unsaved
+    persona/language settings. Goes through the shared engine, so it reuses
+    the cache and joins an identical call already in flight.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"message": "Geçersiz istek: JSON nesnesi bekleniyor"}), 400
+    for k in _PREVIEW_FIELDS:
+        if k in data and not isinstance(data[k], str):
+            return jsonify({"message": f"Geçersiz istek: '{k}' metin olmalı"}), 400
+    config = dict(config_mgr.config)
+    config.update({k: data[k] for k in _PREVIEW_FIELDS if k in data})
+
+    fields = data.get("context")
+    if fields is not None:
+        if not isinstance(fields, dict):
+            return jsonify({"message": "Geçersiz bağlam: nesne bekleniyor"}), 400
+        try:
+            ctx = _preview_context(fields)
+        except ValueError as e:
+            return jsonify({"message": f"Geçersiz bağlam: {e}"}), 400
+    else:
+        ctx = bot.last_context or get_full_context(config_mgr.profile)
+
+    start = time.perf_counter()
+    status = preview_status(ctx, config)
+    return jsonify(
+        {
+            "status": status,
+            "context": ctx.build_prompt(),
+            "persona": config.get("persona", "custom"),
+            "language": config.get("language", "tr"),
+            "ms": round((time.perf_counter() - start) * 1000, 1),
         }
     )
 
@@ -11,8 +11,9 @@ Usage:
 import json
 import signal
 import sys
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import Future
 from pathlib import Path
 
 try:
@@ -24,8 +25,20 @@ except ImportError:
     Fore = Style = _NoColor()
 
 from discord_rpc import DiscordRPC
-from trackers import get_full_context, FullContext
-from ai_engine import generate_status, get_stats
+from trackers import ContextCollector, FullContext, ForegroundWatcher, TrackerProfile
+from ai_engine import (
+    generate_status_within,
+    get_budget_info,
+    get_stats,
+    reset_clients,
+    rotation_due,
+    start_pregenerator,
+    stop_pregenerator,
+    use_local_generator,
+    use_persistent_cache,
+    warm_up,
+    StatusHistoryLog,
+)
 
 
 # ──────────────────────────────────────────────
@@ -35,6 +48,7 @@ from ai_engine import generate_status, get_stats
 VERSION = "3.0.0"
 CONFIG_FILE = "config.json"
 LOG_FILE = "status_history.log"
+CACHE_FILE = "status_cache.db"
 
 PERSONA_ICONS = {
     "hacker": "👾", "sigma": "🐺", "chill": "☕",
@@ -84,6 +98,7 @@ class ConfigManager:
         self._config: dict = {}
         self._path = Path(__file__).parent / CONFIG_FILE
         self._last_modified: float = 0
+        self._profile = TrackerProfile()
 
     def load(self) -> dict:
         if not self._path.exists():
@@ -108,6 +123,8 @@ class ConfigManager:
         self._config.setdefault("language", "tr")
         self._config.setdefault("show_button", False)
 
+        self._profile = TrackerProfile.from_config(self._config)
+        reset_clients(self._config)  # Keys or models may have changed
         self._last_modified = self._path.stat().st_mtime
         return self._config
 
@@ -125,22 +142,10 @@ class ConfigManager:
     def config(self) -> dict:
         return self._config
 
-
-# ──────────────────────────────────────────────
-#  Logger
-# ──────────────────────────────────────────────
-
-class ActivityLogger:
-    def __init__(self):
-        self._path = Path(__file__).parent / LOG_FILE
-
-    def log(self, context_str: str, status: str):
-        try:
-            ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            with open(self._path, "a", encoding="utf-8") as f:
-                f.write(f"[{ts}] {context_str} → \"{status}\"\n")
-        except Exception:
-            pass
+    @property
+    def profile(self) -> TrackerProfile:
+        """Precompiled tracking config, rebuilt on every (re)load."""
+        return self._profile
 
 
 def _log(icon: str, msg: str):
@@ -173,13 +178,26 @@ def _print_stats(config: dict):
     ai = get_stats()
     persona = config.get("persona", "custom")
     icon = PERSONA_ICONS.get(persona, "⚡")
+    budget = get_budget_info(config)
+    snapshot = ai.snapshot()
+    wins = ", ".join(f"{name} {p['wins']}" for name, p in snapshot["providers"].items()) or "—"
+    recent = snapshot["last_5_min"]
+    latency = recent["latency_ms"]
+    percentiles = (f"p50 {latency['p50']:.0f} / p95 {latency['p95']:.0f} / p99 {latency['p99']:.0f} ms"
+                   if latency["count"] else "—")
+    errors = ", ".join(f"{name} {n}" for name, n in list(snapshot["errors"].items())[:3]) or "yok"
     print(f"""
   {Fore.CYAN}┌─── Stats ────────────────────────────────────┐{Style.RESET_ALL}
   {Fore.CYAN}│{Style.RESET_ALL}  {icon} Persona: {Fore.WHITE}{persona.upper()}{Style.RESET_ALL}
   {Fore.CYAN}│{Style.RESET_ALL}  🤖 Provider: {Fore.WHITE}{config.get('ai_provider', '?').upper()}{Style.RESET_ALL}
   {Fore.CYAN}│{Style.RESET_ALL}  ⏱️  Uptime: {Fore.WHITE}{ai.uptime}{Style.RESET_ALL}
   {Fore.CYAN}│{Style.RESET_ALL}  📊 AI Calls: {Fore.GREEN}{ai.successful_calls}{Style.RESET_ALL}/{ai.total_calls} ({ai.success_rate})
-  {Fore.CYAN}│{Style.RESET_ALL}  💾 Cache: {Fore.YELLOW}{ai.cache_hits}{Style.RESET_ALL}
+  {Fore.CYAN}│{Style.RESET_ALL}  💾 Cache: {Fore.YELLOW}{ai.cache_hits}{Style.RESET_ALL}/{ai.cache_hits + ai.cache_misses} ({ai.cache_hit_rate})
+  {Fore.CYAN}│{Style.RESET_ALL}  🏁 Kazanan: {Fore.WHITE}{wins}{Style.RESET_ALL} (hedge: {ai.hedges_fired})
+  {Fore.CYAN}│{Style.RESET_ALL}  💰 Bütçe: {Fore.WHITE}{budget['calls_used']}/{budget['calls_limit'] or '∞'}{Style.RESET_ALL} çağrı, {budget['degraded']} tasarruflu durum
+  {Fore.CYAN}│{Style.RESET_ALL}  🔤 Token: {Fore.WHITE}{ai.prompt_tokens}{Style.RESET_ALL} girdi, {ai.cached_tokens} önbellekten ({ai.cached_token_rate}), {ai.completion_tokens} çıktı
+  {Fore.CYAN}│{Style.RESET_ALL}  ⚡ Son 5 dk: {Fore.WHITE}{percentiles}{Style.RESET_ALL}, {recent.get('total_calls', 0)} çağrı
+  {Fore.CYAN}│{Style.RESET_ALL}  ❗ Hatalar: {Fore.WHITE}{errors}{Style.RESET_ALL}
   {Fore.CYAN}└──────────────────────────────────────────────┘{Style.RESET_ALL}
 """)
 
@@ -223,17 +241,32 @@ def main_loop(rpc: DiscordRPC, config_mgr: ConfigManager):
     config = config_mgr.config
     interval = max(15, min(60, config.get("update_interval", 20)))
     tracked_apps = config.get("tracked_apps", {})
+    profile = config_mgr.profile
+    collector = ContextCollector()
+    cache_path = Path(__file__).parent / CACHE_FILE
+    use_persistent_cache(cache_path if config.get("persistent_cache", True) else None)
+    use_local_generator(Path(__file__).parent / LOG_FILE if config.get("local_generator", True) else None,
+                        config.get("fallback_status"))
+    if config.get("warm_up", True):
+        threading.Thread(target=warm_up, args=(config,), daemon=True).start()
+    start_pregenerator(config)
     last_ctx: FullContext | None = None
     current_status = ""
+    # Provisional status on air: (AI future, the context it was asked for)
+    pending: tuple[Future, FullContext] | None = None
     offline_mode = False
     cycle = 0
-    logger = ActivityLogger()
+    logger = StatusHistoryLog(Path(__file__).parent / LOG_FILE)
 
     persona = config.get("persona", "custom")
     icon = PERSONA_ICONS.get(persona, "⚡")
 
+    # Foreground changes wake the loop; the interval is only a safety net
+    watcher = ForegroundWatcher()
+    watcher.start()
+
     _divider()
-    _info(f"Güncelleme: {interval}s | AI: {config.get('ai_provider', 'gemini').upper()} | {icon} {persona.upper()}")
+    _info(f"Güncelleme: {'olay + ' if watcher.event_driven else ''}{interval}s | AI: {config.get('ai_provider', 'gemini').upper()} | {icon} {persona.upper()}")
     _info(f"Takip: {len(tracked_apps)} uygulama | Mod: Storyteller Engine")
     _divider()
     _info("Ana döngü başlatıldı. Ctrl+C ile durdur.\n")
@@ -245,42 +278,72 @@ def main_loop(rpc: DiscordRPC, config_mgr: ConfigManager):
             # Hot-reload
             if cycle % 5 == 0 and config_mgr.check_reload():
                 config = config_mgr.config
-                tracked_apps = config.get("tracked_apps", {})
+                profile = config_mgr.profile
                 interval = max(15, min(60, config.get("update_interval", 20)))
+                use_persistent_cache(cache_path if config.get("persistent_cache", True) else None)
+                use_local_generator(Path(__file__).parent / LOG_FILE if config.get("local_generator", True) else None,
+                                    config.get("fallback_status"))
+                if config.get("warm_up", True):
+                    threading.Thread(target=warm_up, args=(config,), daemon=True).start()
+                start_pregenerator(config)
                 _success("🔄 Config yeniden yüklendi!")
 
             # ── 1. Multi-source context ──
-            ctx = get_full_context(tracked_apps)
-
-            # ── 2. Check for change ──
-            if last_ctx is not None and not ctx.has_changed(last_ctx) and current_status:
-                time.sleep(interval)
+            ctx = collector.collect(profile)
+            if ctx.stale_sources:
+                _warn(f"Gecikmeli kaynak (son değer kullanıldı): {', '.join(ctx.stale_sources)}")
+
+            # ── 2. Late AI answer for a provisional status ──
+            late = None
+            if pending is not None and pending[0].done():
+                future, asked_ctx = pending
+                pending = None
+                if not ctx.has_changed(asked_ctx):  # Still current: replace the placeholder
+                    late = future.result()
+                    if late is None:  # No provider answered: the provisional status stays
+                        _warn("AI yanıt vermedi, geçici durum korunuyor")
+
+            # ── 3. Check for change ──
+            if (late is None and last_ctx is not None and not ctx.has_changed(last_ctx)
+                    and current_status and not rotation_due(ctx, config)):
+                watcher.wait(interval)
                 continue
 
-            # ── 3. Build context prompt ──
+            # ── 4. Build context prompt ──
             context_prompt = ctx.build_prompt()
-            _info(f"Bağlam: {context_prompt}")
-
-            if ctx.running_apps:
-                _info(f"Çalışan: {', '.join(ctx.running_apps)}")
-
-            # ── 4. Status Generation (Template for media, AI for rest) ──
-            if ctx.has_media:
+            if late is None:
+                _info(f"Bağlam: {context_prompt}")
+
+                if ctx.running_apps:
+                    _info(f"Çalışan: {', '.join(ctx.running_apps)}")
+
+            # ── 5. Status Generation (Template for media, AI for rest) ──
+            # Past the deadline a quick status goes out first; the AI one
+            # follows when it lands (the watcher is woken for it)
+            future = None
+            direct = False  # Literal media titles, not AI output
+            if late is not None:
+                new_status = late
+            elif ctx.has_media:
                 # Media detected → use template with literal titles
                 new_status = ctx.build_direct_status()
+                direct = bool(new_status)
                 if not new_status:
-                    new_status = generate_status(context_prompt, config)
+                    new_status, future = generate_status_within(ctx, config, watcher.wake)
             else:
                 # No media → AI storytelling
-                new_status = generate_status(context_prompt, config)
+                new_status, future = generate_status_within(ctx, config, watcher.wake)
+            pending = (future, ctx) if future is not None else None
 
             if new_status != current_status:
                 current_status = new_status
-                _status_log(f"→ {current_status}")
+                if future is not None:
+                    _status_log(f"→ {current_status} (geçici, AI bekleniyor)")
+                else:
+                    _status_log(f"→ {current_status}")
+                    logger.log(ctx, current_status, None if direct else config)
 
-                logger.log(context_prompt, current_status)
-
-                # ── 5. Update Discord ──
+                # ── 6. Update Discord ──
                 try:
                     # Build buttons
                     buttons = None
@@ -346,7 +409,7 @@ def main_loop(rpc: DiscordRPC, config_mgr: ConfigManager):
             if cycle % 10 == 0:
                 _print_stats(config)
 
-            time.sleep(interval)
+            watcher.wait(interval)
 
         except KeyboardInterrupt:
             break
@@ -355,7 +418,11 @@ def main_loop(rpc: DiscordRPC, config_mgr: ConfigManager):
             if not offline_mode:
                 offline_mode = True
                 _offline(rpc, config)
-            time.sleep(interval)
+            watcher.wait(interval)
+
+    watcher.stop()
+    stop_pregenerator()
+    collector.close()
 
 
 def _offline(rpc: DiscordRPC, config: dict):
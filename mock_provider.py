@@ -0,0 +1,306 @@
+"""
+mock_provider.py — Offline AI Provider Stand-in
+~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+A local HTTP server speaking the request shapes ai_engine sends: OpenAI /
+Groq chat completions (plain and SSE-streamed) and Gemini's REST
+generateContent / streamGenerateContent. Latency distribution, error rate,
+429s and per-word streaming delay are configurable, so the engine can be
+exercised and benchmarked with no network and no API keys.
+
+Usage:
+    python mock_provider.py                              # :8765, 50 ms fixed
+    python mock_provider.py --latency lognormal --latency-ms 400 --jitter 0.6
+    python mock_provider.py --error-rate 0.1 --rate-limit-rate 0.05 --token-ms 20
+
+Then point a config at it, e.g. "ai_provider": "openai",
+"ai_base_url": "http://127.0.0.1:8765/v1" (Groq and Gemini: the bare
+http://127.0.0.1:8765).
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+# ──────────────────────────────────────────────
+#  Behaviour
+# ──────────────────────────────────────────────
+
+DEFAULT_REPLY = "Mock durum #{n} ⚡"
+
+_BATCH_ASK = re.compile(r"(\d+) FARKLI aday")
+
+
+@dataclass
+class MockBehavior:
+    """How the server answers. Mutable while it runs."""
+    latency: str = "fixed"      # fixed | uniform | lognormal
+    latency_ms: float = 50.0    # fixed value, uniform centre, lognormal median
+    jitter: float = 0.5         # uniform: ±fraction of latency_ms; lognormal: sigma
+    token_ms: float = 0.0       # Delay per streamed word
+    error_rate: float = 0.0     # Share of requests answered 500
+    rate_limit_rate: float = 0.0  # Share answered 429
+    reply: str = DEFAULT_REPLY  # "{n}" becomes the request number
+    seed: Optional[int] = None
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Seconds before the first byte of a reply."""
+        base = self.latency_ms / 1000
+        if self.latency == "uniform":
+            return max(0.0, base * (1 + rng.uniform(-self.jitter, self.jitter)))
+        if self.latency == "lognormal":
+            return rng.lognormvariate(0, self.jitter) * base
+        return base
+
+
+# ──────────────────────────────────────────────
+#  HTTP Handler
+# ──────────────────────────────────────────────
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real APIs
+    disable_nagle_algorithm = True
+    server: "MockProviderServer"
+
+    def do_GET(self):
+        if "/models" in self.path:
+            self._json(200, {"object": "list", "data": [
+                {"id": "mock", "object": "model", "created": 0, "owned_by": "mock"}]})
+        else:
+            self._json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            request = {}
+        path = self.path.split("?")[0]
+        if path.endswith("/chat/completions"):
+            self._chat(request)
+        elif path.endswith(":countTokens"):  # Gemini warm-up
+            self._json(200, {"totalTokens": 1})
+        elif ":generateContent" in path or ":streamGenerateContent" in path:
+            self._gemini(request, streamed=":streamGenerateContent" in path)
+        else:
+            # e.g. Gemini cachedContents: refuse, as the API does for short prompts
+            self._json(400, {"error": {"code": 400, "message": "not supported by mock",
+                                       "status": "INVALID_ARGUMENT"}})
+
+    # ── Shared ──
+
+    def _admit(self) -> Optional[list[str]]:
+        """Latency, then error/429 injection; the reply's words if it goes ahead."""
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            n = server.requests
+            delay = server.behavior.sample_latency(server.rng)
+            roll = server.rng.random()
+        time.sleep(delay)
+        behavior = server.behavior
+        if roll < behavior.rate_limit_rate:
+            with server.lock:
+                server.rate_limited += 1
+            self._json(429, {"error": {"code": 429, "message": "Rate limit reached (mock)",
+                                       "type": "rate_limit_exceeded",
+                                       "status": "RESOURCE_EXHAUSTED"}},
+                       {"Retry-After": "1"})
+            return None
+        if roll < behavior.rate_limit_rate + behavior.error_rate:
+            with server.lock:
+                server.errors += 1
+            self._json(500, {"error": {"code": 500, "message": "Internal error (mock)",
+                                       "status": "INTERNAL"}})
+            return None
+        return re.findall(r"\S+\s*", self._reply_text(n))
+
+    def _reply_text(self, n: int) -> str:
+        text = self.server.behavior.reply.replace("{n}", str(n))
+        ask = _BATCH_ASK.search(self._prompt)
+        if ask:  # Batch mode wants a JSON array of N candidates
+            return json.dumps([f"{text} ({i + 1})" for i in range(int(ask.group(1)))],
+                              ensure_ascii=False)
+        return text
+
+    def _json(self, code: int, payload: dict, headers: Optional[dict] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, content_type: str, pieces: list[str], counted: list[bool]):
+        """Chunked body, one piece per `token_ms`; stops quietly if the client hangs up."""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for piece, is_token in zip(pieces, counted):
+                if is_token:
+                    time.sleep(self.server.behavior.token_ms / 1000)
+                data = piece.encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+                if is_token:
+                    with self.server.lock:
+                        self.server.tokens_sent += 1
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            self.close_connection = True
+
+    def _count_all(self, words: list[str]):
+        time.sleep(self.server.behavior.token_ms / 1000 * len(words))
+        with self.server.lock:
+            self.server.tokens_sent += len(words)
+
+    # ── OpenAI / Groq ──
+
+    def _chat(self, request: dict):
+        messages = request.get("messages") or [{}]
+        self._prompt = str(messages[-1].get("content", ""))
+        words = self._admit()
+        if words is None:
+            return
+        usage = {"prompt_tokens": sum(len(str(m.get("content", ""))) for m in messages) // 4,
+                 "completion_tokens": len(words)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        base = {"id": "mock", "created": int(time.time()), "model": request.get("model", "mock")}
+        if not request.get("stream"):
+            self._count_all(words)
+            self._json(200, dict(base, object="chat.completion", usage=usage, choices=[
+                {"index": 0, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "".join(words)}}]))
+            return
+
+        chunk = dict(base, object="chat.completion.chunk")
+        events = [dict(chunk, choices=[{"index": 0, "delta": {"content": word},
+                                        "finish_reason": None}]) for word in words]
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append(dict(chunk, choices=[], usage=usage))
+        elif "/openai/" in self.path:  # Groq's own SDK path: usage under x_groq
+            events[-1]["x_groq"] = {"id": "mock", "usage": usage}
+        pieces = [f"data: {json.dumps(event)}\n\n" for event in events] + ["data: [DONE]\n\n"]
+        counted = [bool(event["choices"]) for event in events] + [False]
+        self._stream("text/event-stream", pieces, counted)
+
+    # ── Gemini (REST) ──
+
+    def _gemini(self, request: dict, streamed: bool):
+        parts = ((request.get("contents") or [{}])[-1].get("parts") or [{}])
+        self._prompt = str(parts[-1].get("text", ""))
+        words = self._admit()
+        if words is None:
+            return
+        usage = {"promptTokenCount": len(self._prompt) // 4, "candidatesTokenCount": len(words)}
+        usage["totalTokenCount"] = usage["promptTokenCount"] + usage["candidatesTokenCount"]
+
+        def response(text: str, last: bool) -> dict:
+            body = {"candidates": [{"index": 0, "content": {"role": "model",
+                                                            "parts": [{"text": text}]}}]}
+            if last:
+                body["usageMetadata"] = usage
+            return body
+
+        if not streamed:
+            self._count_all(words)
+            self._json(200, response("".join(words), last=True))
+            return
+        # REST server streaming is one JSON array, delivered element by element
+        pieces = [("[" if i == 0 else ",") + json.dumps(response(word, i == len(words) - 1))
+                  for i, word in enumerate(words)] + ["]"]
+        self._stream("application/json", pieces, [True] * len(words) + [False])
+
+    def log_message(self, *args):
+        pass
+
+
+# ──────────────────────────────────────────────
+#  Server
+# ──────────────────────────────────────────────
+
+class MockProviderServer(ThreadingHTTPServer):
+    """
+    The mock on a background thread. Use as a context manager; counters
+    (requests, errors, rate_limited, tokens_sent) are read live.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, behavior: Optional[MockBehavior] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.behavior = behavior or MockBehavior()
+        self.rng = random.Random(self.behavior.seed)
+        self.lock = threading.Lock()
+        self.requests = self.errors = self.rate_limited = self.tokens_sent = 0
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def config_for(self, provider: str = "openai", **overrides) -> dict:
+        """An ai_engine config pointing `provider` at this server."""
+        base_url = f"{self.url}/v1" if provider == "openai" else self.url
+        return dict({"ai_provider": provider, "ai_api_key": "mock", "ai_model": "mock",
+                     "ai_base_url": base_url}, **overrides)
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = self.errors = self.rate_limited = self.tokens_sent = 0
+
+    def start(self) -> "MockProviderServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True, name="mock-provider")
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "MockProviderServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="StatusAI offline mock AI provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", choices=("fixed", "uniform", "lognormal"), default="fixed")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--token-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--reply", default=DEFAULT_REPLY)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    behavior = MockBehavior(args.latency, args.latency_ms, args.jitter, args.token_ms,
+                            args.error_rate, args.rate_limit_rate, args.reply, args.seed)
+    server = MockProviderServer(behavior, args.host, args.port)
+    print(f"  Mock sağlayıcı: {server.url}  (OpenAI: {server.url}/v1)  — Ctrl+C ile durdur")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
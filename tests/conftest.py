@@ -0,0 +1,6 @@
+"""Tests import the flat top-level modules (trackers, ai_engine) directly."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
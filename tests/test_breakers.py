@@ -0,0 +1,40 @@
+"""Circuit breakers are created once and hand out one half-open probe, across threads."""
+
+import threading
+
+import ai_engine
+
+
+def _race(target, threads=16):
+    barrier = threading.Barrier(threads)
+    results = []
+
+    def run():
+        barrier.wait()
+        results.append(target())
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def test_one_breaker_per_provider(monkeypatch):
+    monkeypatch.setattr(ai_engine, "_breakers", {})
+    config = {"ai_provider": "groq", "ai_api_key": "k", "ai_model": "m"}
+    breakers = _race(lambda: ai_engine._breaker(config))
+    assert len({id(b) for b in breakers}) == 1
+
+
+def test_half_open_admits_a_single_probe():
+    now = [0.0]
+    breaker = ai_engine.CircuitBreaker(cooldown=30.0, clock=lambda: now[0])
+    breaker.record_failure(rate_limited=True)
+    assert breaker.state == breaker.OPEN and not breaker.allow()
+
+    now[0] = 31.0
+    assert sum(_race(breaker.allow)) == 1
+    breaker.record_success(0.1)
+    assert breaker.state == breaker.CLOSED
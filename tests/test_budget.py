@@ -0,0 +1,37 @@
+"""DailyBudget counters survive a restart through the SQLite store."""
+
+import datetime
+
+import ai_engine
+
+
+def _budget(today):
+    return ai_engine.DailyBudget(max_calls=5, today=lambda: today)
+
+
+def test_counters_reload_after_restart(tmp_path):
+    today = datetime.date(2026, 3, 1)
+    store = ai_engine.PersistentStatusCache(tmp_path / "cache.db")
+    budget = _budget(today)
+    budget.attach(store)
+    for _ in range(3):
+        assert budget.spend_call()
+    budget.add_tokens(120)
+    store.close()
+
+    restarted = _budget(today)
+    restarted.attach(ai_engine.PersistentStatusCache(tmp_path / "cache.db"))
+    assert (restarted.calls, restarted.tokens) == (3, 120)
+    assert restarted.spend_call() and restarted.spend_call()
+    assert not restarted.spend_call()
+
+
+def test_saved_counters_from_another_day_are_ignored(tmp_path):
+    store = ai_engine.PersistentStatusCache(tmp_path / "cache.db")
+    budget = _budget(datetime.date(2026, 3, 1))
+    budget.attach(store)
+    budget.spend_call()
+
+    next_day = _budget(datetime.date(2026, 3, 2))
+    next_day.attach(store)
+    assert (next_day.calls, next_day.tokens) == (0, 0)
@@ -0,0 +1,59 @@
+"""Config reloads retire only changed provider clients, never one mid-call."""
+
+import pytest
+
+import ai_engine
+
+
+class FakeClient:
+    def __init__(self, config):
+        self.config = config
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setitem(ai_engine._CLIENT_FACTORIES, "openai", FakeClient)
+    monkeypatch.setitem(ai_engine._CLIENT_FACTORIES, "groq", FakeClient)
+    registry = ai_engine.ClientRegistry()
+    monkeypatch.setattr(ai_engine, "_clients", registry)
+    yield registry
+    registry.clear()
+
+
+def _client(registry, provider, config):
+    with registry.lease(provider, config) as client:
+        return client
+
+
+def test_reload_keeps_unchanged_clients(registry):
+    config = {"ai_provider": "openai", "ai_api_key": "k1", "ai_model": "m",
+              "hedge_provider": {"provider": "groq", "api_key": "g1", "model": "g"}}
+    primary = _client(registry, "openai", config)
+    hedge = _client(registry, "groq", ai_engine._provider_configs(config)[1])
+
+    ai_engine.reset_clients(dict(config, ai_api_key="k2"))
+
+    assert primary.closed
+    assert not hedge.closed
+    assert _client(registry, "groq", ai_engine._provider_configs(config)[1]) is hedge
+    assert len(registry) == 1
+
+
+def test_retired_client_closes_after_its_call(registry):
+    config = {"ai_provider": "openai", "ai_api_key": "k1", "ai_model": "m"}
+    with registry.lease("openai", config) as client:
+        ai_engine.reset_clients(dict(config, ai_model="other"))
+        assert not client.closed  # Still in use
+        assert len(registry) == 0
+    assert client.closed
+
+
+def test_reset_without_config_retires_everything(registry):
+    config = {"ai_provider": "openai", "ai_api_key": "k1", "ai_model": "m"}
+    client = _client(registry, "openai", config)
+    ai_engine.reset_clients()
+    assert client.closed and len(registry) == 0
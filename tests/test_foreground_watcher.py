@@ -0,0 +1,104 @@
+"""ForegroundWatcher driven through FakeForegroundBackend: wake-ups, coalescing, safety net."""
+
+import threading
+import time
+
+import pytest
+
+from trackers import FakeForegroundBackend, ForegroundWatcher
+
+
+@pytest.fixture
+def fake():
+    return FakeForegroundBackend()
+
+
+def _switch_later(backend: FakeForegroundBackend, delay: float, times: int = 1, gap: float = 0.0):
+    def run():
+        time.sleep(delay)
+        for _ in range(times):
+            backend.switch()
+            time.sleep(gap)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_start_and_stop_drive_the_backend(fake):
+    watcher = ForegroundWatcher(fake, min_gap=0)
+    assert watcher.event_driven
+    watcher.start()
+    assert fake.started
+    watcher.stop()
+    assert not fake.started
+
+
+def test_switch_wakes_the_loop_quickly(fake):
+    watcher = ForegroundWatcher(fake, min_gap=0)
+    watcher.start()
+    _switch_later(fake, 0.05)
+    start = time.monotonic()
+    assert watcher.wait(5.0) is True
+    latency = time.monotonic() - start - 0.05
+    # Switch → loop awake: event-driven, not the 15–60 s polling interval
+    assert latency < 0.1
+
+
+def test_safety_net_timer_without_switches(fake):
+    watcher = ForegroundWatcher(fake, min_gap=0)
+    watcher.start()
+    start = time.monotonic()
+    assert watcher.wait(0.2) is False
+    assert 0.15 <= time.monotonic() - start < 1.0
+
+
+def test_idle_wait_costs_no_cpu(fake):
+    watcher = ForegroundWatcher(fake, min_gap=0)
+    watcher.start()
+    cpu = time.process_time()
+    watcher.wait(0.5)
+    assert time.process_time() - cpu < 0.05
+
+
+def test_burst_is_coalesced_by_min_gap(fake):
+    watcher = ForegroundWatcher(fake, min_gap=0.3)
+    watcher.start()
+    assert watcher.wait(0) is False  # Marks the last wake-up: now
+    # A title flickering every 20 ms for 0.4 s
+    burst = _switch_later(fake, 0.0, times=20, gap=0.02)
+    wakes, start = 0, time.monotonic()
+    while time.monotonic() - start < 0.6:
+        if watcher.wait(0.1):
+            wakes += 1
+    burst.join()
+    assert 1 <= wakes <= 3  # One per min_gap window, not one per event
+
+
+def test_min_gap_delays_back_to_back_wakes(fake):
+    watcher = ForegroundWatcher(fake, min_gap=0.2)
+    watcher.start()
+    fake.switch()
+    assert watcher.wait(1.0) is True
+    fake.switch()
+    start = time.monotonic()
+    assert watcher.wait(1.0) is True
+    assert time.monotonic() - start >= 0.15
+
+
+def test_wake_interrupts_without_reporting_a_change(fake):
+    watcher = ForegroundWatcher(fake, min_gap=0)
+    watcher.start()
+    threading.Timer(0.05, watcher.wake).start()
+    start = time.monotonic()
+    assert watcher.wait(5.0) is False
+    assert time.monotonic() - start < 1.0
+
+
+def test_switches_after_stop_are_ignored(fake):
+    watcher = ForegroundWatcher(fake, min_gap=0)
+    watcher.start()
+    watcher.stop()
+    assert watcher.wait(0) is False  # Consumes the stop wake-up
+    fake.switch()
+    assert watcher.wait(0.05) is False
@@ -0,0 +1,69 @@
+"""Replay a checked-in trace and pin the FullContext sequence it produces."""
+
+import json
+from dataclasses import fields
+from pathlib import Path
+
+import pytest
+
+import trackers
+
+DATA = Path(__file__).parent / "data"
+TRACE = DATA / "trace.jsonl"
+EXPECTED = json.loads((DATA / "trace_expected.json").read_text(encoding="utf-8"))
+FIELDS = [f.name for f in fields(trackers.FullContext) if f.init]
+
+
+@pytest.fixture
+def profile():
+    return trackers.TrackerProfile.build(
+        {"Code.exe": "VS Code", "Discord.exe": "Discord", "Spotify.exe": "Spotify"})
+
+
+def _as_dict(ctx: trackers.FullContext) -> dict:
+    return {name: getattr(ctx, name) for name in FIELDS}
+
+
+def test_get_full_context_sequence(profile):
+    replay = trackers.ReplayBackend.load(TRACE)
+    got = [_as_dict(trackers.get_full_context(profile, backend=replay)) for _ in replay]
+    assert got == EXPECTED["get_full_context"]
+
+
+def test_collector_sequence_follows_recorded_clock(profile):
+    replay = trackers.ReplayBackend.load(TRACE)
+    collector = trackers.ContextCollector(clock=replay.clock, workers=0, backend=replay)
+    got = [_as_dict(collector.collect(profile)) for _ in replay]
+    assert got == EXPECTED["collector"]
+    # Spotify's 10s cadence keeps the cached track across the t=6 frame
+    assert got[3]["spotify_track"] == "Numb"
+    assert EXPECTED["get_full_context"][3]["spotify_track"] == ""
+
+
+def test_recorder_round_trips(tmp_path):
+    source = trackers.ReplayBackend.load(TRACE)
+    out = tmp_path / "recorded.jsonl"
+    recorder = trackers.TraceRecorder(out, backend=source, clock=source.clock)
+    for _ in source:
+        recorder.record_frame()
+
+    recorded = trackers.ReplayBackend.load(out)
+    assert len(recorded) == len(source)
+    for original, copy in zip(source, recorded):
+        assert copy["t"] == original["t"]
+        assert copy["foreground"] == original["foreground"]
+        assert copy["processes"] == original["processes"]
+        # The recorder keeps only visible, titled windows
+        assert copy["windows"] == [w for w in original["windows"] if w[1] and len(w[2]) > 3]
+
+
+def test_recorded_trace_replays_to_same_contexts(tmp_path, profile):
+    source = trackers.ReplayBackend.load(TRACE)
+    out = tmp_path / "recorded.jsonl"
+    recorder = trackers.TraceRecorder(out, backend=source, clock=source.clock)
+    for _ in source:
+        recorder.record_frame()
+
+    recorded = trackers.ReplayBackend.load(out)
+    got = [_as_dict(trackers.get_full_context(profile, backend=recorded)) for _ in recorded]
+    assert got == EXPECTED["get_full_context"]
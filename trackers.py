@@ -8,9 +8,20 @@ VS Code file/project extraction, and privacy filtering.
 
 import ctypes
 import ctypes.wintypes
+import functools
+import hashlib
+import itertools
+import json
 import re
-from dataclasses import dataclass, field
-from typing import Optional
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping, Optional
 
 import psutil
 
@@ -19,11 +30,13 @@ import psutil
 #  Data Models
 # ──────────────────────────────────────────────
 
-@dataclass
+@dataclass(slots=True)
 class FullContext:
     """
     Multi-source activity context.
     Captures everything the user is doing simultaneously.
+    Treated as immutable once assembled: the key, fingerprint and prompt are
+    computed on first use and cached.
     """
     # Active window
     active_app: str = ""
@@ -51,8 +64,51 @@ class FullContext:
     # Privacy-filtered messaging
     is_messaging: bool = False
 
+    # Sources that missed their deadline and contributed their last known value
+    stale_sources: list[str] = field(default_factory=list)
+
+    _key: tuple = field(default=(), init=False, repr=False, compare=False)
+    _fingerprint: str = field(default="", init=False, repr=False, compare=False)
+    _prompt: str = field(default="", init=False, repr=False, compare=False)
+
+    @property
+    def key(self) -> tuple:
+        """Everything the status depends on, as one cached tuple."""
+        if not self._key:
+            self._key = (
+                self.game_name, self.active_app, self.active_title, self.is_messaging,
+                self.vscode_file, self.vscode_project,
+                self.spotify_track, self.spotify_artist,
+                self.browser_platform, self.browser_page_title,
+            )
+        return self._key
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Stable digest of `key`. Drives change detection, status cache keys
+        and history dedup; identical across runs, so it can key persistent
+        caches too.
+        """
+        if not self._fingerprint:
+            raw = "\x1f".join(str(part) for part in self.key)
+            self._fingerprint = hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+        return self._fingerprint
+
+    @property
+    def is_idle(self) -> bool:
+        """True when build_prompt() would only say "Bilgisayar başında"."""
+        return not (self.game_name
+                    or (self.active_app and self.active_app != "Unknown")
+                    or self.vscode_file or self.spotify_track or self.browser_platform)
+
     def build_prompt(self) -> str:
         """Build a structured, detailed prompt string for the Storyteller AI."""
+        if not self._prompt:
+            self._prompt = self._render_prompt()
+        return self._prompt
+
+    def _render_prompt(self) -> str:
         lines: list[str] = []
 
         # Game takes priority
@@ -167,15 +223,8 @@ class FullContext:
         """Check if context has meaningfully changed."""
         if other is None:
             return True
-        return (
-            self.active_app != other.active_app
-            or self.active_title != other.active_title
-            or self.vscode_file != other.vscode_file
-            or self.spotify_track != other.spotify_track
-            or self.browser_platform != other.browser_platform
-            or self.game_name != other.game_name
-            or self.is_messaging != other.is_messaging
-        )
+        # Same inputs as the fingerprint, without hashing on every cycle
+        return self.key != other.key
 
 
 # ──────────────────────────────────────────────
@@ -270,18 +319,278 @@ NSFW_PATTERNS: list[str] = [
 ]
 
 
+# ──────────────────────────────────────────────
+#  Process Snapshot
+# ──────────────────────────────────────────────
+
+class ProcessSnapshot:
+    """
+    One psutil.process_iter pass, shared by every detector in a cycle.
+    Holds name→pids, lowercased-name→pids and pid→name indexes.
+    """
+
+    def __init__(self, processes: Iterable[tuple[str, int]] = ()):
+        self._by_name: dict[str, list[int]] = {}
+        self._by_lower: dict[str, list[int]] = {}
+        self._names: dict[int, str] = {}
+        for name, pid in processes:
+            if not name:
+                continue
+            self._by_name.setdefault(name, []).append(pid)
+            self._by_lower.setdefault(name.lower(), []).append(pid)
+            self._names[pid] = name
+
+    @classmethod
+    def capture(cls, source: Optional[Callable[[], Iterable[tuple[str, int]]]] = None) -> "ProcessSnapshot":
+        """Enumerate the running processes once, from psutil or an injected source."""
+        return cls((source or _iter_processes)())
+
+    def is_running(self, name: str) -> bool:
+        """Case-insensitive check for a process name."""
+        return name.lower() in self._by_lower
+
+    def pids(self, name: str) -> list[int]:
+        """PIDs of a process name (case-insensitive), in enumeration order."""
+        return self._by_lower.get(name.lower(), [])
+
+    def name_of(self, pid: int) -> str:
+        """Process name for a PID, or "" if it was not seen."""
+        return self._names.get(pid, "")
+
+    @property
+    def lower_names(self):
+        """Lowercased names of all running processes."""
+        return self._by_lower.keys()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+
+def _iter_processes():
+    """Yield (name, pid) for every visible process — the only process_iter call."""
+    try:
+        for proc in psutil.process_iter(["name", "pid"]):
+            try:
+                yield proc.info["name"], proc.info["pid"]
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                continue
+    except Exception:
+        pass
+
+
+# ──────────────────────────────────────────────
+#  Compiled Title Matcher
+# ──────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class TitleMatch:
+    """Result of one TitleMatcher pass over a browser window title."""
+    clean_title: str = ""      # Title with the browser suffix removed
+    suffix: str = ""           # Matched BROWSER_SUFFIXES entry, if any
+    is_nsfw: bool = False
+    platform: str = ""         # PLATFORM_PATTERNS name, "" if unknown
+
+
+_LITERAL_PIECE = r"(?:\\[^A-Za-z0-9]|[^\\.^$*+?{}\[\]()|])+"
+_LITERAL_ALTERNATION = re.compile(rf"{_LITERAL_PIECE}(?:\|{_LITERAL_PIECE})*")
+
+
+def _literal_alternatives(pattern: str) -> Optional[list[str]]:
+    r"""Split a `foo\.com|foo`-style pattern into literals, or None if it is a real regex."""
+    if not _LITERAL_ALTERNATION.fullmatch(pattern):
+        return None
+    return [re.sub(r"\\(.)", r"\1", piece) for piece in pattern.split("|")]
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over (literal, rank) pairs, folded into a DFA.
+    One pass over a text reports the lowest rank whose literal occurs in it,
+    so the cost depends on the text length, not on the number of keywords.
+    """
+
+    def __init__(self, keywords: Iterable[tuple[str, int]]):
+        goto: list[dict[str, int]] = [{}]
+        self._output: list[Optional[int]] = [None]
+        self._empty_rank: Optional[int] = None
+
+        for literal, rank in keywords:
+            if not literal:
+                # "" occurs in every text, as `"" in text` does
+                if self._empty_rank is None or rank < self._empty_rank:
+                    self._empty_rank = rank
+                continue
+            state = 0
+            for ch in literal:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    goto.append({})
+                    self._output.append(None)
+                    nxt = goto[state][ch] = len(goto) - 1
+                state = nxt
+            if self._output[state] is None or rank < self._output[state]:
+                self._output[state] = rank
+
+        # Breadth-first: fold failure links into full transition tables
+        self._delta: list[dict[str, int]] = [dict(goto[0])] + [{} for _ in goto[1:]]
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            back = fail[state]
+            inherited = self._output[back]
+            if inherited is not None and (self._output[state] is None or inherited < self._output[state]):
+                self._output[state] = inherited
+            self._delta[state] = {**self._delta[back], **goto[state]}
+            for ch, nxt in goto[state].items():
+                fail[nxt] = self._delta[back].get(ch, 0)
+                queue.append(nxt)
+
+    def best_rank(self, text: str) -> Optional[int]:
+        """Lowest rank of any keyword contained in `text`, or None."""
+        delta, output = self._delta, self._output
+        state, best = 0, self._empty_rank
+        if best == 0:
+            return best
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            rank = output[state]
+            if rank is not None and (best is None or rank < best):
+                best = rank
+                if rank == 0:
+                    break
+        return best
+
+    def search(self, text: str) -> bool:
+        """True if any keyword is contained in `text`."""
+        return self.best_rank(text) is not None
+
+
+class TitleMatcher:
+    """
+    BROWSER_SUFFIXES, NSFW_PATTERNS and PLATFORM_PATTERNS compiled once.
+
+    Every pattern in the tables is a plain alternation of literals, so they
+    are compiled into one Aho-Corasick automaton (as a DFA) that reports the
+    lowest rank seen in a single pass over the lowercased title. Ranks follow
+    table order with NSFW first, which keeps the first-match-wins precedence
+    of checking each pattern with its own re.search. Patterns that are not
+    literal alternations fall back to a precompiled regex for their rank.
+    """
+
+    def __init__(self, platform_patterns: list[tuple[str, str]],
+                 nsfw_patterns: list[str], suffixes: tuple[str, ...]):
+        self._suffixes = suffixes
+        self._nsfw_count = len(nsfw_patterns)
+        self._platforms = [name for _, name in platform_patterns]
+
+        # Rank = position in the precedence order; NSFW ranks come first
+        ranked = list(nsfw_patterns) + [p for p, _ in platform_patterns]
+        keywords: list[tuple[str, int]] = []
+        self._fallback: list[tuple[int, re.Pattern]] = []
+        for rank, pattern in enumerate(ranked):
+            literals = _literal_alternatives(pattern)
+            if literals is None:
+                self._fallback.append((rank, re.compile(pattern)))
+            else:
+                keywords.extend((literal, rank) for literal in literals)
+        self._automaton = KeywordAutomaton(keywords)
+
+    def _best_rank(self, text: str) -> Optional[int]:
+        best = self._automaton.best_rank(text)
+        for rank, regex in self._fallback:
+            if best is not None and rank > best:
+                break
+            if regex.search(text):
+                best = rank
+                break
+        return best
+
+    def match(self, title: str) -> TitleMatch:
+        # Browser suffix: earliest entry in BROWSER_SUFFIXES that occurs anywhere
+        suffix, clean_title = "", title
+        for candidate in self._suffixes:
+            pos = title.find(candidate)
+            if pos >= 0:
+                suffix, clean_title = candidate, title[:pos].strip()
+                break
+
+        best = self._best_rank(clean_title.lower())
+        if best is None:
+            return TitleMatch(clean_title, suffix)
+        if best < self._nsfw_count:
+            return TitleMatch(clean_title, suffix, is_nsfw=True)
+        return TitleMatch(clean_title, suffix, platform=self._platforms[best - self._nsfw_count])
+
+
+_TITLE_MATCHER = TitleMatcher(PLATFORM_PATTERNS, NSFW_PATTERNS, BROWSER_SUFFIXES)
+
+
+# ──────────────────────────────────────────────
+#  Tracker Profile
+# ──────────────────────────────────────────────
+
+_profile_versions = itertools.count(1)
+
+BROWSER_FRIENDLY_NAMES = frozenset({
+    "chrome", "firefox", "edge", "brave", "opera", "supermium", "vivaldi",
+})
+
+
+@dataclass(frozen=True)
+class TrackerProfile:
+    """
+    Immutable, precompiled view of the tracking config.
+    Built once per config (re)load so each cycle only does lookups.
+    """
+    tracked_apps: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+    tracked_lower: Mapping[str, str] = field(default_factory=lambda: MappingProxyType({}))
+    blacklist: Optional[KeywordAutomaton] = None
+    games: Mapping[str, str] = field(default_factory=lambda: MappingProxyType(KNOWN_GAMES))
+    browsers: frozenset[str] = frozenset(BROWSER_PROCESSES)
+    browser_names: frozenset[str] = BROWSER_FRIENDLY_NAMES
+    messaging: frozenset[str] = frozenset(MESSAGING_APPS)
+    version: int = 0                 # Bumped on every build; keys the parser caches
+
+    @classmethod
+    def from_config(cls, config: dict) -> "TrackerProfile":
+        return cls.build(config.get("tracked_apps", {}), config.get("blacklist", []))
+
+    @classmethod
+    def build(cls, tracked_apps: dict[str, str], blacklist: Optional[list[str]] = None) -> "TrackerProfile":
+        tracked_lower: dict[str, str] = {}
+        for key, value in tracked_apps.items():
+            tracked_lower.setdefault(key.lower(), value)
+        words = [str(word).lower() for word in (blacklist or [])]
+        return cls(
+            version=next(_profile_versions),
+            tracked_apps=MappingProxyType(dict(tracked_apps)),
+            tracked_lower=MappingProxyType(tracked_lower),
+            blacklist=KeywordAutomaton((word, 0) for word in words) if words else None,
+        )
+
+    def friendly_name(self, process_name: str) -> str:
+        """tracked_apps name for a process (exact, then case-insensitive), or ""."""
+        return (self.tracked_apps.get(process_name)
+                or self.tracked_lower.get(process_name.lower(), ""))
+
+    def is_blacklisted(self, title: str) -> bool:
+        """True if any blacklist word occurs in the title (case-insensitive)."""
+        return self.blacklist is not None and self.blacklist.search(title.lower())
+
+
 # ──────────────────────────────────────────────
 #  Win32 Helpers
 # ──────────────────────────────────────────────
 
-def _get_foreground_window_info() -> tuple[str, str]:
-    """Returns (window_title, process_name) of the foreground window."""
+def _foreground_window_win32() -> tuple[str, int]:
+    """Returns (window_title, pid) of the foreground window."""
     try:
         user32 = ctypes.windll.user32  # type: ignore[attr-defined]
 
         hwnd = user32.GetForegroundWindow()
         if not hwnd:
-            return "", ""
+            return "", 0
 
         # Window title
         length = user32.GetWindowTextLengthW(hwnd)
@@ -289,63 +598,412 @@ def _get_foreground_window_info() -> tuple[str, str]:
         user32.GetWindowTextW(hwnd, buf, length + 1)
         window_title = buf.value
 
-        # Process name
+        # Owning process
         pid = ctypes.wintypes.DWORD()
         user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        return window_title, pid.value
 
-        process_name = ""
-        try:
-            proc = psutil.Process(pid.value)
-            process_name = proc.name()
-        except (psutil.NoSuchProcess, psutil.AccessDenied):
-            pass
+    except Exception:
+        return "", 0
 
-        return window_title, process_name
 
-    except Exception:
-        return "", ""
+def _process_name_psutil(pid: int) -> str:
+    try:
+        return psutil.Process(pid).name()
+    except (psutil.NoSuchProcess, psutil.AccessDenied, ValueError):
+        return ""
+
 
+def _get_foreground_window_info(backend: "SystemBackend",
+                                snapshot: Optional[ProcessSnapshot] = None) -> tuple[str, str]:
+    """Returns (window_title, process_name) of the foreground window."""
+    window_title, pid = backend.foreground()
+    if not pid:
+        return window_title, ""
+    process_name = snapshot.name_of(pid) if snapshot else ""
+    if not process_name:
+        process_name = backend.process_name(pid)
+    return window_title, process_name
 
-def _find_process_window_title(target_process: str) -> str:
+
+def _find_process_window_title(target_process: str, snapshot: ProcessSnapshot,
+                               windows: "WindowIndex") -> str:
     """Find window title for a specific process (e.g. Spotify)."""
-    try:
-        for proc in psutil.process_iter(["name", "pid"]):
-            try:
-                if proc.info["name"] and proc.info["name"].lower() == target_process.lower():
-                    return _get_window_title_by_pid(proc.info["pid"])
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-    except Exception:
-        pass
+    for pid in snapshot.pids(target_process):
+        title = windows.title_of(pid)
+        if title:
+            return title
     return ""
 
 
-def _get_window_title_by_pid(pid: int) -> str:
-    """Get window title for a specific process ID."""
+# ──────────────────────────────────────────────
+#  Window Index
+# ──────────────────────────────────────────────
+
+# A window source yields (pid, is_visible, title) for every top-level window,
+# in EnumWindows (z-) order. Injectable so the index works with synthetic lists.
+WindowSource = Callable[[], Iterable[tuple[int, bool, str]]]
+
+
+def _enum_windows_win32() -> list[tuple[int, bool, str]]:
+    """Enumerate all top-level windows in a single EnumWindows pass."""
+    windows: list[tuple[int, bool, str]] = []
     try:
         user32 = ctypes.windll.user32  # type: ignore[attr-defined]
 
-        result = {"title": ""}
-
         @ctypes.WINFUNCTYPE(ctypes.wintypes.BOOL, ctypes.wintypes.HWND, ctypes.wintypes.LPARAM)
         def enum_callback(hwnd, lparam):
             window_pid = ctypes.wintypes.DWORD()
             user32.GetWindowThreadProcessId(hwnd, ctypes.byref(window_pid))
-            if window_pid.value == pid and user32.IsWindowVisible(hwnd):
-                length = user32.GetWindowTextLengthW(hwnd)
-                if length > 0:
-                    buf = ctypes.create_unicode_buffer(length + 1)
-                    user32.GetWindowTextW(hwnd, buf, length + 1)
-                    if buf.value and len(buf.value) > 3:
-                        result["title"] = buf.value
-                        return False  # Stop enumeration
+            if not user32.IsWindowVisible(hwnd):
+                windows.append((window_pid.value, False, ""))
+                return True
+            title = ""
+            length = user32.GetWindowTextLengthW(hwnd)
+            if length > 0:
+                buf = ctypes.create_unicode_buffer(length + 1)
+                user32.GetWindowTextW(hwnd, buf, length + 1)
+                title = buf.value
+            windows.append((window_pid.value, True, title))
             return True
 
         user32.EnumWindows(enum_callback, 0)
-        return result["title"]
-
     except Exception:
-        return ""
+        pass
+    return windows
+
+
+class WindowIndex:
+    """
+    pid → [visible window titles] map, built from one window enumeration per cycle.
+    Only visible windows with a title longer than 3 characters are kept.
+    """
+
+    def __init__(self, windows: Iterable[tuple[int, bool, str]] = ()):
+        self._titles: dict[int, list[str]] = {}
+        for pid, visible, title in windows:
+            if visible and title and len(title) > 3:
+                self._titles.setdefault(pid, []).append(title)
+
+    @classmethod
+    def capture(cls, source: Optional[WindowSource] = None) -> "WindowIndex":
+        """Enumerate windows once, from Win32 or an injected source."""
+        return cls((source or _enum_windows_win32)())
+
+    def titles(self, pid: int) -> list[str]:
+        """All visible window titles of a PID, in enumeration order."""
+        return self._titles.get(pid, [])
+
+    def title_of(self, pid: int) -> str:
+        """First visible window title of a PID, or ""."""
+        titles = self._titles.get(pid)
+        return titles[0] if titles else ""
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+
+# ──────────────────────────────────────────────
+#  Foreground Change Events
+# ──────────────────────────────────────────────
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+WM_QUIT = 0x0012
+
+
+class Win32ForegroundHook:
+    """
+    SetWinEventHook backend: reports foreground switches and title changes
+    of the foreground window. Hooks live on a dedicated message-loop thread.
+    """
+
+    def __init__(self):
+        self._thread: threading.Thread | None = None
+        self._thread_id = 0
+        self._callback: Callable[[], None] | None = None
+        self._proc = None  # Keep the ctypes callback alive
+
+    def start(self, callback: Callable[[], None]):
+        self._callback = callback
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait(timeout=2)
+
+    def stop(self):
+        if self._thread_id:
+            try:
+                ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)  # type: ignore[attr-defined]
+            except Exception:
+                pass
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._thread = None
+        self._thread_id = 0
+
+    def _run(self, ready: threading.Event):
+        try:
+            user32 = ctypes.windll.user32  # type: ignore[attr-defined]
+            self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()  # type: ignore[attr-defined]
+
+            WinEventProc = ctypes.WINFUNCTYPE(
+                None, ctypes.wintypes.HANDLE, ctypes.wintypes.DWORD, ctypes.wintypes.HWND,
+                ctypes.wintypes.LONG, ctypes.wintypes.LONG, ctypes.wintypes.DWORD, ctypes.wintypes.DWORD,
+            )
+
+            def on_event(hook, event, hwnd, id_object, id_child, thread, event_time):
+                if event == EVENT_OBJECT_NAMECHANGE:
+                    # Name changes fire for every UI object; keep only the foreground title
+                    if id_object != OBJID_WINDOW or hwnd != user32.GetForegroundWindow():
+                        return
+                if self._callback:
+                    self._callback()
+
+            self._proc = WinEventProc(on_event)
+            flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+            hooks = [
+                user32.SetWinEventHook(EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND, 0, self._proc, 0, 0, flags),
+                user32.SetWinEventHook(EVENT_OBJECT_NAMECHANGE, EVENT_OBJECT_NAMECHANGE, 0, self._proc, 0, 0, flags),
+            ]
+        except Exception:
+            ready.set()
+            return
+
+        ready.set()
+        msg = ctypes.wintypes.MSG()
+        while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+            user32.TranslateMessage(ctypes.byref(msg))
+            user32.DispatchMessageW(ctypes.byref(msg))
+
+        for hook in hooks:
+            if hook:
+                user32.UnhookWinEvent(hook)
+
+
+class FakeForegroundBackend:
+    """Scriptable backend: call `switch()` to simulate a foreground change."""
+
+    def __init__(self):
+        self._callback: Callable[[], None] | None = None
+        self.started = False
+
+    def start(self, callback: Callable[[], None]):
+        self._callback = callback
+        self.started = True
+
+    def stop(self):
+        self.started = False
+
+    def switch(self):
+        if self._callback and self.started:
+            self._callback()
+
+
+class ForegroundWatcher:
+    """
+    Wakes the bot loop when the foreground window or its title changes.
+    The loop's update interval remains only as a safety-net timer.
+    Bursts of changes inside `min_gap` seconds are coalesced into one wake-up.
+    """
+
+    def __init__(self, backend=None, min_gap: float = 1.0):
+        if backend is None and sys.platform == "win32":
+            backend = Win32ForegroundHook()
+        self._backend = backend
+        self._event = threading.Event()
+        self._min_gap = min_gap
+        self._last_wake: float = 0
+        self._interrupted = False
+
+    @property
+    def event_driven(self) -> bool:
+        return self._backend is not None
+
+    def start(self):
+        if self._backend:
+            self._backend.start(self._event.set)
+
+    def stop(self):
+        if self._backend:
+            self._backend.stop()
+        self.wake()
+
+    def wake(self):
+        """Interrupt a pending `wait()` (e.g. on shutdown)."""
+        self._interrupted = True
+        self._event.set()
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Block until a foreground change or until `timeout` elapses.
+        Returns True if woken by a change, False on the safety-net timer.
+        """
+        changed = self._event.wait(timeout)
+        if self._interrupted:
+            self._interrupted = False
+            self._event.clear()
+            return False
+        if changed:
+            # Let rapid title updates settle before the next cycle
+            remaining = self._min_gap - (time.monotonic() - self._last_wake)
+            if remaining > 0:
+                time.sleep(remaining)
+        self._event.clear()
+        self._last_wake = time.monotonic()
+        return changed
+
+
+# ──────────────────────────────────────────────
+#  System Backends
+# ──────────────────────────────────────────────
+
+class SystemBackend(ABC):
+    """
+    Where trackers read the system from: the foreground window, all
+    top-level windows (for the pid → title index) and the process list.
+    """
+
+    @abstractmethod
+    def foreground(self) -> tuple[str, int]:
+        """(window_title, pid) of the foreground window; pid 0 if none."""
+
+    @abstractmethod
+    def windows(self) -> Iterable[tuple[int, bool, str]]:
+        """(pid, is_visible, title) for every top-level window."""
+
+    @abstractmethod
+    def processes(self) -> Iterable[tuple[str, int]]:
+        """(name, pid) for every running process."""
+
+    @abstractmethod
+    def process_name(self, pid: int) -> str:
+        """Name of a single process, used when no snapshot was taken."""
+
+
+class Win32Backend(SystemBackend):
+    """Live system: Win32 API via ctypes plus psutil."""
+
+    def foreground(self) -> tuple[str, int]:
+        return _foreground_window_win32()
+
+    def windows(self) -> Iterable[tuple[int, bool, str]]:
+        return _enum_windows_win32()
+
+    def processes(self) -> Iterable[tuple[str, int]]:
+        return _iter_processes()
+
+    def process_name(self, pid: int) -> str:
+        return _process_name_psutil(pid)
+
+
+class ReplayBackend(SystemBackend):
+    """
+    Replays a recorded JSONL trace, one system state per line:
+        {"t": 12.0, "foreground": [title, pid],
+         "windows": [[pid, visible, title], ...], "processes": [[name, pid], ...]}
+    Step through it with `advance()` (or iterate) and pass `clock` to a
+    ContextCollector so cadences follow the recorded time, not wall time.
+    """
+
+    def __init__(self, frames: list[dict]):
+        self._frames = frames
+        self._index = 0
+        self._names: dict[int, str] = {}
+        if frames:
+            self._load(0)
+
+    @classmethod
+    def load(cls, path) -> "ReplayBackend":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def __iter__(self):
+        for index in range(len(self._frames)):
+            self._load(index)
+            yield self._frames[index]
+
+    def _load(self, index: int):
+        self._index = index
+        self._names = {pid: name for name, pid in self._frames[index].get("processes", [])}
+
+    def advance(self) -> bool:
+        """Move to the next frame; False once the trace is exhausted."""
+        if self._index + 1 >= len(self._frames):
+            return False
+        self._load(self._index + 1)
+        return True
+
+    def clock(self) -> float:
+        """Recorded timestamp of the current frame."""
+        return float(self._frames[self._index].get("t", self._index)) if self._frames else 0.0
+
+    @property
+    def _frame(self) -> dict:
+        return self._frames[self._index] if self._frames else {}
+
+    def foreground(self) -> tuple[str, int]:
+        title, pid = self._frame.get("foreground", ["", 0])
+        return title, pid
+
+    def windows(self) -> Iterable[tuple[int, bool, str]]:
+        return [tuple(w) for w in self._frame.get("windows", [])]
+
+    def processes(self) -> Iterable[tuple[str, int]]:
+        return [tuple(p) for p in self._frame.get("processes", [])]
+
+    def process_name(self, pid: int) -> str:
+        return self._names.get(pid, "")
+
+
+class TraceRecorder:
+    """
+    Captures full system states from a backend into a JSONL trace for
+    ReplayBackend. Traces contain real window titles — treat them as private.
+    """
+
+    def __init__(self, path, backend: Optional[SystemBackend] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self._path = path
+        self._backend = backend or Win32Backend()
+        self._clock = clock
+        self._start = clock()
+
+    def record_frame(self) -> dict:
+        """Capture one frame and append it to the trace."""
+        frame = {
+            "t": round(self._clock() - self._start, 3),
+            "foreground": list(self._backend.foreground()),
+            # Only what WindowIndex keeps; hidden helper windows bloat traces
+            "windows": [[pid, True, title] for pid, visible, title in self._backend.windows()
+                        if visible and title and len(title) > 3],
+            "processes": [[name, pid] for name, pid in self._backend.processes() if name],
+        }
+        with open(self._path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(frame, ensure_ascii=False) + "\n")
+        return frame
+
+    def run(self, interval: float = 2.0, duration: Optional[float] = None,
+            stop: Optional[threading.Event] = None) -> int:
+        """Record every `interval` seconds until `duration` or `stop`; returns frame count."""
+        stop = stop or threading.Event()
+        frames = 0
+        while not stop.is_set():
+            self.record_frame()
+            frames += 1
+            if duration is not None and self._clock() - self._start >= duration:
+                break
+            stop.wait(interval)
+        return frames
+
+
+_DEFAULT_BACKEND = Win32Backend()
 
 
 # ──────────────────────────────────────────────
@@ -377,37 +1035,30 @@ def _extract_spotify(title: str) -> tuple[str, str]:
 
 def _extract_browser_platform(title: str) -> tuple[str, str]:
     """Detect platform and clean title from browser window."""
-    # Remove browser suffix
-    clean_title = title
-    for suffix in BROWSER_SUFFIXES:
-        if suffix in clean_title:
-            clean_title = clean_title.split(suffix)[0].strip()
-            break
-
-    title_lower = clean_title.lower()
-
-    # 1. Check NSFW Patterns FIRST
-    for pattern in NSFW_PATTERNS:
-        if re.search(pattern, title_lower):
-            return "Gizli", ""  # Suppress completely
-
-    # 2. Detect platform
-    for pattern, platform_name in PLATFORM_PATTERNS:
-        if re.search(pattern, title_lower):
-            # Also strip platform name suffix from page title
-            page_title = clean_title
-            platform_lower = platform_name.lower()
-            # Remove trailing " - YouTube", " - GitHub", etc.
-            for sep in (" - ", " — ", " | "):
-                parts = page_title.rsplit(sep, 1)
-                if len(parts) == 2 and parts[1].strip().lower() in (
-                    platform_lower, platform_lower.replace(" ", ""),
-                    "youtube", "github", "reddit", "stackoverflow",
-                    "twitch", "linkedin", "figma", "notion", "trello",
-                ):
-                    page_title = parts[0].strip()
-                    break
-            return platform_name, page_title[:80]
+    match = _TITLE_MATCHER.match(title)
+    clean_title = match.clean_title
+
+    # 1. NSFW Patterns take precedence over everything
+    if match.is_nsfw:
+        return "Gizli", ""  # Suppress completely
+
+    # 2. Detected platform
+    if match.platform:
+        platform_name = match.platform
+        # Also strip platform name suffix from page title
+        page_title = clean_title
+        platform_lower = platform_name.lower()
+        # Remove trailing " - YouTube", " - GitHub", etc.
+        for sep in (" - ", " — ", " | "):
+            parts = page_title.rsplit(sep, 1)
+            if len(parts) == 2 and parts[1].strip().lower() in (
+                platform_lower, platform_lower.replace(" ", ""),
+                "youtube", "github", "reddit", "stackoverflow",
+                "twitch", "linkedin", "figma", "notion", "trello",
+            ):
+                page_title = parts[0].strip()
+                break
+        return platform_name, page_title[:80]
 
     # Unknown site
     if clean_title and len(clean_title) > 3:
@@ -415,143 +1066,437 @@ def _extract_browser_platform(title: str) -> tuple[str, str]:
     return "", ""
 
 
-def _is_process_running(name: str) -> bool:
-    """Check if a process is currently running."""
-    name_lower = name.lower()
-    try:
-        for proc in psutil.process_iter(["name"]):
-            try:
-                if proc.info["name"] and proc.info["name"].lower() == name_lower:
-                    return True
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                continue
-    except Exception:
-        pass
-    return False
+# ──────────────────────────────────────────────
+#  Parser Cache
+# ──────────────────────────────────────────────
+
+# The same titles come back cycle after cycle; parse each one once.
+# Keyed by the raw title alone: the parsers never read the profile.
+PARSER_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=PARSER_CACHE_SIZE)
+def _parse_vscode(title: str) -> tuple[str, str]:
+    return _extract_vscode(title)
+
+
+@functools.lru_cache(maxsize=PARSER_CACHE_SIZE)
+def _parse_spotify(title: str) -> tuple[str, str]:
+    return _extract_spotify(title)
+
+
+@functools.lru_cache(maxsize=PARSER_CACHE_SIZE)
+def _parse_browser(title: str) -> tuple[str, str]:
+    return _extract_browser_platform(title)
+
+
+_PARSER_CACHES = {
+    "vscode": _parse_vscode,
+    "spotify": _parse_spotify,
+    "browser": _parse_browser,
+}
+
+
+def get_parser_cache_stats() -> dict[str, dict[str, int]]:
+    """Hit/miss counters and fill level of each title-parser cache."""
+    stats = {}
+    for name, parser in _PARSER_CACHES.items():
+        info = parser.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+        }
+    return stats
 
 
 # ──────────────────────────────────────────────
-#  Public API
+#  Context Sources
 # ──────────────────────────────────────────────
 
-def get_full_context(tracked_apps: dict[str, str], blacklist: list[str] = None) -> FullContext:
-    """
-    Gather multi-source context from the system.
-    Returns a FullContext with all simultaneous activities.
-    """
-    ctx = FullContext()
-    
-    if blacklist is None:
-        blacklist = []
+class CycleInputs:
+    """Per-cycle system inputs, captured lazily and at most once."""
+
+    def __init__(self, backend: SystemBackend,
+                 snapshot: Optional[ProcessSnapshot] = None,
+                 windows: Optional[WindowIndex] = None):
+        self.backend = backend
+        self._snapshot = snapshot
+        self._windows = windows
+        self._snapshot_lock = threading.Lock()
+        self._windows_lock = threading.Lock()
+
+    @property
+    def snapshot(self) -> ProcessSnapshot:
+        return self.capture_snapshot()
+
+    def capture_snapshot(self) -> ProcessSnapshot:
+        # Sources run concurrently: the first one captures, the rest share it
+        if self._snapshot is None:
+            with self._snapshot_lock:
+                if self._snapshot is None:
+                    self._snapshot = ProcessSnapshot.capture(self.backend.processes)
+        return self._snapshot
+
+    @property
+    def windows(self) -> WindowIndex:
+        if self._windows is None:
+            with self._windows_lock:
+                if self._windows is None:
+                    self._windows = WindowIndex.capture(self.backend.windows)
+        return self._windows
 
-    # ── 1. Active foreground window ──
-    window_title, process_name = _get_foreground_window_info()
+    @property
+    def captured_snapshot(self) -> Optional[ProcessSnapshot]:
+        """The snapshot if something already paid for it, else None."""
+        return self._snapshot
+
+
+@dataclass
+class ForegroundState:
+    """Everything derived from the foreground window alone."""
+    ctx: FullContext
+    is_game: bool = False
+    is_code: bool = False
+    is_browser: bool = False
+
+
+def _collect_foreground(profile: "TrackerProfile", inputs: CycleInputs) -> ForegroundState:
+    ctx = FullContext()
+    window_title, process_name = _get_foreground_window_info(inputs.backend, inputs.captured_snapshot)
     proc_lower = process_name.lower() if process_name else ""
+    friendly = ""
 
     # Check for games
-    if proc_lower in BROWSER_PROCESSES:
-        platform_name, page_title = _extract_browser_platform(window_title) # Changed to _extract_browser_platform
+    if proc_lower in profile.browsers:
+        platform_name, page_title = _parse_browser(window_title)
         
         # Check Backlist Words
-        page_title_lower = page_title.lower() if page_title else ""
-        for word in blacklist:
-            if word.lower() in page_title_lower:
-                platform_name = "Gizli"
-                page_title = ""
-                break
+        if profile.is_blacklisted(page_title or ""):
+            platform_name = "Gizli"
+            page_title = ""
                 
         ctx.browser_platform = platform_name
-        ctx.browser_page_title = page_title # Changed to browser_page_title
+        ctx.browser_page_title = page_title
         ctx.active_app = platform_name or "Tarayıcı"
-        ctx.active_title = page_title # Corrected typo
-    else: # Added else block for non-browser processes
-        if process_name in KNOWN_GAMES: # Original game check moved here
-            ctx.game_name = KNOWN_GAMES[process_name]
+        ctx.active_title = page_title
+    else:
+        if process_name in profile.games:
+            ctx.game_name = profile.games[process_name]
             ctx.active_app = ctx.game_name
             ctx.process_name = process_name
-            ctx.running_apps = _get_running_apps(tracked_apps)
-            return ctx
+            return ForegroundState(ctx, is_game=True)
 
         # Friendly name
-        friendly = tracked_apps.get(process_name, "")
-        if not friendly:
-            for key, value in tracked_apps.items():
-                if key.lower() == proc_lower:
-                    friendly = value
-                    break
+        friendly = profile.friendly_name(process_name)
         if not friendly:
             friendly = process_name.replace(".exe", "") if process_name else "Unknown"
 
-        is_blacklisted = False
-        title_lower = window_title.lower() if window_title else ""
-        for word in blacklist:
-            if word.lower() in title_lower:
-                is_blacklisted = True
-                break
-                
-        if is_blacklisted:
+        if profile.is_blacklisted(window_title or ""):
             ctx.active_title = ""
             ctx.active_app = "Gizli"
         else:
-            ctx.active_app = friendly # Changed mapped_name to friendly
+            ctx.active_app = friendly
             ctx.active_title = window_title
             
         ctx.process_name = process_name
 
-    # ── 2. Privacy check: messaging apps ──
-    if proc_lower in MESSAGING_APPS:
+    # Privacy check: messaging apps
+    if proc_lower in profile.messaging:
         ctx.is_messaging = True
         ctx.active_title = ""  # Scrub title for privacy
 
-    # ── 3. VS Code detection ──
-    if proc_lower == "code.exe":
-        ctx.vscode_file, ctx.vscode_project = _extract_vscode(window_title)
-    elif _is_process_running("Code.exe"):
-        # VS Code is running but not in foreground
-        vscode_title = _find_process_window_title("Code.exe")
-        if vscode_title:
-            ctx.vscode_file, ctx.vscode_project = _extract_vscode(vscode_title)
-
-    # ── 4. Spotify detection (background) ──
-    spotify_title = _find_process_window_title("Spotify.exe")
-    if spotify_title:
-        ctx.spotify_track, ctx.spotify_artist = _extract_spotify(spotify_title)
+    # VS Code in the foreground
+    is_code = proc_lower == "code.exe"
+    if is_code:
+        ctx.vscode_file, ctx.vscode_project = _parse_vscode(window_title)
 
-    # ── 5. Browser platform detection ──
-    # Check if active app is a browser (by process name OR tracked_apps name)
-    is_browser = (proc_lower in BROWSER_PROCESSES
-                  or friendly.lower() in ("chrome", "firefox", "edge", "brave", "opera", "supermium", "vivaldi"))
+    # Active app is a browser (by process name OR tracked_apps name)
+    is_browser = (proc_lower in profile.browsers
+                  or friendly.lower() in profile.browser_names)
     if is_browser:
-        ctx.browser_platform, ctx.browser_page_title = _extract_browser_platform(window_title)
-    elif not ctx.is_messaging:
-        # Check if a browser is running in background
-        for browser in BROWSER_PROCESSES:
-            if _is_process_running(browser):
-                browser_title = _find_process_window_title(browser)
-                if browser_title:
-                    ctx.browser_platform, ctx.browser_page_title = _extract_browser_platform(browser_title)
-                    break
+        ctx.browser_platform, ctx.browser_page_title = _parse_browser(window_title)
 
-    # ── 6. Running apps ──
-    ctx.running_apps = _get_running_apps(tracked_apps)
+    return ForegroundState(ctx, is_code=is_code, is_browser=is_browser)
+
+
+def _collect_vscode(profile: "TrackerProfile", inputs: CycleInputs) -> tuple[str, str]:
+    """VS Code running in the background."""
+    if not inputs.snapshot.is_running("Code.exe"):
+        return "", ""
+    vscode_title = _find_process_window_title("Code.exe", inputs.snapshot, inputs.windows)
+    if vscode_title:
+        return _parse_vscode(vscode_title)
+    return "", ""
+
+
+def _collect_spotify(profile: "TrackerProfile", inputs: CycleInputs) -> tuple[str, str]:
+    spotify_title = _find_process_window_title("Spotify.exe", inputs.snapshot, inputs.windows)
+    if spotify_title:
+        return _parse_spotify(spotify_title)
+    return "", ""
+
+
+def _collect_browser(profile: "TrackerProfile", inputs: CycleInputs) -> tuple[str, str]:
+    """First browser running in the background with a window title."""
+    for browser in profile.browsers:
+        if inputs.snapshot.is_running(browser):
+            browser_title = _find_process_window_title(browser, inputs.snapshot, inputs.windows)
+            if browser_title:
+                return _parse_browser(browser_title)
+    return "", ""
+
+
+def _collect_running_apps(profile: "TrackerProfile", inputs: CycleInputs) -> list[str]:
+    return _get_running_apps(profile, inputs.snapshot)
+
+
+def _assemble_context(values: dict[str, Any]) -> FullContext:
+    """Merge per-source values into one FullContext (foreground wins)."""
+    fg: ForegroundState = values.get("foreground") or ForegroundState(FullContext())
+    ctx = replace(fg.ctx)
+    ctx.running_apps = list(values.get("running_apps", []))
+    if fg.is_game:
+        return ctx
+
+    if not fg.is_code:
+        ctx.vscode_file, ctx.vscode_project = values.get("vscode", ("", ""))
+
+    ctx.spotify_track, ctx.spotify_artist = values.get("spotify", ("", ""))
+
+    if not fg.is_browser and not ctx.is_messaging:
+        ctx.browser_platform, ctx.browser_page_title = values.get("browser", ("", ""))
 
     return ctx
 
 
-def _get_running_apps(tracked_apps: dict[str, str]) -> list[str]:
-    """Returns friendly names of running tracked applications."""
-    running: set[str] = set()
-    tracked_lower = {k.lower(): v for k, v in tracked_apps.items()}
+# ──────────────────────────────────────────────
+#  Tiered Refresh Scheduler
+# ──────────────────────────────────────────────
 
-    try:
-        for proc in psutil.process_iter(["name"]):
+@dataclass(frozen=True)
+class ContextSource:
+    """
+    One input of FullContext with its refresh cadence and cost.
+    `needs` names the per-cycle captures it pays for ("snapshot", "windows").
+    """
+    name: str
+    collect: Callable[["TrackerProfile", CycleInputs], Any]
+    interval: float = 0.0             # Seconds between refreshes; 0 = every tick
+    needs: frozenset[str] = frozenset()
+    deadline: float = 1.0             # Seconds to wait before using the last value
+    when_gaming: bool = False         # Still refreshed while a game is in focus
+    on_process_change: bool = False   # Also refreshed when the process set changes
+
+
+DEFAULT_SOURCES: tuple[ContextSource, ...] = (
+    ContextSource("foreground", _collect_foreground, 0.0, deadline=0.5, when_gaming=True),
+    ContextSource("vscode", _collect_vscode, 15.0, frozenset({"snapshot", "windows"})),
+    ContextSource("spotify", _collect_spotify, 10.0, frozenset({"snapshot", "windows"})),
+    ContextSource("browser", _collect_browser, 10.0, frozenset({"snapshot", "windows"})),
+    ContextSource("running_apps", _collect_running_apps, 60.0, frozenset({"snapshot"}),
+                  deadline=1.5, when_gaming=True, on_process_change=True),
+)
+
+
+@dataclass
+class SourceTiming:
+    """Wall-time record of one context source."""
+    runs: int = 0
+    last_ms: float = 0.0
+    avg_ms: float = 0.0
+    max_ms: float = 0.0
+    timeouts: int = 0
+    errors: int = 0
+
+    def record(self, elapsed_ms: float):
+        self.runs += 1
+        self.last_ms = elapsed_ms
+        self.avg_ms += (elapsed_ms - self.avg_ms) / self.runs
+        self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def to_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "last_ms": round(self.last_ms, 2),
+            "avg_ms": round(self.avg_ms, 2),
+            "max_ms": round(self.max_ms, 2),
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+        }
+
+
+def _timed_collect(source: ContextSource, profile: "TrackerProfile",
+                   inputs: CycleInputs) -> tuple[Any, float]:
+    start = time.perf_counter()
+    value = source.collect(profile, inputs)
+    return value, (time.perf_counter() - start) * 1000
+
+
+class ContextCollector:
+    """
+    Assembles FullContext from cached per-source values, refreshing each
+    source only when its cadence is due. Everything is refreshed when the
+    foreground process or the profile changes, so switches are never stale.
+
+    With `workers` > 0, due sources run concurrently on a small thread pool
+    and each gets `source.deadline` seconds. A source that misses it keeps
+    running in the background, contributes its last known value and is
+    listed in FullContext.stale_sources; its result is picked up once ready.
+    With `workers=0` sources run inline, without deadlines.
+    """
+
+    def __init__(self, sources: Iterable[ContextSource] = DEFAULT_SOURCES,
+                 clock: Callable[[], float] = time.monotonic, workers: int = 4,
+                 backend: Optional[SystemBackend] = None):
+        self._backend = backend or _DEFAULT_BACKEND
+        self._sources = {source.name: source for source in sources}
+        self._clock = clock
+        self._values: dict[str, Any] = {}
+        self._refreshed_at: dict[str, float] = {}
+        self._process_names: frozenset[str] = frozenset()
+        self._profile_version = -1
+        self._foreground_process: Optional[str] = None
+        self._timings = {name: SourceTiming() for name in self._sources}
+        self._inflight: dict[str, Future] = {}
+        self._pool = (ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ctx-source")
+                      if workers > 0 else None)
+
+    def close(self):
+        """Stop the worker pool without waiting for hung sources."""
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def timings(self) -> dict[str, dict]:
+        """Per-source timing, for the dashboard and logs."""
+        return {name: timing.to_dict() for name, timing in self._timings.items()}
+
+    def _due(self, source: ContextSource, now: float) -> bool:
+        last = self._refreshed_at.get(source.name)
+        return last is None or now - last >= source.interval
+
+    def _store(self, source: ContextSource, value: Any, elapsed_ms: float,
+               inputs: Optional[CycleInputs], now: float):
+        self._values[source.name] = value
+        self._refreshed_at[source.name] = now
+        self._timings[source.name].record(elapsed_ms)
+        if source.on_process_change and inputs is not None and inputs.captured_snapshot is not None:
+            self._process_names = frozenset(inputs.captured_snapshot.lower_names)
+
+    def _harvest(self, now: float):
+        """Adopt results of sources that finished after missing a deadline."""
+        for name, future in list(self._inflight.items()):
+            if not future.done():
+                continue
+            del self._inflight[name]
             try:
-                name = proc.info["name"]  # type: ignore[index]
-                if name and name.lower() in tracked_lower:
-                    running.add(tracked_lower[name.lower()])
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                value, elapsed_ms = future.result()
+            except Exception:
+                self._timings[name].errors += 1
                 continue
-    except Exception:
-        pass
+            self._store(self._sources[name], value, elapsed_ms, None, now)
+
+    def _run(self, sources: list[ContextSource], profile: "TrackerProfile",
+             inputs: CycleInputs, now: float) -> set[str]:
+        """Refresh `sources`; returns the names that are stale after their deadline."""
+        stale: set[str] = set()
+        if self._pool is None:
+            for source in sources:
+                try:
+                    value, elapsed_ms = _timed_collect(source, profile, inputs)
+                except Exception:
+                    self._timings[source.name].errors += 1
+                    continue
+                self._store(source, value, elapsed_ms, inputs, now)
+            return stale
+
+        submitted: list[tuple[ContextSource, Future, float]] = []
+        for source in sources:
+            if source.name in self._inflight:
+                stale.add(source.name)  # Still stuck from an earlier cycle
+                continue
+            future = self._pool.submit(_timed_collect, source, profile, inputs)
+            submitted.append((source, future, time.monotonic() + source.deadline))
+
+        for source, future, deadline in submitted:
+            try:
+                value, elapsed_ms = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeout:
+                self._timings[source.name].timeouts += 1
+                self._inflight[source.name] = future
+                stale.add(source.name)
+                continue
+            except Exception:
+                self._timings[source.name].errors += 1
+                continue
+            self._store(source, value, elapsed_ms, inputs, now)
+        return stale
+
+    def collect(self, profile: "TrackerProfile",
+                snapshot: Optional[ProcessSnapshot] = None,
+                windows: Optional[WindowIndex] = None) -> FullContext:
+        now = self._clock()
+        inputs = CycleInputs(self._backend, snapshot, windows)
+        if profile.version != self._profile_version:
+            self._refreshed_at.clear()
+            self._profile_version = profile.version
+        self._harvest(now)
+
+        due = [s for s in self._sources.values() if self._due(s, now)]
+        if self._pool is None and any("snapshot" in s.needs for s in due):
+            # Inline: capture up front so the foreground can reuse it
+            inputs.capture_snapshot()
+
+        # Foreground first: it decides which other sources matter
+        foreground = self._sources["foreground"]
+        stale = self._run([foreground], profile, inputs, now)
+        fg: ForegroundState = self._values.get("foreground") or ForegroundState(FullContext())
+        if fg.ctx.process_name != self._foreground_process:
+            self._foreground_process = fg.ctx.process_name
+            due = list(self._sources.values())
+
+        rest = [s for s in due
+                if s is not foreground and (s.when_gaming or not fg.is_game)]
+        stale |= self._run(rest, profile, inputs, now)
+
+        # A changed process set invalidates process-driven sources early
+        snap = inputs.captured_snapshot
+        if snap is not None and frozenset(snap.lower_names) != self._process_names:
+            extra = [s for s in self._sources.values()
+                     if s.on_process_change and s not in rest and s.name not in stale]
+            stale |= self._run(extra, profile, inputs, now)
+
+        ctx = _assemble_context(self._values)
+        ctx.stale_sources = sorted(stale)
+        return ctx
+
+
+# ──────────────────────────────────────────────
+#  Public API
+# ──────────────────────────────────────────────
+
+def get_full_context(profile: TrackerProfile,
+                     snapshot: Optional[ProcessSnapshot] = None,
+                     windows: Optional[WindowIndex] = None,
+                     backend: Optional[SystemBackend] = None) -> FullContext:
+    """
+    Gather multi-source context from the system (or a replayed trace).
+    Returns a FullContext with all simultaneous activities.
+    Every source is refreshed; processes and windows are enumerated at most
+    once (or taken from `snapshot` / `windows`). Long-running loops should
+    keep a ContextCollector instead, which refreshes sources on their cadence.
+    """
+    return ContextCollector(workers=0, backend=backend).collect(profile, snapshot, windows)
+
+
+def _get_running_apps(profile: TrackerProfile, snapshot: ProcessSnapshot) -> list[str]:
+    """Returns friendly names of running tracked applications."""
+    running: set[str] = set()
+    tracked_lower = profile.tracked_lower
+
+    for name_lower in snapshot.lower_names:
+        if name_lower in tracked_lower:
+            running.add(tracked_lower[name_lower])
 
     return sorted(running)